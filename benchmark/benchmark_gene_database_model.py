@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+import random
+import time
+
+import argparse
+
+import logging
+
+
+# Benchmark of in-memory gene database model: for all isoforms of synthetic annotation children exons, parent gene and
+# parent isoforms of exons are got by gffutils FeatureDB queries and by GeneDatabaseModel, numbers of SQL statements and
+# times are compared.
+
+benchmark_dirpath = os.path.dirname(os.path.realpath(__file__))
+rquast_dirpath = os.path.dirname(benchmark_dirpath)
+
+sys.path.insert(0, rquast_dirpath)
+
+from general import UtilsAnnotations
+
+from objects import GeneDatabaseModel
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Benchmark in-memory gene database model against gffutils queries\n"
+                                            "\nUsage:\npython %(prog)s --genes GENES_NUM --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-n', '--genes', help='Number of genes [default: 5000]', type=int, default=5000)
+
+    parser.add_argument('-i', '--isoforms', help='Maximal number of isoforms per gene [default: 4]', type=int, default=4)
+
+    parser.add_argument('-e', '--exons', help='Maximal number of exons per gene [default: 10]', type=int, default=10)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store annotation and gene database', type=str, required=True)
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+class Logger():
+    """Class of logger of rnaQUAST interface writing to logging"""
+
+    def info(self, message=''):
+        logging.debug(message)
+
+    def print_timestamp(self):
+        pass
+
+
+# isoforms of gene are random subsets of its exons, so exons are shared between isoforms:
+def generate_gtf_file(args):
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    rand = random.Random(args.seed)
+    gtf_path = os.path.join(args.output_dir, 'genes.gtf')
+    with open(gtf_path, 'w') as out_handle:
+        for i_gene in range(args.genes):
+            seqid = 'chr{}'.format(i_gene % 10 + 1)
+            strand = rand.choice('+-')
+            gene_start = 10000 * (i_gene // 10) + 1
+            exons = [(gene_start + 500 * i_exon, gene_start + 500 * i_exon + rand.randint(50, 300))
+                     for i_exon in range(rand.randint(1, args.exons))]
+            gene_id = 'gene_id "G{}";'.format(i_gene)
+
+            out_handle.write('\t'.join([seqid, 'synthetic', 'gene', str(exons[0][0]), str(exons[-1][1]), '.', strand, '.',
+                                        gene_id]) + '\n')
+            for i_isoform in range(rand.randint(1, args.isoforms)):
+                isoform_exons = sorted(rand.sample(exons, rand.randint(1, len(exons))))
+                attributes = '{} transcript_id "G{}.{}";'.format(gene_id, i_gene, i_isoform)
+                out_handle.write('\t'.join([seqid, 'synthetic', 'transcript', str(isoform_exons[0][0]),
+                                            str(isoform_exons[-1][1]), '.', strand, '.', attributes]) + '\n')
+                for start, end in isoform_exons:
+                    out_handle.write('\t'.join([seqid, 'synthetic', 'exon', str(start), str(end), '.', strand, '.',
+                                                attributes]) + '\n')
+
+    return gtf_path
+
+
+# the same queries as rnaQUAST asked gffutils FeatureDB for each isoform and its exons:
+def query_gene_database(sqlite3_db_genes, ids_isoforms, type_isoforms):
+    queried = []
+    for id_isoform in ids_isoforms:
+        isoform = sqlite3_db_genes[id_isoform]
+        parent_genes = list(sqlite3_db_genes.parents(id_isoform, featuretype=UtilsAnnotations.default_type_genes))
+        children_exons = list(sqlite3_db_genes.children(isoform.id, featuretype=UtilsAnnotations.default_type_exons, order_by='start'))
+        parent_isoforms = [list(sqlite3_db_genes.parents(exon.id, featuretype=type_isoforms)) for exon in children_exons]
+        queried.append((len(parent_genes), len(children_exons), sum(len(isoforms) for isoforms in parent_isoforms)))
+    return queried
+
+
+def query_genes_model(sqlite3_db_genes, ids_isoforms, type_genes, type_isoforms, type_exons, logger):
+    genes_model = GeneDatabaseModel.GeneDatabaseModel(sqlite3_db_genes, type_genes, type_isoforms, type_exons, logger)
+
+    queried = []
+    for id_isoform in ids_isoforms:
+        parent_gene_id = genes_model.get_parent_gene_id(id_isoform)
+        children_exons = genes_model.get_children_exons(id_isoform)
+        parent_isoforms = [genes_model.get_parent_isoforms(exon) for exon in children_exons]
+        queried.append((int(parent_gene_id != id_isoform), len(children_exons), sum(len(isoforms) for isoforms in parent_isoforms)))
+    return queried
+
+
+def run_case(sqlite3_db_genes, query):
+    statements = []
+    sqlite3_db_genes.conn.set_trace_callback(statements.append)
+    start_time = time.time()
+    queried = query()
+    spent_time = time.time() - start_time
+    sqlite3_db_genes.conn.set_trace_callback(None)
+
+    return queried, len(statements), spent_time
+
+
+def run_benchmark(args):
+    logger = Logger()
+
+    gtf_path = generate_gtf_file(args)
+    sqlite3_db_path = os.path.join(args.output_dir, 'genes.db')
+    UtilsAnnotations.create_sqlite2_db_in_file(gtf_path, True, True, sqlite3_db_path, sqlite3_db_path + '.tmp', logger)
+    sqlite3_db_genes = UtilsAnnotations.load_sqlite3_db(sqlite3_db_path, logger)
+
+    type_genes, type_isoforms, type_exons = \
+        UtilsAnnotations.get_type_features(sqlite3_db_genes, UtilsAnnotations.default_type_genes,
+                                           UtilsAnnotations.default_type_isoforms, UtilsAnnotations.default_type_exons,
+                                           False, logger)
+    ids_isoforms = [isoform.id for isoform in sqlite3_db_genes.features_of_type(type_isoforms)]
+
+    db_queried, db_statements, db_time = \
+        run_case(sqlite3_db_genes, lambda: query_gene_database(sqlite3_db_genes, ids_isoforms, type_isoforms))
+    model_queried, model_statements, model_time = \
+        run_case(sqlite3_db_genes, lambda: query_genes_model(sqlite3_db_genes, ids_isoforms, type_genes, type_isoforms,
+                                                             type_exons, logger))
+
+    if db_queried != model_queried:
+        logging.error('Gene database model differs from gene database!')
+        sys.exit(1)
+
+    logging.info('{} genes, {} isoforms, {} exons:'.format(args.genes, len(ids_isoforms),
+                                                          len(list(sqlite3_db_genes.features_of_type(type_exons)))))
+    logging.info('  {:<30}{:>10} SQL statements {:.2f} s'.format('gffutils queries', db_statements, db_time))
+    logging.info('  {:<30}{:>10} SQL statements {:.2f} s (including loading)'.
+                 format('gene database model', model_statements, model_time))
+
+    return db_statements, db_time, model_statements, model_time
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        run_benchmark(args)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
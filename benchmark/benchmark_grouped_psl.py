@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+import random
+import time
+
+import argparse
+
+import logging
+
+
+# Benchmark of grouping of PSL alignments by transcripts: synthetic PSL files grouped by transcripts and shuffled
+# are read by UtilsAlignment.iterate_grouped_psl_lines, times are compared with plain reading of lines.
+
+benchmark_dirpath = os.path.dirname(os.path.realpath(__file__))
+rquast_dirpath = os.path.dirname(benchmark_dirpath)
+
+sys.path.insert(0, rquast_dirpath)
+
+from general import rqconfig
+from general import UtilsAlignment
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Benchmark grouping of PSL alignments by transcripts\n"
+                                            "\nUsage:\npython %(prog)s --transcripts TRANSCRIPTS_NUM --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-n', '--transcripts', help='Number of transcripts [default: 300000]', type=int, default=300000)
+
+    parser.add_argument('-a', '--alignments', help='Number of alignments per transcript [default: 3]', type=int, default=3)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store PSL files', type=str, required=True)
+
+    parser.add_argument('-r', '--repeats', help='Number of runs of each case, the best time is reported [default: 3]', type=int, default=3)
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+class Logger():
+    """Class of logger of rnaQUAST interface writing to logging"""
+
+    def info(self, message=''):
+        logging.debug(message)
+
+
+def get_psl_line(rand, i_transcript, i_alignment):
+    blocks_num = rand.randint(1, 5)
+    blocks_sizes = [rand.randint(20, 200) for _ in range(blocks_num)]
+    q_starts = [100 * i_block for i_block in range(blocks_num)]
+    t_start = rand.randint(0, 10000000)
+    t_starts = [t_start + 1000 * i_block for i_block in range(blocks_num)]
+
+    return '\t'.join([str(sum(blocks_sizes)), '0', '0', '0', '0', '0', str(blocks_num - 1), '1000', rand.choice('+-'),
+                      'transcript_{}_{}'.format(i_transcript, rand.randint(0, 10 ** 6)), str(100 * blocks_num + 200),
+                      str(q_starts[0]), str(q_starts[-1] + blocks_sizes[-1]), 'chr{}'.format(i_alignment % 5 + 1),
+                      '100000000', str(t_starts[0]), str(t_starts[-1] + blocks_sizes[-1]), str(blocks_num),
+                      ''.join('{},'.format(value) for value in blocks_sizes),
+                      ''.join('{},'.format(value) for value in q_starts),
+                      ''.join('{},'.format(value) for value in t_starts)]) + '\n'
+
+
+def generate_psl_files(args):
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    rand = random.Random(args.seed)
+    lines = [get_psl_line(rand, i_transcript, i_alignment)
+             for i_transcript in range(args.transcripts) for i_alignment in range(args.alignments)]
+
+    # names are taken from the first alignment of each transcript, so alignments of transcript have the same name:
+    for i_line in range(len(lines)):
+        if i_line % args.alignments != 0:
+            fields = lines[i_line].split('\t')
+            fields[9] = lines[i_line - i_line % args.alignments].split('\t')[9]
+            lines[i_line] = '\t'.join(fields)
+
+    grouped_psl_path = os.path.join(args.output_dir, 'grouped.psl')
+    with open(grouped_psl_path, 'w') as out_handle:
+        out_handle.writelines(lines)
+
+    rand.shuffle(lines)
+    shuffled_psl_path = os.path.join(args.output_dir, 'shuffled.psl')
+    with open(shuffled_psl_path, 'w') as out_handle:
+        out_handle.writelines(lines)
+
+    return grouped_psl_path, shuffled_psl_path
+
+
+def read_lines(psl_path):
+    with open(psl_path, 'r') as in_handle:
+        for line in in_handle:
+            yield line
+
+
+def get_best_time(args, iterate_lines):
+    best_time = None
+    for _ in range(args.repeats):
+        start_time = time.time()
+        for line in iterate_lines():
+            pass
+        spent_time = time.time() - start_time
+        if best_time is None or spent_time < best_time:
+            best_time = spent_time
+    return best_time
+
+
+def run_benchmark(args):
+    grouped_psl_path, shuffled_psl_path = generate_psl_files(args)
+    out_psl_path = os.path.join(args.output_dir, 'out.psl')
+    logger = Logger()
+
+    cases = [('read lines of grouped file', lambda: read_lines(grouped_psl_path)),
+             ('grouped file', lambda: UtilsAlignment.iterate_grouped_psl_lines(grouped_psl_path, out_psl_path, logger)),
+             ('shuffled file, sorted in memory',
+              lambda: UtilsAlignment.iterate_grouped_psl_lines(shuffled_psl_path, out_psl_path, logger))]
+
+    times = []
+    for name, iterate_lines in cases:
+        times.append((name, get_best_time(args, iterate_lines)))
+
+    # the same shuffled file sorted by spill files:
+    sort_buffer_size = rqconfig.PSL_SORT_BUFFER_SIZE
+    rqconfig.PSL_SORT_BUFFER_SIZE = os.path.getsize(shuffled_psl_path) // 4 + 1
+    times.append(('shuffled file, sorted by 4 spill files',
+                  get_best_time(args, lambda: UtilsAlignment.iterate_grouped_psl_lines(shuffled_psl_path, out_psl_path, logger))))
+    rqconfig.PSL_SORT_BUFFER_SIZE = sort_buffer_size
+
+    logging.info('{} alignments of {} transcripts, {} MB:'.format(args.transcripts * args.alignments, args.transcripts,
+                                                                 os.path.getsize(grouped_psl_path) // (1024 * 1024)))
+    for name, spent_time in times:
+        logging.info('  {:<45}{:.2f} s ({:.2f} of reading)'.format(name, spent_time, spent_time / times[0][1]))
+
+    return times
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        run_benchmark(args)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+import random
+import time
+import resource
+import multiprocessing
+
+import argparse
+
+import logging
+
+
+# Benchmark of memory-mapped reference: synthetic reference is loaded to dict by fastaparser.read_fasta and indexed by
+# IndexedReference, random subsequences are extracted from both, peak memory and times are compared. Each case is run
+# in fresh process, so its peak memory is not affected by other cases.
+
+benchmark_dirpath = os.path.dirname(os.path.realpath(__file__))
+rquast_dirpath = os.path.dirname(benchmark_dirpath)
+
+sys.path.insert(0, rquast_dirpath)
+
+from general import UtilsGeneral
+
+from objects import IndexedReference
+
+from quast_libs import fastaparser
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Benchmark memory-mapped reference against reference loaded to memory\n"
+                                            "\nUsage:\npython %(prog)s --size SIZE_MB --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-n', '--size', help='Size of reference in Mb [default: 200]', type=int, default=200)
+
+    parser.add_argument('-c', '--chromosomes', help='Number of chromosomes [default: 20]', type=int, default=20)
+
+    parser.add_argument('-q', '--queries', help='Number of extracted subsequences [default: 200000]', type=int, default=200000)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store reference and its index', type=str, required=True)
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+class Logger():
+    """Class of logger of rnaQUAST interface writing to logging"""
+
+    def info(self, message=''):
+        logging.debug(message)
+
+
+def generate_reference(args):
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    rand = random.Random(args.seed)
+    # random blocks are repeated to generate reference fast:
+    blocks = [''.join(rand.choice('ACGT') for _ in range(60)) + '\n' for _ in range(1000)]
+    chr_lines_num = args.size * 1000000 // args.chromosomes // 60
+
+    reference_path = os.path.join(args.output_dir, 'reference.fasta')
+    with open(reference_path, 'w') as out_handle:
+        for i_chr in range(args.chromosomes):
+            out_handle.write('>chr{}\n'.format(i_chr + 1))
+            out_handle.writelines(rand.choice(blocks) for _ in range(chr_lines_num))
+
+    return reference_path, chr_lines_num * 60
+
+
+def get_maxrss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# pages of memory-mapped file are counted in peak memory, but they are page cache shared with other processes and freed
+# by system when needed, so anonymous memory of process (Linux only) is reported too:
+def get_rss_anon_mb():
+    if not os.path.exists('/proc/self/status'):
+        return float('nan')
+    with open('/proc/self/status', 'r') as in_handle:
+        for line in in_handle:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024.0
+    return float('nan')
+
+
+def run_case(case, reference_path, tmp_dir, chrs_num, chr_len, queries_num, seed):
+    start_maxrss = get_maxrss_mb()
+    start_rss_anon = get_rss_anon_mb()
+
+    start_time = time.time()
+    if case == 'indexed':
+        reference_dict = IndexedReference.IndexedReference.get_indexed_reference(reference_path, tmp_dir, Logger())
+    else:
+        reference_dict = UtilsGeneral.list_to_dict(fastaparser.read_fasta(reference_path))
+    load_time = time.time() - start_time
+
+    # alignments of transcripts are short, so subsequences are short:
+    rand = random.Random(seed)
+    start_time = time.time()
+    checksum = 0
+    for _ in range(queries_num):
+        seq = reference_dict['chr{}'.format(rand.randint(1, chrs_num))]
+        start = rand.randint(0, chr_len - 1)
+        checksum += seq[start:start + rand.randint(1, 3000)].count('A')
+    extract_time = time.time() - start_time
+
+    return load_time, extract_time, get_maxrss_mb() - start_maxrss, get_rss_anon_mb() - start_rss_anon, checksum
+
+
+def run_benchmark(args):
+    reference_path, chr_len = generate_reference(args)
+    # index is made once, as by previous run of rnaQUAST:
+    IndexedReference.IndexedReference.get_indexed_reference(reference_path, args.output_dir, Logger())
+
+    results = []
+    for case in ['dict', 'indexed']:
+        pool = multiprocessing.get_context('spawn').Pool(1)
+        results.append(pool.apply(run_case, (case, reference_path, args.output_dir, args.chromosomes, chr_len,
+                                             args.queries, args.seed)))
+        pool.close()
+        pool.join()
+
+    if results[0][-1] != results[1][-1]:
+        logging.error('Subsequences of indexed reference differ from subsequences of reference loaded to memory!')
+        sys.exit(1)
+
+    logging.info('{} Mb reference, {} chromosomes, {} subsequences:'.format(args.size, args.chromosomes, args.queries))
+    for name, (load_time, extract_time, maxrss, rss_anon, checksum) in \
+            zip(['read_fasta to dict', 'IndexedReference'], results):
+        logging.info('  {:<20} load {:.2f} s, extract {:.2f} s, peak memory {:.0f} MB, anonymous memory {:.0f} MB'.
+                     format(name, load_time, extract_time, maxrss, rss_anon))
+
+    return results
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        run_benchmark(args)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+import random
+import time
+from collections import defaultdict
+
+import argparse
+
+import logging
+
+
+# Benchmark of removal of low-complexity tails of union alignments on poly-A-rich and repeat-rich assemblies:
+# UtilsAlignment.remove_low_complexity is compared with previous trimming, which computed reverse complement of
+# transcript for each block of minus strand alignment, rebuilt k-mers spectrum of whole growing block and reopened
+# FASTA file of low-complexity blocks per record. Both are run with writing of low-complexity blocks as in debug mode.
+
+benchmark_dirpath = os.path.dirname(os.path.realpath(__file__))
+rquast_dirpath = os.path.dirname(benchmark_dirpath)
+
+sys.path.insert(0, rquast_dirpath)
+
+from general import rqconfig
+from general import UtilsGeneral
+from general import UtilsAlignment
+
+from objects import Alignment
+
+from quast_libs import fastaparser
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Benchmark removal of low-complexity tails of union alignments\n"
+                                            "\nUsage:\npython %(prog)s --transcripts TRANSCRIPTS_NUM --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-n', '--transcripts', help='Number of transcripts of each assembly [default: 200]', type=int, default=200)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store low-complexity blocks', type=str, required=True)
+
+    parser.add_argument('-r', '--repeats', help='Number of runs of each case, the best time is reported [default: 3]', type=int, default=3)
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+# previous removal of low-complexity tails:
+def remove_low_complexity_previous(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
+                                   transcript_dict, out_low_complexity_file, low_complexity_len_threshold):
+    transcript_seq = transcript_dict[union_alignments[0].query_fragment.name]
+
+    clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments = \
+        remove_low_complexity_tail_previous(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
+                                            transcript_seq, out_low_complexity_file, low_complexity_len_threshold, end_tail=True)
+
+    clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments = \
+        remove_low_complexity_tail_previous(clear_union_lines, clear_union_alignments, single_transcript_lines,
+                                            single_transcript_alignments, transcript_seq, out_low_complexity_file,
+                                            low_complexity_len_threshold, end_tail=False)
+
+    return clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments
+
+
+def remove_low_complexity_tail_previous(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
+                                        transcript_seq, out_low_complexity_file, threshold_block_len, end_tail):
+    block_seq = ''
+    for i in range(len(union_alignments)):
+        if end_tail == True:
+            i_alignment = len(union_alignments) - 1 - i
+        else:
+            i_alignment = i
+        psl_alignment = union_alignments[i_alignment]
+        for j in range(psl_alignment.blocks_num):
+            if end_tail == True:
+                i_block = psl_alignment.blocks_num - 1 - j
+            else:
+                i_block = j
+
+            start = psl_alignment.query_fragment.starts[i_block]
+            end = psl_alignment.query_fragment.ends[i_block]
+
+            if psl_alignment.strand == '+':
+                block_seq += transcript_seq[start:end + 1]
+            else:
+                block_seq += UtilsGeneral.rev_comp(transcript_seq)[start:end + 1]
+
+            if len(block_seq) < threshold_block_len:
+                continue
+
+            if not is_low_complexity_previous(block_seq):
+                if (end_tail == True and i_block == psl_alignment.blocks_num - 1) or (end_tail == False and i_block == 0):
+                    latest_alignment = psl_alignment
+                    latest_line = union_lines[i_alignment]
+                else:
+                    if end_tail == True:
+                        latest_alignment = psl_alignment.get_split_alignment(0, i_block)
+                    else:
+                        latest_alignment = psl_alignment.get_split_alignment(i_block, psl_alignment.blocks_num - 1)
+                    latest_line = latest_alignment.get_psl_line_from_alignment()
+
+                if end_tail == True:
+                    clear_union_alignments = union_alignments[:i_alignment] + [latest_alignment]
+                    clear_union_lines = union_lines[:i_alignment] + [latest_line]
+                else:
+                    clear_union_alignments = [latest_alignment] + union_alignments[i_alignment + 1:]
+                    clear_union_lines = [latest_line] + union_lines[i_alignment + 1:]
+
+                for i_alignment in range(len(union_lines)):
+                    if union_lines[i_alignment] not in clear_union_lines:
+                        single_transcript_lines.remove(union_lines[i_alignment])
+                        single_transcript_alignments.remove(union_alignments[i_alignment])
+                for i_alignment in range(len(clear_union_lines)):
+                    if clear_union_lines[i_alignment] not in single_transcript_lines:
+                        single_transcript_lines.append(clear_union_lines[i_alignment])
+                        single_transcript_alignments.append(clear_union_alignments[i_alignment])
+
+                return clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments,
+
+            elif out_low_complexity_file is not None:
+                fastaparser.write_fasta(out_low_complexity_file, [('{}_block'.format(psl_alignment.query_fragment.name), block_seq)], mode='a')
+
+            if len(block_seq) > threshold_block_len:
+                block_seq = ''
+
+    for i_alignment in range(len(union_lines)):
+        single_transcript_lines.remove(union_lines[i_alignment])
+        single_transcript_alignments.remove(union_alignments[i_alignment])
+
+    return [], [], single_transcript_lines, single_transcript_alignments
+
+
+def is_low_complexity_previous(seq, k=4):
+    k_spect = defaultdict(int)
+    for i in range(len(seq) - k + 1):
+        k_spect[seq[i:i + k]] += 1
+
+    max_key, max_value = 0, 0
+    for key, value in k_spect.items():
+        if value > max_value:
+            max_key, max_value = key, value
+    majority_num = max_value
+    k_spect[max_key] = 0
+    majority_num += max(k_spect.values())
+    if majority_num > 0.6 * (len(seq) - k + 1):
+        return True
+    else:
+        return False
+
+
+# poly-A-rich transcripts have poly-T head and poly-A tail, repeat-rich ones have tandem repeats of short units at ends,
+# so low-complexity tails are at both ends of either strand:
+def get_low_complexity_seq(rand, assembly):
+    len_tail = rand.randint(100, 600)
+    if assembly == 'poly-A-rich':
+        return 'A' * len_tail
+    unit = ''.join(rand.choice('ACGT') for _ in range(rand.randint(1, 3)))
+    return (unit * len_tail)[:len_tail]
+
+
+def get_transcript_seq(rand, assembly):
+    core = ''.join(rand.choice('ACGT') for _ in range(rand.randint(1000, 3000)))
+    tail = get_low_complexity_seq(rand, assembly)
+    if assembly == 'poly-A-rich':
+        head = 'T' * rand.randint(100, 600)
+    else:
+        head = get_low_complexity_seq(rand, assembly)
+    return head + core + tail
+
+
+def get_psl_line(name, size, strand, q_starts, blocks_sizes, t_start):
+    t_starts = [t_start + q_start * 2 for q_start in q_starts]
+    return '\t'.join([str(sum(blocks_sizes)), '0', '0', '0', '0', '0', str(len(blocks_sizes) - 1), '1000', strand, name,
+                      str(size), str(q_starts[0]), str(q_starts[-1] + blocks_sizes[-1]), 'chr1', '100000000',
+                      str(t_starts[0]), str(t_starts[-1] + blocks_sizes[-1]), str(len(blocks_sizes)),
+                      ''.join('{},'.format(value) for value in blocks_sizes),
+                      ''.join('{},'.format(value) for value in q_starts),
+                      ''.join('{},'.format(value) for value in t_starts)])
+
+
+# union of 2-3 alignments covering transcript by short blocks, as of fake BLAT alignments:
+def get_union_lines(rand, name, size):
+    strand = rand.choice('+-')
+    q_starts = []
+    blocks_sizes = []
+    position = 0
+    while position < size - 15:
+        blocks_sizes.append(min(rand.randint(15, 40), size - position))
+        q_starts.append(position)
+        position += blocks_sizes[-1] + rand.randint(0, 5)
+
+    alignments_num = rand.randint(2, 3)
+    union_lines = []
+    for i_alignment in range(alignments_num):
+        i_block0 = i_alignment * len(q_starts) // alignments_num
+        i_block1 = (i_alignment + 1) * len(q_starts) // alignments_num
+        union_lines.append(get_psl_line(name, size, strand, q_starts[i_block0:i_block1], blocks_sizes[i_block0:i_block1],
+                                        10000 * rand.randint(0, 1000) + i_alignment * 100000))
+    return union_lines
+
+
+def get_assembly(rand, assembly, transcripts_num):
+    transcripts_dict = {}
+    unions_lines = []
+    for i_transcript in range(transcripts_num):
+        name = '{}_{}'.format(assembly, i_transcript)
+        transcripts_dict[name] = get_transcript_seq(rand, assembly)
+        unions_lines.append(get_union_lines(rand, name, len(transcripts_dict[name])))
+    return transcripts_dict, unions_lines
+
+
+def run_case(unions_lines, transcripts_dict, low_complexity_path, remove_low_complexity, is_handle):
+    # alignments are parsed before time measurement:
+    unions = []
+    for union_lines in unions_lines:
+        union_alignments = [Alignment.PSLFileAlignment.get_alignment_from_psl_line(line) for line in union_lines]
+        unions.append((union_lines, union_alignments, list(union_lines), list(union_alignments)))
+    if os.path.exists(low_complexity_path):
+        os.remove(low_complexity_path)
+
+    results = []
+    start_time = time.time()
+    if is_handle:
+        out_low_complexity = open(low_complexity_path, 'w')
+    else:
+        out_low_complexity = low_complexity_path
+    for union_lines, union_alignments, single_transcript_lines, single_transcript_alignments in unions:
+        clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments = \
+            remove_low_complexity(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
+                                  transcripts_dict, out_low_complexity, rqconfig.alignment_thresholds().LOW_COMPLEXITY_LEN_THRESHOLD)
+        results.append((clear_union_lines, list(single_transcript_lines)))
+    if is_handle:
+        out_low_complexity.close()
+    spent_time = time.time() - start_time
+
+    return spent_time, results
+
+
+def get_best_time(args, unions_lines, transcripts_dict, low_complexity_path, remove_low_complexity, is_handle):
+    best_time = None
+    results = None
+    for _ in range(args.repeats):
+        spent_time, results = run_case(unions_lines, transcripts_dict, low_complexity_path, remove_low_complexity, is_handle)
+        if best_time is None or spent_time < best_time:
+            best_time = spent_time
+    with open(low_complexity_path, 'r') as in_handle:
+        low_complexity_text = in_handle.read()
+    return best_time, results, low_complexity_text
+
+
+def run_benchmark(args):
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    rand = random.Random(args.seed)
+
+    times = []
+    for assembly in ['poly-A-rich', 'repeat-rich']:
+        transcripts_dict, unions_lines = get_assembly(rand, assembly, args.transcripts)
+
+        previous_time, previous_results, previous_text = \
+            get_best_time(args, unions_lines, transcripts_dict, os.path.join(args.output_dir, assembly + '.previous.fasta'),
+                          remove_low_complexity_previous, False)
+        current_time, current_results, current_text = \
+            get_best_time(args, unions_lines, transcripts_dict, os.path.join(args.output_dir, assembly + '.fasta'),
+                          UtilsAlignment.remove_low_complexity, True)
+
+        # trimmed unions and low-complexity blocks are the same:
+        if current_results != previous_results or current_text != previous_text:
+            raise Exception('Removal of low-complexity tails differs from previous one on {} assembly'.format(assembly))
+
+        blocks_num = sum(len(line.split('\t')[18].split(',')) - 1 for union_lines in unions_lines for line in union_lines)
+        logging.info('{} assembly: {} transcripts, {} blocks, {} low-complexity blocks written:'.
+                     format(assembly, args.transcripts, blocks_num, current_text.count('>')))
+        for name, spent_time in [('previous trimming', previous_time), ('incremental trimming', current_time)]:
+            logging.info('  {:<25}{:.2f} s ({:.2f} of previous)'.format(name, spent_time, spent_time / previous_time))
+            times.append(('{}, {}'.format(assembly, name), spent_time))
+
+    return times
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        run_benchmark(args)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+import random
+import time
+import shutil
+
+import argparse
+
+import logging
+
+
+# Benchmark of sharding of transcripts for parallel BLAT runs on long-read-sized transcripts: shards balanced by length
+# are compared with previous split of transcripts by count to one shard per thread. Stub BLAT spends time proportional
+# to number of bases of its query file and reports one alignment per transcript, so times show balance of shards.
+
+benchmark_dirpath = os.path.dirname(os.path.realpath(__file__))
+rquast_dirpath = os.path.dirname(benchmark_dirpath)
+
+sys.path.insert(0, rquast_dirpath)
+
+from general import rqconfig
+from general import parallel_blat_run
+
+from quast_libs import fastaparser
+
+
+STUB_BLAT = '''#!{}
+import sys
+import time
+
+reference_path, query_path, out_path = [argument for argument in sys.argv[1:] if not argument.startswith('-')][:3]
+
+queries = []
+with open(query_path, 'r') as in_handle:
+    for line in in_handle:
+        if line.startswith('>'):
+            queries.append([line[1:].split()[0], 0])
+        else:
+            queries[-1][1] += len(line.strip())
+
+time.sleep(sum(len_query for name, len_query in queries) / {})
+
+with open(out_path, 'w') as out_handle:
+    for name, len_query in queries:
+        out_handle.write('\\t'.join(['100', '0', '0', '0', '0', '0', '0', '0', '+', name, str(len_query), '0', '100',
+                                    'chr1', '100000', '0', '100', '1', '100,', '0,', '0,']) + '\\n')
+'''
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Benchmark sharding of long transcripts for parallel BLAT runs\n"
+                                            "\nUsage:\npython %(prog)s --transcripts TRANSCRIPTS_NUM --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-n', '--transcripts', help='Number of transcripts [default: 2000]', type=int, default=2000)
+
+    parser.add_argument('-t', '--threads', help='Number of threads [default: 8]', type=int, default=8)
+
+    parser.add_argument('-b', '--bases_per_second', help='Speed of stub BLAT in bases per second [default: 500000]', type=int, default=500000)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store stub BLAT, shards and alignments', type=str, required=True)
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+class Logger():
+    """Class of logger of rnaQUAST interface writing to logging"""
+
+    def print_timestamp(self):
+        pass
+
+    def info(self, message=''):
+        logging.debug(message)
+
+    def debug(self, message=''):
+        logging.debug(message)
+
+    def error(self, message='', exit_with_code=0, to_stderr=False):
+        logging.error(message)
+        if exit_with_code:
+            sys.exit(exit_with_code)
+
+
+# lengths of long reads: log-normal with median about 3 kb and tail up to 100 kb:
+def get_transcripts_dict(args):
+    rand = random.Random(args.seed)
+    # random blocks are repeated to generate transcripts fast:
+    blocks = [''.join(rand.choice('ACGT') for _ in range(1000)) for _ in range(100)]
+
+    transcripts_dict = {}
+    for i_transcript in range(args.transcripts):
+        len_transcript = min(int(rand.lognormvariate(8, 1)) + 100, 100000)
+        seq = ''.join(rand.choice(blocks) for _ in range(len_transcript // 1000 + 1))[:len_transcript]
+        transcripts_dict['read_{}'.format(i_transcript)] = seq
+
+    return transcripts_dict
+
+
+# previous split: transcripts by count to one shard per thread, rest to the first shards, file is reopened per record:
+def split_transcripts_by_count(transcripts_dict, transcripts_order, shards_num, output_dirs):
+    f_fa_pathes = []
+
+    file_n = len(transcripts_dict)
+    thread_n = file_n // shards_num
+
+    id_transcripts = list(transcripts_dict.keys())
+    for i_thread in range(shards_num):
+        fpath = os.path.join(output_dirs[i_thread], '{}.fasta'.format(i_thread))
+        f_fa_pathes.append(fpath)
+        for i_transcript in range(thread_n):
+            id_transcript = id_transcripts[i_thread * thread_n + i_transcript]
+            fastaparser.write_fasta(fpath, [(id_transcript, transcripts_dict[id_transcript])], mode='a')
+
+    for i_thread in range(file_n - shards_num * thread_n):
+        id_transcript = id_transcripts[shards_num * thread_n + i_thread]
+        fastaparser.write_fasta(f_fa_pathes[i_thread], [(id_transcript, transcripts_dict[id_transcript])], mode='a')
+
+    return f_fa_pathes
+
+
+def run_case(args, transcripts_dict, reference_path, label, split_transcripts, shards_per_thread):
+    tmp_dir = os.path.join(args.output_dir, label)
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    split_transcripts_by_length = parallel_blat_run.split_transcripts_by_length
+    blat_shards_per_thread = rqconfig.BLAT_SHARDS_PER_THREAD
+    parallel_blat_run.split_transcripts_by_length = split_transcripts
+    rqconfig.BLAT_SHARDS_PER_THREAD = shards_per_thread
+
+    start_time = time.time()
+    parallel_blat_run.parallel_blat_run(transcripts_dict, [reference_path], args.threads, tmp_dir, label, Logger(), tmp_dir)
+    spent_time = time.time() - start_time
+
+    parallel_blat_run.split_transcripts_by_length = split_transcripts_by_length
+    rqconfig.BLAT_SHARDS_PER_THREAD = blat_shards_per_thread
+
+    return spent_time
+
+
+def run_benchmark(args):
+    stub_dir = os.path.join(args.output_dir, 'stub_aligners')
+    if not os.path.exists(stub_dir):
+        os.makedirs(stub_dir)
+    stub_blat_path = os.path.join(stub_dir, 'blat')
+    with open(stub_blat_path, 'w') as out_handle:
+        out_handle.write(STUB_BLAT.format(sys.executable, args.bases_per_second))
+    os.chmod(stub_blat_path, 0o755)
+    os.environ['PATH'] = stub_dir + os.pathsep + os.environ['PATH']
+
+    reference_path = os.path.join(args.output_dir, 'reference.fasta')
+    fastaparser.write_fasta(reference_path, [('chr1', 'ACGT' * 25000)])
+
+    transcripts_dict = get_transcripts_dict(args)
+    total_len = sum(len(seq) for seq in transcripts_dict.values())
+    # long transcripts often come together, e.g. reads sorted by length:
+    sorted_transcripts_dict = \
+        dict((id_transcript, transcripts_dict[id_transcript])
+             for id_transcript in sorted(transcripts_dict, key=lambda id_transcript: -len(transcripts_dict[id_transcript])))
+
+    times = []
+    for order, transcripts in [('random order', transcripts_dict), ('sorted by length', sorted_transcripts_dict)]:
+        times.append(('{}, by count to one shard per thread'.format(order),
+                      run_case(args, transcripts, reference_path, 'by_count', split_transcripts_by_count, 1)))
+        times.append(('{}, by length to {} shards per thread'.format(order, rqconfig.BLAT_SHARDS_PER_THREAD),
+                      run_case(args, transcripts, reference_path, 'by_length', parallel_blat_run.split_transcripts_by_length,
+                               rqconfig.BLAT_SHARDS_PER_THREAD)))
+
+    ideal_time = float(total_len) / args.bases_per_second / args.threads
+    logging.info('{} transcripts, {} Mb, longest {} kb, {} threads, ideal time {:.2f} s:'.
+                 format(args.transcripts, total_len // 1000000, max(len(seq) for seq in transcripts_dict.values()) // 1000,
+                        args.threads, ideal_time))
+    for name, spent_time in times:
+        logging.info('  {:<55}{:.2f} s ({:.2f} of ideal)'.format(name, spent_time, spent_time / ideal_time))
+
+    return times
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        run_benchmark(args)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
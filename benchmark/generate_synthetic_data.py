@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+
+import argparse
+
+import random
+
+import logging
+
+
+# Synthetic data for benchmarks: random genome, GTF with genes, isoforms and exons, transcripts with mutations,
+# fragments and fusions, reads. Alignments known by construction are stored in truth directory as PSL, BLAST6 and
+# SAM files, which are printed by stand-in aligners instead of BLAT, GMAP, blastn and STAR.
+
+NUCLS = 'ACGT'
+COMPLEMENT = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N'}
+
+REFERENCE_NAME = 'reference.fasta'
+GTF_NAME = 'annotation.gtf'
+TRANSCRIPTS_NAME = 'transcripts.fasta'
+READS_NAME = 'reads.fastq'
+
+TRUTH_DIR_NAME = 'truth'
+TRUTH_PSL_NAME = 'transcripts.psl'
+TRUTH_BLAST6_NAME = 'transcripts.blast6'
+TRUTH_SAM_NAME = 'reads.sam'
+
+# genes per chromosome, lengths of exons, introns and intergenic regions:
+GENES_PER_CHROMOSOME = 200
+EXONS_NUM_RANGE = (1, 8)
+EXON_LEN_RANGE = (50, 400)
+INTRON_LEN_RANGE = (60, 2000)
+INTERGENIC_LEN_RANGE = (500, 5000)
+ISOFORMS_NUM_RANGE = (1, 4)
+
+# fractions of kinds of transcripts, the rest are full-length isoforms:
+FRAGMENT_FRACTION = 0.25
+FUSION_FRACTION = 0.1
+RANDOM_FRACTION = 0.05
+# fraction of transcripts assembled from the opposite strand:
+REVERSE_FRACTION = 0.2
+MUTATION_RATE = 0.005
+
+READ_LEN = 100
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Generate synthetic genome, annotation, transcripts and reads for rnaQUAST benchmarks\n"
+                                            "\nUsage:\npython %(prog)s --genes GENES_NUM --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-g', '--genes', help='Number of genes [default: 1000]', type=int, default=1000)
+
+    parser.add_argument('-r', '--reads', help='Number of reads per isoform [default: 10]', type=int, default=10)
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store generated data', type=str, required=True)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def get_reverse_complement(seq):
+    return ''.join(COMPLEMENT[nucl] for nucl in reversed(seq))
+
+
+def get_random_seq(rand, length):
+    return ''.join(rand.choices(NUCLS, k=length))
+
+
+def get_mutated_seq(rand, seq, mutation_rate):
+    seq = list(seq)
+    mutations_num = 0
+    for i in range(len(seq)):
+        if rand.random() < mutation_rate:
+            seq[i] = rand.choice([nucl for nucl in NUCLS if nucl != seq[i]])
+            mutations_num += 1
+    return ''.join(seq), mutations_num
+
+
+def write_fasta(path, records, width=60):
+    with open(path, 'w') as out_handle:
+        for name, seq in records:
+            out_handle.write('>{}\n'.format(name))
+            for i in range(0, len(seq), width):
+                out_handle.write(seq[i:i + width] + '\n')
+
+
+class Isoform():
+    """Class of synthetic isoform, exons are 0-based half-open intervals sorted by coordinates on chromosome"""
+
+    def __init__(self, id, gene_id, chr_name, strand, exons):
+        self.id = id
+        self.gene_id = gene_id
+        self.chr_name = chr_name
+        self.strand = strand
+        self.exons = exons
+
+        self.len = sum(end - start for start, end in exons)
+
+    # spliced sequence in order of chromosome coordinates (forward strand of chromosome):
+    def get_spliced_seq(self, chromosome):
+        return ''.join(chromosome[start:end] for start, end in self.exons)
+
+    # blocks on chromosome covered by interval [start, end) of spliced sequence:
+    def get_blocks(self, start, end):
+        blocks = []
+        offset = 0
+        for exon_start, exon_end in self.exons:
+            exon_len = exon_end - exon_start
+            block_start = max(start, offset)
+            block_end = min(end, offset + exon_len)
+            if block_start < block_end:
+                blocks.append((exon_start + block_start - offset, block_end - block_start))
+            offset += exon_len
+        return blocks
+
+
+def generate_genome(rand, genes_num):
+    chromosomes_num = max(1, genes_num // GENES_PER_CHROMOSOME)
+
+    chromosomes = []
+    isoforms = []
+    genes = []
+    for i_chr in range(chromosomes_num):
+        chr_name = 'chr{}'.format(i_chr + 1)
+        chr_seq = [get_random_seq(rand, rand.randint(*INTERGENIC_LEN_RANGE))]
+        chr_len = len(chr_seq[0])
+
+        for i_gene in range(i_chr, genes_num, chromosomes_num):
+            gene_id = 'gene{}'.format(i_gene + 1)
+            strand = rand.choice('+-')
+
+            exons = []
+            for i_exon in range(rand.randint(*EXONS_NUM_RANGE)):
+                if i_exon != 0:
+                    intron_len = rand.randint(*INTRON_LEN_RANGE)
+                    # canonical splice sites GT-AG:
+                    intron_seq = 'GT' + get_random_seq(rand, intron_len - 4) + 'AG'
+                    if strand == '-':
+                        intron_seq = get_reverse_complement(intron_seq)
+                    chr_seq.append(intron_seq)
+                    chr_len += intron_len
+                exon_len = rand.randint(*EXON_LEN_RANGE)
+                chr_seq.append(get_random_seq(rand, exon_len))
+                exons.append((chr_len, chr_len + exon_len))
+                chr_len += exon_len
+
+            gene_isoforms = []
+            for i_isoform in range(rand.randint(*ISOFORMS_NUM_RANGE)):
+                # isoforms skip inner exons:
+                isoform_exons = [exon for i_exon, exon in enumerate(exons)
+                                 if i_exon in [0, len(exons) - 1] or i_isoform == 0 or rand.random() < 0.7]
+                gene_isoforms.append(Isoform('{}.t{}'.format(gene_id, i_isoform + 1), gene_id, chr_name, strand,
+                                             isoform_exons))
+            isoforms += gene_isoforms
+            genes.append((gene_id, chr_name, strand, exons[0][0], exons[-1][1], gene_isoforms))
+
+            intergenic_len = rand.randint(*INTERGENIC_LEN_RANGE)
+            chr_seq.append(get_random_seq(rand, intergenic_len))
+            chr_len += intergenic_len
+
+        chromosomes.append((chr_name, ''.join(chr_seq)))
+
+    return chromosomes, genes, isoforms
+
+
+def write_gtf(path, genes):
+    with open(path, 'w') as out_handle:
+        for gene_id, chr_name, strand, start, end, gene_isoforms in genes:
+            attributes = 'gene_id "{}";'.format(gene_id)
+            out_handle.write('\t'.join([chr_name, 'synthetic', 'gene', str(start + 1), str(end), '.', strand, '.',
+                                        attributes]) + '\n')
+            for isoform in gene_isoforms:
+                attributes = 'gene_id "{}"; transcript_id "{}";'.format(gene_id, isoform.id)
+                out_handle.write('\t'.join([chr_name, 'synthetic', 'transcript', str(isoform.exons[0][0] + 1),
+                                            str(isoform.exons[-1][1]), '.', strand, '.', attributes]) + '\n')
+                exons = isoform.exons if strand == '+' else list(reversed(isoform.exons))
+                for i_exon, (exon_start, exon_end) in enumerate(exons):
+                    exon_attributes = attributes + ' exon_number "{}";'.format(i_exon + 1)
+                    out_handle.write('\t'.join([chr_name, 'synthetic', 'exon', str(exon_start + 1), str(exon_end), '.',
+                                                strand, '.', exon_attributes]) + '\n')
+
+
+class TranscriptPart():
+    """Class of part of synthetic transcript taken from interval [start, end) of spliced sequence of isoform"""
+
+    def __init__(self, isoform, start, end, strand, seq, mismatches):
+        self.isoform = isoform
+        self.start = start
+        self.end = end
+        # strand of chromosome which the part is taken from:
+        self.strand = strand
+        self.seq = seq
+        self.mismatches = mismatches
+
+
+def get_transcript_part(rand, chromosomes_dict, isoform, start, end):
+    spliced_seq = isoform.get_spliced_seq(chromosomes_dict[isoform.chr_name])
+    seq, mismatches = get_mutated_seq(rand, spliced_seq[start:end], MUTATION_RATE)
+
+    strand = isoform.strand
+    if rand.random() < REVERSE_FRACTION:
+        strand = '+' if strand == '-' else '-'
+    if strand == '-':
+        seq = get_reverse_complement(seq)
+
+    return TranscriptPart(isoform, start, end, strand, seq, mismatches)
+
+
+def get_random_interval(rand, length, min_len):
+    part_len = rand.randint(min(min_len, length), length)
+    start = rand.randint(0, length - part_len)
+    return start, start + part_len
+
+
+def generate_transcripts(rand, chromosomes_dict, isoforms):
+    several_genes = isoforms[0].gene_id != isoforms[-1].gene_id
+
+    transcripts = []
+    for i_isoform, isoform in enumerate(isoforms):
+        name = 'transcript{}'.format(i_isoform + 1)
+
+        kind = rand.random()
+        if kind < RANDOM_FRACTION:
+            transcripts.append((name, get_random_seq(rand, isoform.len), []))
+        elif kind < RANDOM_FRACTION + FUSION_FRACTION and several_genes:
+            # fusion of isoforms of different genes:
+            other_isoform = isoforms[rand.randrange(len(isoforms))]
+            while other_isoform.gene_id == isoform.gene_id:
+                other_isoform = isoforms[rand.randrange(len(isoforms))]
+            parts = [get_transcript_part(rand, chromosomes_dict, part_isoform, *get_random_interval(rand, part_isoform.len, 100))
+                     for part_isoform in [isoform, other_isoform]]
+            transcripts.append((name, ''.join(part.seq for part in parts), parts))
+        elif kind < RANDOM_FRACTION + FUSION_FRACTION + FRAGMENT_FRACTION:
+            part = get_transcript_part(rand, chromosomes_dict, isoform, *get_random_interval(rand, isoform.len, 100))
+            transcripts.append((name, part.seq, [part]))
+        else:
+            part = get_transcript_part(rand, chromosomes_dict, isoform, 0, isoform.len)
+            transcripts.append((name, part.seq, [part]))
+
+    return transcripts
+
+
+# PSL line of part of transcript, query starts of blocks on minus strand are on reverse complement of transcript:
+def get_psl_line(name, transcript_len, part_start, part, chr_len):
+    blocks = part.isoform.get_blocks(part.start, part.end)
+    part_len = part.end - part.start
+
+    if part.strand == '+':
+        q_offset = part_start
+    else:
+        q_offset = transcript_len - part_start - part_len
+    q_starts = []
+    for t_start, block_len in blocks:
+        q_starts.append(q_offset)
+        q_offset += block_len
+
+    t_gaps = [blocks[i + 1][0] - (blocks[i][0] + blocks[i][1]) for i in range(len(blocks) - 1)]
+
+    fields = [part_len - part.mismatches, part.mismatches, 0, 0, 0, 0, len(t_gaps), sum(t_gaps), part.strand, name,
+              transcript_len, part_start, part_start + part_len, part.isoform.chr_name, chr_len, blocks[0][0],
+              blocks[-1][0] + blocks[-1][1], len(blocks),
+              ''.join('{},'.format(block_len) for _, block_len in blocks),
+              ''.join('{},'.format(q_start) for q_start in q_starts),
+              ''.join('{},'.format(t_start) for t_start, _ in blocks)]
+    return '\t'.join(str(field) for field in fields) + '\n'
+
+
+# BLAST6 line of part of transcript aligned to isoform sequence (isoforms on minus strand are reverse complemented):
+def get_blast6_line(name, part_start, part):
+    isoform = part.isoform
+    part_len = part.end - part.start
+
+    if isoform.strand == '+':
+        s_start, s_end = part.start, part.end
+    else:
+        s_start, s_end = isoform.len - part.end, isoform.len - part.start
+
+    if part.strand == isoform.strand:
+        s_strand = 'plus'
+        s_start, s_end = s_start + 1, s_end
+    else:
+        s_strand = 'minus'
+        s_start, s_end = s_end, s_start + 1
+
+    pident = 100.0 * (part_len - part.mismatches) / part_len
+    fields = [name, isoform.id, '{:.3f}'.format(pident), part_len, part.mismatches, 0, part_start + 1,
+              part_start + part_len, s_start, s_end, '0.0', '{:.1f}'.format(1.8 * part_len), s_strand]
+    return '\t'.join(str(field) for field in fields) + '\n'
+
+
+def write_transcripts(output_dir, truth_dir, transcripts, chromosomes_lens):
+    write_fasta(os.path.join(output_dir, TRANSCRIPTS_NAME), [(name, seq) for name, seq, _ in transcripts])
+
+    with open(os.path.join(truth_dir, TRUTH_PSL_NAME), 'w') as out_psl, \
+            open(os.path.join(truth_dir, TRUTH_BLAST6_NAME), 'w') as out_blast6:
+        for name, seq, parts in transcripts:
+            part_start = 0
+            for part in parts:
+                out_psl.write(get_psl_line(name, len(seq), part_start, part, chromosomes_lens[part.isoform.chr_name]))
+                out_blast6.write(get_blast6_line(name, part_start, part))
+                part_start += part.end - part.start
+
+
+def write_reads(rand, output_dir, truth_dir, chromosomes, isoforms, reads_per_isoform):
+    chromosomes_dict = dict(chromosomes)
+
+    with open(os.path.join(output_dir, READS_NAME), 'w') as out_fastq, \
+            open(os.path.join(truth_dir, TRUTH_SAM_NAME), 'w') as out_sam:
+        out_sam.write('@HD\tVN:1.4\n')
+        for chr_name, chr_seq in chromosomes:
+            out_sam.write('@SQ\tSN:{}\tLN:{}\n'.format(chr_name, len(chr_seq)))
+
+        i_read = 0
+        for isoform in isoforms:
+            if isoform.len < READ_LEN:
+                continue
+            spliced_seq = isoform.get_spliced_seq(chromosomes_dict[isoform.chr_name])
+            for _ in range(reads_per_isoform):
+                i_read += 1
+                name = 'read{}'.format(i_read)
+
+                start = rand.randint(0, isoform.len - READ_LEN)
+                seq, mismatches = get_mutated_seq(rand, spliced_seq[start:start + READ_LEN], MUTATION_RATE)
+
+                blocks = isoform.get_blocks(start, start + READ_LEN)
+                cigar = '{}M'.format(blocks[0][1])
+                for i_block in range(1, len(blocks)):
+                    intron_len = blocks[i_block][0] - (blocks[i_block - 1][0] + blocks[i_block - 1][1])
+                    cigar += '{}N{}M'.format(intron_len, blocks[i_block][1])
+
+                # SAM stores sequence of forward strand of chromosome, reads of minus strand are reverse complemented:
+                flag = rand.choice([0, 16])
+                read_seq = seq if flag == 0 else get_reverse_complement(seq)
+                qual = 'I' * READ_LEN
+
+                out_fastq.write('@{}\n{}\n+\n{}\n'.format(name, read_seq, qual))
+                out_sam.write('\t'.join([name, str(flag), isoform.chr_name, str(blocks[0][0] + 1), '255', cigar, '*',
+                                         '0', '0', seq, qual, 'NH:i:1', 'nM:i:{}'.format(mismatches)]) + '\n')
+
+
+def generate_synthetic_data(genes_num, reads_per_isoform, seed, output_dir):
+    rand = random.Random(seed)
+
+    truth_dir = os.path.join(output_dir, TRUTH_DIR_NAME)
+    if not os.path.exists(truth_dir):
+        os.makedirs(truth_dir)
+
+    logging.info('  Generating genome and annotation...')
+    chromosomes, genes, isoforms = generate_genome(rand, genes_num)
+    write_fasta(os.path.join(output_dir, REFERENCE_NAME), chromosomes)
+    write_gtf(os.path.join(output_dir, GTF_NAME), genes)
+
+    logging.info('  Generating transcripts...')
+    chromosomes_dict = dict(chromosomes)
+    transcripts = generate_transcripts(rand, chromosomes_dict, isoforms)
+    write_transcripts(output_dir, truth_dir, transcripts,
+                      dict((chr_name, len(chr_seq)) for chr_name, chr_seq in chromosomes))
+
+    logging.info('  Generating reads...')
+    write_reads(rand, output_dir, truth_dir, chromosomes, isoforms, reads_per_isoform)
+
+    logging.info('  {} genes, {} isoforms, {} transcripts saved to {}'.
+                 format(len(genes), len(isoforms), len(transcripts), output_dir))
+
+    return output_dir
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        logging.info('Generating synthetic data...')
+
+        generate_synthetic_data(args.genes, args.reads, args.seed, args.output_dir)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
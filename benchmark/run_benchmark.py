@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+import shutil
+
+import argparse
+
+import logging
+
+import generate_synthetic_data
+
+
+# Benchmark of rnaQUAST: synthetic data of several sizes are generated, rnaQUAST is run on them with stand-in
+# aligners and profiles of runs (profile.json with wall time, CPU time and peak RSS of every stage) are stored
+# for regression comparison by compare_profiles.py.
+
+benchmark_dirpath = os.path.dirname(os.path.realpath(__file__))
+rquast_dirpath = os.path.dirname(benchmark_dirpath)
+stand_in_aligners_dirpath = os.path.join(benchmark_dirpath, 'stand_in_aligners')
+
+sys.path.insert(0, stand_in_aligners_dirpath)
+
+import stand_in
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Benchmark rnaQUAST on synthetic data with stand-in aligners\n"
+                                            "\nUsage:\npython %(prog)s --sizes GENES_NUM [GENES_NUM ...] --output_dir OUTPUT_DIR",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    parser.add_argument('-g', '--sizes', help='Numbers of genes of synthetic data [default: 100 1000 10000]', type=int,
+                        nargs='+', default=[100, 1000, 10000])
+
+    parser.add_argument('-r', '--reads', help='Number of reads per isoform [default: 10]', type=int, default=10)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store data, rnaQUAST outputs and profiles', type=str, required=True)
+
+    parser.add_argument('-b', '--baseline_dir', help='Directory with profiles of baseline benchmark to compare with', type=str)
+
+    parser.add_argument('--threshold', help='Relative increase of wall time or peak RSS reported as regression [default: 0.1]', type=float, default=0.1)
+
+    parser.add_argument('-t', '--threads', help='Number of threads of rnaQUAST', type=int)
+
+    parser.add_argument('--blat', help='Run rnaQUAST with BLAT instead of GMAP', action='store_true')
+
+    parser.add_argument('--no_reads', help='Run rnaQUAST without reads', action='store_true')
+
+    parser.add_argument('-s', '--seed', help='Seed of random generator [default: 0]', type=int, default=0)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def get_profile_path(profiles_dir, genes_num):
+    return os.path.join(profiles_dir, '{}.profile.json'.format(genes_num))
+
+
+def run_rnaQUAST(args, data_dir, output_dir):
+    command = [sys.executable, os.path.join(rquast_dirpath, 'rnaQUAST.py'),
+               '-r', os.path.join(data_dir, generate_synthetic_data.REFERENCE_NAME),
+               '--gtf', os.path.join(data_dir, generate_synthetic_data.GTF_NAME),
+               '-c', os.path.join(data_dir, generate_synthetic_data.TRANSCRIPTS_NAME),
+               '--disable_infer_genes', '--disable_infer_transcripts', '-o', output_dir]
+    if not args.no_reads:
+        command += ['-s', os.path.join(data_dir, generate_synthetic_data.READS_NAME)]
+    if args.threads is not None:
+        command += ['-t', str(args.threads)]
+    if args.blat:
+        command += ['--blat']
+
+    # stand-in aligners are found in PATH before real ones:
+    env = dict(os.environ)
+    env['PATH'] = stand_in_aligners_dirpath + os.pathsep + env.get('PATH', '')
+    env[stand_in.TRUTH_DIR_VARIABLE] = os.path.join(data_dir, generate_synthetic_data.TRUTH_DIR_NAME)
+
+    logging.info('  ' + ' '.join(command))
+
+    return subprocess.call(command, env=env)
+
+
+def compare_with_baseline(baseline_profile_path, profile_path, threshold, output_dir):
+    command = [sys.executable, os.path.join(rquast_dirpath, 'compare_profiles.py'),
+               '-p', baseline_profile_path, profile_path, '-o', output_dir, '--threshold', str(threshold)]
+
+    logging.info('  ' + ' '.join(command))
+
+    return subprocess.call(command)
+
+
+def run_benchmark(args):
+    profiles_dir = os.path.join(args.output_dir, 'profiles')
+    if not os.path.exists(profiles_dir):
+        os.makedirs(profiles_dir)
+
+    failed_sizes = []
+    regressed_sizes = []
+    for genes_num in args.sizes:
+        logging.info('Benchmark on {} genes:'.format(genes_num))
+
+        # data are generated once and reused by next runs with the same output directory:
+        data_dir = os.path.join(args.output_dir, 'data_{}_{}_{}'.format(genes_num, args.reads, args.seed))
+        if not os.path.exists(os.path.join(data_dir, generate_synthetic_data.TRUTH_DIR_NAME)):
+            generate_synthetic_data.generate_synthetic_data(genes_num, args.reads, args.seed, data_dir)
+
+        output_dir = os.path.join(args.output_dir, 'rnaQUAST_{}'.format(genes_num))
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+
+        exit_code = run_rnaQUAST(args, data_dir, output_dir)
+        if exit_code != 0 or not os.path.exists(os.path.join(output_dir, 'profile.json')):
+            logging.error('rnaQUAST failed on {} genes!'.format(genes_num))
+            failed_sizes.append(genes_num)
+            continue
+
+        profile_path = get_profile_path(profiles_dir, genes_num)
+        shutil.copyfile(os.path.join(output_dir, 'profile.json'), profile_path)
+        logging.info('  profile saved to {}'.format(profile_path))
+
+        if args.baseline_dir is not None:
+            baseline_profile_path = get_profile_path(args.baseline_dir, genes_num)
+            if not os.path.exists(baseline_profile_path):
+                logging.warning('No baseline profile {}'.format(baseline_profile_path))
+            elif compare_with_baseline(baseline_profile_path, profile_path, args.threshold, profiles_dir) != 0:
+                regressed_sizes.append(genes_num)
+
+    return failed_sizes, regressed_sizes
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        failed_sizes, regressed_sizes = run_benchmark(args)
+
+        if regressed_sizes:
+            logging.warning('Regressions on {} genes'.format(', '.join(str(genes_num) for genes_num in regressed_sizes)))
+
+        # non-zero exit code for failures and regressions, so benchmark can be used in scripts:
+        if failed_sizes or regressed_sizes:
+            sys.exit(1)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
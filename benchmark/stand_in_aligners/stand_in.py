@@ -0,0 +1,246 @@
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import gzip
+
+
+# Stand-in aligners for benchmarks: they take command lines of BLAT, GMAP, makeblastdb, blastn and STAR as rnaQUAST
+# runs them and print alignments known by construction of synthetic data instead of aligning. Directory with truth
+# files of generate_synthetic_data.py is given by environment variable.
+
+TRUTH_DIR_VARIABLE = 'RNAQUAST_BENCHMARK_TRUTH'
+
+TRUTH_PSL_NAME = 'transcripts.psl'
+TRUTH_BLAST6_NAME = 'transcripts.blast6'
+TRUTH_SAM_NAME = 'reads.sam'
+
+# file with names of sequences of stand-in indexes:
+NAMES_NAME = 'names.txt'
+
+# suffix added by rnaQUAST to transcript_id of annotation:
+ISOFORM_ID_SUFFIX = '_transcript'
+
+
+def get_version(tool):
+    return '{} stand-in for rnaQUAST benchmark'.format(tool)
+
+
+def get_truth_path(truth_name):
+    truth_dir = os.environ.get(TRUTH_DIR_VARIABLE)
+    if truth_dir is None:
+        sys.stderr.write('{} is not set! Please set it to truth directory of synthetic data.\n'.format(TRUTH_DIR_VARIABLE))
+        sys.exit(2)
+    return os.path.join(truth_dir, truth_name)
+
+
+# options of command line, values of options from value_options are next argument, values of options from
+# multi_value_options are all next arguments until next option:
+def parse_arguments(argv, value_options=(), multi_value_options=()):
+    positionals = []
+    options = {}
+
+    i = 0
+    while i < len(argv):
+        argument = argv[i]
+        i += 1
+        if len(argument) < 2 or argument[0] != '-':
+            positionals.append(argument)
+        elif '=' in argument:
+            option, value = argument.split('=', 1)
+            options[option] = [value]
+        elif argument in value_options:
+            options[argument] = argv[i:i + 1]
+            i += 1
+        elif argument in multi_value_options:
+            options[argument] = []
+            while i < len(argv) and not argv[i].startswith('-'):
+                options[argument].append(argv[i])
+                i += 1
+        else:
+            options[argument] = []
+
+    return positionals, options
+
+
+def open_file(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt')
+    return open(path, 'r')
+
+
+def get_fasta_names(path):
+    names = set()
+    with open_file(path) as in_handle:
+        for line in in_handle:
+            if line.startswith('>'):
+                names.add(line[1:].split()[0])
+    return names
+
+
+def get_fastq_names(path):
+    names = set()
+    with open_file(path) as in_handle:
+        for i_line, line in enumerate(in_handle):
+            if i_line % 4 == 0:
+                names.add(line[1:].split()[0])
+    return names
+
+
+# truth lines with names of queries and targets from given sets (None is any name) in order of truth file:
+def get_truth_lines(truth_name, i_query_column, queries_names, i_target_column=None, targets_names=None):
+    lines = []
+    with open(get_truth_path(truth_name), 'r') as in_handle:
+        for line in in_handle:
+            if line.startswith('@'):
+                continue
+            fields = line.split('\t')
+            if fields[i_query_column] not in queries_names:
+                continue
+            if targets_names is not None and fields[i_target_column] not in targets_names:
+                continue
+            lines.append(line)
+    return lines
+
+
+def write_names(index_dir, names):
+    if not os.path.exists(index_dir):
+        os.makedirs(index_dir)
+    with open(os.path.join(index_dir, NAMES_NAME), 'w') as out_handle:
+        for name in sorted(names):
+            out_handle.write(name + '\n')
+
+
+def read_names(index_dir):
+    names_path = os.path.join(index_dir, NAMES_NAME)
+    if not os.path.exists(names_path):
+        return None
+    with open(names_path, 'r') as in_handle:
+        return set(line.strip() for line in in_handle)
+
+
+# blat database query output [options]
+def run_blat(argv):
+    positionals, options = parse_arguments(argv)
+    if len(positionals) < 3:
+        sys.stderr.write('Usage: blat database query output [options]\n')
+        return 1
+    reference_path, query_path, out_path = positionals[:3]
+
+    lines = get_truth_lines(TRUTH_PSL_NAME, 9, get_fasta_names(query_path), 13, get_fasta_names(reference_path))
+    with open(out_path, 'w') as out_handle:
+        out_handle.writelines(lines)
+
+    return 0
+
+
+# gmap_build -D index_dir -d ref_label reference
+def run_gmap_build(argv):
+    positionals, options = parse_arguments(argv, value_options=('-D', '-d'))
+    if '-D' not in options or '-d' not in options or len(positionals) < 1:
+        sys.stderr.write('Usage: gmap_build -D index_dir -d ref_label reference\n')
+        return 1
+
+    write_names(os.path.join(options['-D'][0], options['-d'][0]), get_fasta_names(positionals[0]))
+
+    return 0
+
+
+# gmap -D index_dir -d ref_label transcripts --format=1 [options] > output
+def run_gmap(argv, tool='gmap'):
+    positionals, options = parse_arguments(argv, value_options=('-D', '-d', '-t'))
+    if '--version' in options:
+        sys.stdout.write(get_version(tool) + '\n')
+        return 0
+    if '-D' not in options or '-d' not in options or len(positionals) < 1:
+        sys.stderr.write('Usage: {} -D index_dir -d ref_label transcripts --format=1\n'.format(tool))
+        return 1
+
+    targets_names = read_names(os.path.join(options['-D'][0], options['-d'][0]))
+    sys.stdout.writelines(get_truth_lines(TRUTH_PSL_NAME, 9, get_fasta_names(positionals[0]), 13, targets_names))
+
+    return 0
+
+
+# makeblastdb -in isoforms -dbtype nucl -out db
+def run_makeblastdb(argv):
+    positionals, options = parse_arguments(argv, value_options=('-in', '-dbtype', '-out'))
+    if '-version' in options:
+        sys.stdout.write(get_version('makeblastdb') + '\n')
+        return 0
+    if '-in' not in options or '-out' not in options:
+        sys.stderr.write('Usage: makeblastdb -in isoforms -dbtype nucl -out db\n')
+        return 1
+
+    write_names(options['-out'][0] + '.stand_in', get_fasta_names(options['-in'][0]))
+
+    return 0
+
+
+# blastn -query transcripts -out output -db db -outfmt "6 ..." [options]
+def run_blastn(argv):
+    positionals, options = \
+        parse_arguments(argv, value_options=('-query', '-out', '-db', '-outfmt', '-num_alignments', '-evalue',
+                                             '-num_threads'))
+    if '-version' in options:
+        sys.stdout.write(get_version('blastn') + '\n')
+        return 0
+    if '-query' not in options or '-out' not in options or '-db' not in options:
+        sys.stderr.write('Usage: blastn -query transcripts -out output -db db -outfmt "6 ..."\n')
+        return 1
+
+    # rnaQUAST can add suffix to isoforms ids of annotation, so ids of truth are mapped to ids of database:
+    targets_names = read_names(options['-db'][0] + '.stand_in')
+    if targets_names is not None:
+        targets_names = dict((name[:-len(ISOFORM_ID_SUFFIX)] if name.endswith(ISOFORM_ID_SUFFIX) else name, name)
+                             for name in targets_names)
+
+    lines = get_truth_lines(TRUTH_BLAST6_NAME, 0, get_fasta_names(options['-query'][0]), 1, targets_names)
+    with open(options['-out'][0], 'w') as out_handle:
+        for line in lines:
+            fields = line.split('\t')
+            if targets_names is not None:
+                fields[1] = targets_names[fields[1]]
+            out_handle.write('\t'.join(fields))
+
+    return 0
+
+
+# STAR --runMode genomeGenerate --genomeDir genome_dir --genomeFastaFiles reference [options] or
+# STAR --genomeDir genome_dir --readFilesIn reads [reads] --outFileNamePrefix prefix [options]
+def run_STAR(argv):
+    positionals, options = parse_arguments(argv, multi_value_options=tuple(argument for argument in argv
+                                                                           if argument.startswith('--')))
+    if '--version' in options:
+        sys.stdout.write(get_version('STAR') + '\n')
+        return 0
+    if '--genomeDir' not in options:
+        sys.stderr.write('Usage: STAR --genomeDir genome_dir [options]\n')
+        return 1
+
+    genome_dir = options['--genomeDir'][0]
+    if options.get('--runMode') == ['genomeGenerate']:
+        names = set()
+        for reference_path in options.get('--genomeFastaFiles', []):
+            names |= get_fasta_names(reference_path)
+        write_names(genome_dir, names)
+        return 0
+
+    if '--readFilesIn' not in options:
+        sys.stderr.write('Usage: STAR --genomeDir genome_dir --readFilesIn reads [reads] --outFileNamePrefix prefix\n')
+        return 1
+
+    reads_names = set()
+    for reads_path in options['--readFilesIn']:
+        reads_names |= get_fastq_names(reads_path)
+    targets_names = read_names(genome_dir)
+
+    out_path = options.get('--outFileNamePrefix', ['./'])[0] + 'Aligned.out.sam'
+    with open(out_path, 'w') as out_handle:
+        with open(get_truth_path(TRUTH_SAM_NAME), 'r') as in_handle:
+            for line in in_handle:
+                if line.startswith('@'):
+                    out_handle.write(line)
+        out_handle.writelines(get_truth_lines(TRUTH_SAM_NAME, 0, reads_names, 2, targets_names))
+
+    return 0
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+
+import datetime
+
+import argparse
+
+import json
+
+import logging
+
+
+def get_path(output_dir, program_name):
+    # if --output_dir not use, create default path for results:
+    out_path = program_name + '_' + datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S') + '.txt'
+    if output_dir is not None:
+        out_path = os.path.join(output_dir, out_path)
+    return out_path
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Compare profiles of two rnaQUAST runs utils\n"
+                                            "\nUsage:\npython %(prog)s --profiles BASELINE_PROFILE_JSON PROFILE_JSON --output_dir",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    # INPUT DATA:
+    parser.add_argument('-p', '--profiles', help='Two files profile.json of baseline and current rnaQUAST runs', type=str, nargs=2)
+
+    parser.add_argument('-o', '--output_dir', help='Directory to store result [default: current_directory/compare_profiles_<datetime>]', type=str)
+
+    parser.add_argument('-t', '--threshold', help='Relative increase of wall time or peak RSS reported as regression [default: 0.1]', type=float, default=0.1)
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+# records of stages and external tools with the same name are summed up, peak RSS is maximal over them:
+def get_profile(path):
+    names = []
+    profile = {}
+
+    with open(path, 'r') as fin:
+        run_profile = json.load(fin)
+
+    names.append('run')
+    profile['run'] = {'wall_time': run_profile['wall_time'], 'cpu_time': run_profile['cpu_time'] + run_profile['children_cpu_time'],
+                      'peak_rss_mb': max(run_profile['peak_rss_mb'], run_profile['children_peak_rss_mb'])}
+
+    for record in run_profile['records']:
+        name = '{} {}'.format(record['type'], record['name'])
+        if name not in profile:
+            names.append(name)
+            profile[name] = {'wall_time': 0.0, 'cpu_time': 0.0, 'peak_rss_mb': 0.0}
+        profile[name]['wall_time'] += record['wall_time']
+        profile[name]['cpu_time'] += record['cpu_time'] + record['children_cpu_time']
+        profile[name]['peak_rss_mb'] = max(profile[name]['peak_rss_mb'], record['peak_rss_mb'])
+
+    logging.debug('names: ' + str(names))
+    logging.debug('profile: ' + str(profile))
+
+    return names, profile
+
+
+def get_ratio(value1, value2):
+    if value1 == 0:
+        return None
+    return value2 / value1
+
+
+def compare_profiles(path1, path2, threshold):
+    names1, profile1 = get_profile(path1)
+    names2, profile2 = get_profile(path2)
+
+    names = names1 + [name for name in names2 if name not in profile1]
+
+    comparison = {}
+    regressions = []
+    for name in names:
+        comparison[name] = []
+        for key in ['wall_time', 'cpu_time', 'peak_rss_mb']:
+            value1 = profile1[name][key] if name in profile1 else None
+            value2 = profile2[name][key] if name in profile2 else None
+            ratio = get_ratio(value1, value2) if value1 is not None and value2 is not None else None
+            comparison[name].append((value1, value2, ratio))
+
+            # CPU time of stages is of whole process, so only wall time and peak RSS are checked:
+            if key != 'cpu_time' and ratio is not None and ratio > 1 + threshold:
+                regressions.append((name, key, ratio))
+
+    logging.debug('comparison: ' + str(comparison))
+
+    return names, comparison, regressions
+
+
+def print_txt(names, comparison, regressions, path_txt):
+    fout_txt = open(path_txt, 'w')
+
+    column_width_str = '{:<50}'
+    fout_txt.write(column_width_str.format('stage / tool'))
+    for key in ['wall time, s', 'CPU time, s', 'peak RSS, MB']:
+        column_width_str = '{:<45}'
+        fout_txt.write(column_width_str.format(key + ' (baseline / current / ratio)'))
+    fout_txt.write('\n')
+
+    for name in names:
+        column_width_str = '{:<50}'
+        fout_txt.write(column_width_str.format(name))
+        for value1, value2, ratio in comparison[name]:
+            column_width_str = '{:<45}'
+            fout_txt.write(column_width_str.format(' / '.join(['*' if value is None else '{:.3f}'.format(value)
+                                                              for value in [value1, value2, ratio]])))
+        fout_txt.write('\n')
+
+    fout_txt.write('\nRegressions:\n')
+    for name, key, ratio in regressions:
+        fout_txt.write('  {}: {} increased {:.2f} times\n'.format(name, key, ratio))
+    fout_txt.close()
+
+    logging.info('  saved to\n' + '    ' + '{}\n'.format(path_txt))
+
+
+if __name__ == '__main__':
+    try:
+        program_name = 'compare_profiles'
+
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        logging.info('Comparing profiles...')
+
+        out_path = get_path(args.output_dir, program_name)
+
+        names, comparison, regressions = compare_profiles(args.profiles[0], args.profiles[1], args.threshold)
+
+        print_txt(names, comparison, regressions, out_path)
+
+        for name, key, ratio in regressions:
+            logging.warning('{}: {} increased {:.2f} times'.format(name, key, ratio))
+
+        # non-zero exit code for regressions, so comparison can be used in scripts:
+        if regressions:
+            sys.exit(1)
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
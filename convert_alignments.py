@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+__author__ = 'letovesnoi'
+
+import sys
+import os
+import subprocess
+
+import argparse
+
+import logging
+
+rquast_dirpath = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+
+sys.path.insert(0, rquast_dirpath)
+
+from general import UtilsBinaryAlignment
+
+
+def get_arguments():
+    # use --help for running without arguments:
+    if len(sys.argv) == 1:
+        command = 'python {} -h'.format(sys.argv[0])
+        subprocess.call(command, shell=True)
+        sys.exit(0)
+
+    parser = \
+        argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                description="Convert PSL alignments to binary alignments container accepted by rnaQUAST --alignment and back\n"
+                                            "\nUsage:\npython %(prog)s --input PSL --output BINARY",
+                                conflict_handler='resolve',
+                                prog=sys.argv[0])
+
+    # INPUT DATA:
+    parser.add_argument('-i', '--input', help='File with alignments in PSL format or binary container with --to_psl', type=str, required=True)
+
+    parser.add_argument('-o', '--output', help='File to store binary container or PSL alignments with --to_psl', type=str, required=True)
+
+    parser.add_argument('--to_psl', help='Convert binary container to PSL format', action='store_true')
+
+    parser.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    try:
+        args = get_arguments()
+
+        if args.debug:
+            logging.basicConfig(level=logging.DEBUG)
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+        is_binary = UtilsBinaryAlignment.is_binary_psl_file(args.input)
+        if args.to_psl:
+            if not is_binary:
+                logging.error('{} is not binary alignments container!'.format(args.input))
+                sys.exit(1)
+
+            logging.info('Converting binary alignments container to PSL...')
+            UtilsBinaryAlignment.convert_binary_to_psl(args.input, args.output)
+        else:
+            if is_binary:
+                logging.error('{} is already binary alignments container!'.format(args.input))
+                sys.exit(1)
+
+            logging.info('Converting PSL alignments to binary container...')
+            UtilsBinaryAlignment.convert_psl_to_binary(args.input, args.output)
+
+        logging.info('  saved to\n' + '    ' + '{}\n'.format(args.output))
+
+    except Exception:
+        _, exc_value, _ = sys.exc_info()
+        logging.exception(exc_value)
+        logging.error('Exception caught!')
+        sys.exit(1)
@@ -1,11 +1,14 @@
 __author__ = 'letovesnoi'
 
 import os
+import heapq
 from datetime import datetime
 from collections import defaultdict
 
+from general import rqconfig
 from general import UtilsGeneral
 from general import best_alignment_set
+from general import UtilsBinaryAlignment
 
 from objects import Alignment
 
@@ -35,12 +38,17 @@ class AlignmentsReport():
             alignment_report.blast6_report.get_blast6_alignments_report(label, blast6_file, tmp_dir, min_alignment_threshold, logger, ALIGNMENT_THRESHOLDS)
 
         if alignment_report.blat_report != None:
-            alignment_report.blat_report.get_psl_alignments_report(label, psl_file, transcripts_dict, tmp_dir, min_alignment_threshold, logger, ALIGNMENT_THRESHOLDS)
+            # alignments are processed lazily, so created report is kept:
+            alignment_report.blat_report = \
+                alignment_report.blat_report.get_psl_alignments_report(label, psl_file, transcripts_dict, tmp_dir, min_alignment_threshold, logger, ALIGNMENT_THRESHOLDS)
 
         return alignment_report
 
     @classmethod
     def update_alignment_file(cls, single_transcript_lines, fout_file):
+        # file isn't written out of debug mode:
+        if fout_file is None:
+            return
         for line in single_transcript_lines:
             fout_file.write(line + '\n')
 
@@ -183,149 +191,175 @@ class AlignmentsReport():
             # file with low complexity best alignments:
             self.low_complexity_file = os.path.join(tmp_dir, '{}.low_complexity.fasta'.format(label))
 
+            # psl file sorted by query names, if input psl file isn't grouped by them:
+            self.grouped_psl_file = os.path.join(tmp_dir, '{}.grouped.psl'.format(label))
 
-        # create files with psl alignments report:
+            # lazily processed best alignments of transcripts, see iterate_psl_alignments_report:
+            self.psl_alignments = None
+
+
+        # create psl alignments report, alignments are processed lazily by iterating over blat_report.psl_alignments:
         @classmethod
         def get_psl_alignments_report(cls, label, psl_file, transcripts_dict, tmp_dir, args_min_alignment, logger, ALIGNMENT_THRESHOLDS):
-            start_union_time = datetime.now()
-
             # CREATE TEMPORARY ALIGNMENTS REPORT:
             blat_report = cls(label, tmp_dir)
 
-            # blat_report.wout_strange_plsl_file = remove_cross_blocks(psl_file, blat_report.wout_strange_plsl_file)
+            blat_report.psl_alignments = \
+                blat_report.iterate_psl_alignments_report(psl_file, transcripts_dict, args_min_alignment, logger,
+                                                          ALIGNMENT_THRESHOLDS)
+
+            return blat_report
+
+
+        # single pass over psl file, parsed alignments are carried from stage to stage in memory.
+        # Yields best lines and alignments of each transcript and whether transcript is misassembled,
+        # text psl files of all stages are written only in debug mode:
+        def iterate_psl_alignments_report(self, psl_file, transcripts_dict, args_min_alignment, logger, ALIGNMENT_THRESHOLDS):
+            start_union_time = datetime.now()
 
             # open files for report:
-            fout_assembled_psl = open(blat_report.assembled_psl_file, 'w')
-            fout_uniquely_file = open(blat_report.uniquely_psl_file, 'w')
-            fout_paralogous_psl = open(blat_report.paralogous_psl_file, 'w')
-            fout_misassembled_union = open(blat_report.misassembled_psl_union_file, 'w')
-            fout_misassembled_psl = open(blat_report.misassembled_psl_file, 'w')
-            fout_fake_blat = open(blat_report.fake_blat_file, 'w')
-            fout_psl_wolqg = open(blat_report.psl_wolqg_file, 'w')
-            # fout_low_complexity = open(blat_report.low_complexity_file, 'w')
+            fout_psl_wout_cross = None
+            fout_assembled_psl = None
+            fout_uniquely_file = None
+            fout_paralogous_psl = None
+            fout_misassembled_union = None
+            fout_misassembled_psl = None
+            fout_fake_blat = None
+            fout_psl_wolqg = None
+            fout_low_complexity = None
+            if rqconfig.debug:
+                fout_psl_wout_cross = open(self.psl_wout_cross_path, 'w')
+                fout_assembled_psl = open(self.assembled_psl_file, 'w')
+                fout_uniquely_file = open(self.uniquely_psl_file, 'w')
+                fout_paralogous_psl = open(self.paralogous_psl_file, 'w')
+                fout_misassembled_union = open(self.misassembled_psl_union_file, 'w')
+                fout_misassembled_psl = open(self.misassembled_psl_file, 'w')
+                fout_fake_blat = open(self.fake_blat_file, 'w')
+                fout_psl_wolqg = open(self.psl_wolqg_file, 'w')
+                fout_low_complexity = open(self.low_complexity_file, 'w')
 
             logger.print_timestamp('  ')
-            logger.info('  Getting GMAP (or BLAT) alignments report files...')
+            logger.info('  Getting GMAP (or BLAT) alignments report...')
 
-            blat_report.psl_wout_cross_path = \
-                remove_strange_psl_alignments(psl_file, blat_report.psl_wout_cross_path)
+            psl_lines_alignments = iterate_unstrange_psl_alignments(psl_file, self.grouped_psl_file, logger,
+                                                                    fout_psl_wout_cross)
 
-            with open(blat_report.psl_wout_cross_path, 'r') as fin:
-                line1 = fin.readline().strip()
-                line2 = fin.readline().strip()
-                while line1 != '':
-                    single_transcript_lines, single_transcript_alignments, line1, line2 = \
-                        get_curr_single_transcript_lines_alignments(args_min_alignment, line1, line2, fin, True)
+            for single_transcript_lines, single_transcript_alignments in \
+                    iterate_single_transcript_lines_alignments(psl_lines_alignments, args_min_alignment):
+                # SPLIT ALIGNMENTS WITH LARGE QUERY GAPS:
+                single_transcript_lines, single_transcript_alignments = \
+                    split_large_query_gap_single_transcript_alignments(single_transcript_alignments, fout_psl_wolqg,
+                                                                       ALIGNMENT_THRESHOLDS.QUERY_GAP_THRESHOLD,
+                                                                       ALIGNMENT_THRESHOLDS.MIN_SPLIT_ALIGNMENT_THRESHOLD)
 
-                    if len(single_transcript_lines) == 0 and len(single_transcript_alignments) == 0:
-                        #logger.debug('    Skipping alignments...')
-                        continue
+                if len(single_transcript_lines) == 0 and len(single_transcript_alignments) == 0:
+                    #logger.debug('    Skipping alignments...')
+                    continue
 
-                    # SPLIT ALIGNMENTS WITH LARGE QUERY GAPS:
-                    single_transcript_lines, single_transcript_alignments = \
-                        split_large_query_gap_single_transcript_alignments(single_transcript_alignments, fout_psl_wolqg,
-                                                                           ALIGNMENT_THRESHOLDS.QUERY_GAP_THRESHOLD,
-                                                                           ALIGNMENT_THRESHOLDS.MIN_SPLIT_ALIGNMENT_THRESHOLD)
+                # GET UNION ALIGNMENTS:
+                best_union_alignments = best_alignment_set.get_best_alignment_set(single_transcript_alignments, ALIGNMENT_THRESHOLDS)
+                best_union_lines = get_best_lines_set(best_union_alignments)
 
-                    if len(single_transcript_lines) == 0 and len(single_transcript_alignments) == 0:
-                        #logger.debug('    Skipping alignments...')
-                        continue
+                # GET UNION FAKE BLAT ALIGNMENTS:
+                best_union_lines, best_union_alignments, single_transcript_lines, single_transcript_alignments = \
+                    get_union_fake_blat_alignments(best_union_lines, best_union_alignments, single_transcript_lines,
+                                                   single_transcript_alignments, fout_fake_blat, ALIGNMENT_THRESHOLDS)
 
-                    # GET UNION ALIGNMENTS:
-                    best_union_alignments = best_alignment_set.get_best_alignment_set(single_transcript_alignments, ALIGNMENT_THRESHOLDS)
-                    best_union_lines = get_best_lines_set(best_union_alignments)
+                # REMOVE LOW COMPLEXITY TAILS:
+                best_union_lines, best_union_alignments, single_transcript_lines, single_transcript_alignments = \
+                    remove_low_complexity(best_union_lines, best_union_alignments, single_transcript_lines,
+                                          single_transcript_alignments, transcripts_dict, fout_low_complexity,
+                                          ALIGNMENT_THRESHOLDS.LOW_COMPLEXITY_LEN_THRESHOLD)
 
-                    # GET UNION FAKE BLAT ALIGNMENTS:
-                    best_union_lines, best_union_alignments, single_transcript_lines, single_transcript_alignments = \
-                        get_union_fake_blat_alignments(best_union_lines, best_union_alignments, single_transcript_lines,
-                                                       single_transcript_alignments, fout_fake_blat, ALIGNMENT_THRESHOLDS)
+                # choose over single transcript alignments best union alignments and them lines:
+                # (it can be multiple union alignment cause misassemble or list of single union alignments cause paralogs)
+                # FOR MISASSEMBLIES:
+                if len(best_union_lines) > 1 and len(best_union_alignments) > 1:
+                    # UPDATE ALIGNMENTS FILES:
+                    AlignmentsReport.update_alignment_file(best_union_lines, fout_misassembled_union)
+                    AlignmentsReport.update_alignment_file(single_transcript_lines, fout_misassembled_psl)
 
-                    # REMOVE LOW COMPLEXITY TAILS:
-                    best_union_lines, best_union_alignments, single_transcript_lines, single_transcript_alignments = \
-                        remove_low_complexity(best_union_lines, best_union_alignments, single_transcript_lines,
-                                              single_transcript_alignments, transcripts_dict, blat_report.low_complexity_file,
-                                              ALIGNMENT_THRESHOLDS.LOW_COMPLEXITY_LEN_THRESHOLD)
+                    yield best_union_lines, best_union_alignments, True
 
-                    # choose over single transcript alignments best union alignments and them lines:
-                    # (it can be multiple union alignment cause misassemble or list of single union alignments cause paralogs)
-                    # FOR MISASSEMBLIES:
-                    if len(best_union_lines) > 1 and len(best_union_alignments) > 1:
-                        # UPDATE ALIGNMENTS FILES:
-                        AlignmentsReport.update_alignment_file(best_union_lines, fout_misassembled_union)
-                        AlignmentsReport.update_alignment_file(single_transcript_lines, fout_misassembled_psl)
+                # FOR ASSEMBLED TRANSCRIPT:
+                elif len(best_union_lines) == 1 and len(best_union_alignments) == 1:
+                    is_paralogous = False
 
-                    # FOR ASSEMBLED TRANSCRIPT:
-                    elif len(best_union_lines) == 1 and len(best_union_alignments) == 1:
-                        is_paralogous = False
+                    assembled_lines = []
+                    assembled_alignments = []
 
-                        curr_single_transcript_alignments = single_transcript_alignments[:]
-                        curr_single_transcript_lines = single_transcript_lines[:]
+                    curr_single_transcript_alignments = single_transcript_alignments[:]
+                    curr_single_transcript_lines = single_transcript_lines[:]
 
-                        best_single_score = best_union_alignments[0].matches
+                    best_single_score = best_union_alignments[0].matches
 
-                        curr_single_score = best_single_score
+                    curr_single_score = best_single_score
 
-                        prev_best_union_lines = best_union_lines
+                    prev_best_union_lines = best_union_lines
 
-                        while best_single_score == curr_single_score and len(best_union_alignments) == 1 and curr_single_transcript_alignments != []:
-                            # UPDATE BEST ALIGNMENTS FILE:
-                            AlignmentsReport.update_alignment_file(best_union_lines, fout_assembled_psl)
+                    while best_single_score == curr_single_score and len(best_union_alignments) == 1 and curr_single_transcript_alignments != []:
+                        # UPDATE BEST ALIGNMENTS:
+                        assembled_lines += best_union_lines
+                        assembled_alignments += best_union_alignments
+                        AlignmentsReport.update_alignment_file(best_union_lines, fout_assembled_psl)
 
-                            prev_best_union_lines = best_union_lines
+                        prev_best_union_lines = best_union_lines
 
-                            curr_single_transcript_lines.remove(best_union_lines[0])
-                            curr_single_transcript_alignments.remove(best_union_alignments[0])
+                        curr_single_transcript_lines.remove(best_union_lines[0])
+                        curr_single_transcript_alignments.remove(best_union_alignments[0])
 
-                            if curr_single_transcript_lines != [] and curr_single_transcript_alignments != []:
-                                # GET UNION ALIGNMENTS:
-                                best_union_alignments = best_alignment_set.get_best_alignment_set(curr_single_transcript_alignments, ALIGNMENT_THRESHOLDS)
-                                best_union_lines = get_best_lines_set(best_union_alignments)
+                        if curr_single_transcript_lines != [] and curr_single_transcript_alignments != []:
+                            # GET UNION ALIGNMENTS:
+                            best_union_alignments = best_alignment_set.get_best_alignment_set(curr_single_transcript_alignments, ALIGNMENT_THRESHOLDS)
+                            best_union_lines = get_best_lines_set(best_union_alignments)
 
-                                # GET UNION FAKE BLAT ALIGNMENTS:
-                                best_union_lines, best_union_alignments, curr_single_transcript_lines, curr_single_transcript_alignments = \
-                                    get_union_fake_blat_alignments(best_union_lines, best_union_alignments, curr_single_transcript_lines,
-                                                                   curr_single_transcript_alignments, fout_fake_blat, ALIGNMENT_THRESHOLDS)
+                            # GET UNION FAKE BLAT ALIGNMENTS:
+                            best_union_lines, best_union_alignments, curr_single_transcript_lines, curr_single_transcript_alignments = \
+                                get_union_fake_blat_alignments(best_union_lines, best_union_alignments, curr_single_transcript_lines,
+                                                               curr_single_transcript_alignments, fout_fake_blat, ALIGNMENT_THRESHOLDS)
 
-                                curr_single_score = best_union_alignments[0].matches
+                            curr_single_score = best_union_alignments[0].matches
 
-                                # REMOVE LOW COMPLEXITY TAILS:
-                                best_union_lines, best_union_alignments, curr_single_transcript_lines, curr_single_transcript_alignments = \
-                                    remove_low_complexity(best_union_lines, best_union_alignments, curr_single_transcript_lines,
-                                                          curr_single_transcript_alignments, transcripts_dict, blat_report.low_complexity_file,
-                                                          ALIGNMENT_THRESHOLDS.LOW_COMPLEXITY_LEN_THRESHOLD)
+                            # REMOVE LOW COMPLEXITY TAILS:
+                            best_union_lines, best_union_alignments, curr_single_transcript_lines, curr_single_transcript_alignments = \
+                                remove_low_complexity(best_union_lines, best_union_alignments, curr_single_transcript_lines,
+                                                      curr_single_transcript_alignments, transcripts_dict, fout_low_complexity,
+                                                      ALIGNMENT_THRESHOLDS.LOW_COMPLEXITY_LEN_THRESHOLD)
 
-                            if best_single_score == curr_single_score and len(best_union_alignments) == 1 and curr_single_transcript_alignments != []:
-                                is_paralogous = True
+                        if best_single_score == curr_single_score and len(best_union_alignments) == 1 and curr_single_transcript_alignments != []:
+                            is_paralogous = True
 
-                            if is_paralogous == True:
-                                AlignmentsReport.update_alignment_file(prev_best_union_lines, fout_paralogous_psl)
+                        if is_paralogous == True:
+                            AlignmentsReport.update_alignment_file(prev_best_union_lines, fout_paralogous_psl)
 
-                        if is_paralogous == False:
-                            AlignmentsReport.update_alignment_file(prev_best_union_lines, fout_uniquely_file)
+                    if is_paralogous == False:
+                        AlignmentsReport.update_alignment_file(prev_best_union_lines, fout_uniquely_file)
 
+                    yield assembled_lines, assembled_alignments, False
 
-            logger.info('    saved to ' + blat_report.assembled_psl_file + ' (contains best alignments for assembled transcripts)\n' +
-                        ' ' * 13 + blat_report.uniquely_psl_file + ' (contains best alignments for uniquely aligned assembled transcripts)\n' +
-                        ' ' * 13 + blat_report.paralogous_psl_file + ' (contains best alignments for assembled transcripts having paralogs)\n' +
-                        ' ' * 13 + blat_report.misassembled_psl_union_file + ' (contains best alignments for misassembled transcripts)\n' +
-                        ' ' * 13 + blat_report.misassembled_psl_file + ' (contains all alignments for misassembled transcripts)')
+            if rqconfig.debug:
+                logger.info('    saved to ' + self.assembled_psl_file + ' (contains best alignments for assembled transcripts)\n' +
+                            ' ' * 13 + self.uniquely_psl_file + ' (contains best alignments for uniquely aligned assembled transcripts)\n' +
+                            ' ' * 13 + self.paralogous_psl_file + ' (contains best alignments for assembled transcripts having paralogs)\n' +
+                            ' ' * 13 + self.misassembled_psl_union_file + ' (contains best alignments for misassembled transcripts)\n' +
+                            ' ' * 13 + self.misassembled_psl_file + ' (contains all alignments for misassembled transcripts)')
 
-            # close file for report:
-            fout_assembled_psl.close()
-            fout_paralogous_psl.close()
-            fout_misassembled_union.close()
-            fout_misassembled_psl.close()
-            fout_fake_blat.close()
-            fout_psl_wolqg.close()
-            # fout_low_complexity.close()
+                # close file for report:
+                fout_psl_wout_cross.close()
+                fout_assembled_psl.close()
+                fout_uniquely_file.close()
+                fout_paralogous_psl.close()
+                fout_misassembled_union.close()
+                fout_misassembled_psl.close()
+                fout_fake_blat.close()
+                fout_psl_wolqg.close()
+                fout_low_complexity.close()
 
             end_union_time = datetime.now()
             elapsed_union_time = end_union_time - start_union_time
 
             logger.debug('  ELAPSED TIME: ' + str(elapsed_union_time))
 
-            return blat_report
-
 
 def get_best_lines_set(alignments):
     lines = []
@@ -434,34 +468,58 @@ def get_union_fake_blat_alignments(union_lines, union_alignments, single_transcr
         alignment1 = union_alignments[i_alignment1]
         alignment_line1 = union_lines[i_alignment1]
         if best_alignment_set.is_union_fake_blat(alignment0, alignment1, ALIGNMENT_THRESHOLDS):
-            fout_fake_blat.write(alignment_line0 + '\n' + alignment_line1 + '\n\n\n')
+            if fout_fake_blat is not None:
+                if alignment_line0 is None:
+                    alignment_line0 = alignment0.get_psl_line_from_alignment()
+                fout_fake_blat.write(alignment_line0 + '\n' + alignment_line1 + '\n\n\n')
             alignment0 = get_union_fake_blat_alignment(alignment0, alignment1)
-            alignment_line0 = alignment0.get_psl_line_from_alignment()
+            # line of union alignment is got once union is complete, not after each of many united alignments:
+            alignment_line0 = None
         else:
+            if alignment_line0 is None:
+                alignment_line0 = alignment0.get_psl_line_from_alignment()
             new_union_alignments.append(alignment0)
             new_union_lines.append(alignment_line0)
             i_alignment0 = sort_index[i + 1]
             alignment0 = union_alignments[i_alignment0]
             alignment_line0 = union_lines[i_alignment0]
         if i + 1 == len(sort_index) - 1:
+            if alignment_line0 is None:
+                alignment_line0 = alignment0.get_psl_line_from_alignment()
             new_union_alignments.append(alignment0)
             new_union_lines.append(alignment_line0)
 
     # update single transcript lines / alignments:
     if len(union_lines) != len(new_union_lines):
-        for i_alignment in range(len(union_lines)):
-            if union_lines[i_alignment] not in new_union_lines:
-                single_transcript_lines.remove(union_lines[i_alignment])
-                single_transcript_alignments.remove(union_alignments[i_alignment])
-        for i_alignment in range(len(new_union_lines)):
-            if new_union_lines[i_alignment] not in single_transcript_lines:
-                single_transcript_lines.append(new_union_lines[i_alignment])
-                single_transcript_alignments.append(new_union_alignments[i_alignment])
+        update_single_transcript_lines_alignments(union_lines, union_alignments, new_union_lines, new_union_alignments,
+                                                  single_transcript_lines, single_transcript_alignments)
 
     #logger.debug('      Done.')
     return new_union_lines, new_union_alignments, single_transcript_lines, single_transcript_alignments
 
 
+# replace union alignments by new union alignments in single transcript lines / alignments (in place).
+# Removed alignments are identified by objects and added ones by lines through sets,
+# so update is linear instead of list.remove and list membership for every alignment:
+def update_single_transcript_lines_alignments(union_lines, union_alignments, new_union_lines, new_union_alignments,
+                                              single_transcript_lines, single_transcript_alignments):
+    new_union_lines_set = set(new_union_lines)
+    removed_ids = set(id(union_alignments[i_alignment]) for i_alignment in range(len(union_lines))
+                      if union_lines[i_alignment] not in new_union_lines_set)
+    if len(removed_ids) != 0:
+        kept_indexes = [i_alignment for i_alignment in range(len(single_transcript_alignments))
+                        if id(single_transcript_alignments[i_alignment]) not in removed_ids]
+        single_transcript_lines[:] = [single_transcript_lines[i_alignment] for i_alignment in kept_indexes]
+        single_transcript_alignments[:] = [single_transcript_alignments[i_alignment] for i_alignment in kept_indexes]
+
+    single_transcript_lines_set = set(single_transcript_lines)
+    for i_alignment in range(len(new_union_lines)):
+        if new_union_lines[i_alignment] not in single_transcript_lines_set:
+            single_transcript_lines_set.add(new_union_lines[i_alignment])
+            single_transcript_lines.append(new_union_lines[i_alignment])
+            single_transcript_alignments.append(new_union_alignments[i_alignment])
+
+
 # alignments are union if they are cross at most err_cross, distance no more than err_space in query, are at one strand and chromosome:
 # def is_union_fake_blat(alignment0, alignment1, err_space, err_cross):
 #     if alignment0.strand == '+':
@@ -651,7 +709,8 @@ def split_large_query_gap_single_transcript_alignments(single_transcript_alignme
 
                     split_line = split_alignment.get_psl_line_from_alignment()
                     new_single_transcript_lines.append(split_line)
-                    fout_psl.write(split_line + '\n')
+                    if fout_psl is not None:
+                        fout_psl.write(split_line + '\n')
                 curr_iBlock = i_block
         if tmp_count_split != 0:
             split_alignment = alignment.get_split_alignment(curr_iBlock + 1, alignment.blocks_num - 1)
@@ -661,36 +720,47 @@ def split_large_query_gap_single_transcript_alignments(single_transcript_alignme
 
                 split_line = split_alignment.get_psl_line_from_alignment()
                 new_single_transcript_lines.append(split_line)
-                fout_psl.write(split_line + '\n')
+                if fout_psl is not None:
+                    fout_psl.write(split_line + '\n')
         else:
             new_single_transcript_alignments.append(alignment)
 
             line = alignment.get_psl_line_from_alignment()
             new_single_transcript_lines.append(line)
-            fout_psl.write(line + '\n')
+            if fout_psl is not None:
+                fout_psl.write(line + '\n')
     return new_single_transcript_lines, new_single_transcript_alignments
 
 
 # remove low complexity regions cause polyA/T or something else:
 def remove_low_complexity(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
-                          transcript_dict, out_low_complexity_file, low_complexity_len_threshold):
+                          transcript_dict, fout_low_complexity, low_complexity_len_threshold):
     transcript_seq = transcript_dict[union_alignments[0].query_fragment.name]
 
+    # reverse complement is computed once per transcript and only if it is needed:
+    transcript_rev_comp_seq = None
+    if any(psl_alignment.strand != '+' for psl_alignment in union_alignments):
+        transcript_rev_comp_seq = UtilsGeneral.rev_comp(transcript_seq)
+
     clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments = \
         remove_low_complexity_tail(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
-                                   transcript_seq, out_low_complexity_file, low_complexity_len_threshold, end_tail=True)
+                                   transcript_seq, transcript_rev_comp_seq, fout_low_complexity,
+                                   low_complexity_len_threshold, end_tail=True)
 
     clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments = \
         remove_low_complexity_tail(clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments,
-                                   transcript_seq, out_low_complexity_file, low_complexity_len_threshold, end_tail=False)
+                                   transcript_seq, transcript_rev_comp_seq, fout_low_complexity,
+                                   low_complexity_len_threshold, end_tail=False)
 
     return clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments
 
 
 # remove low complexity tail:
 def remove_low_complexity_tail(union_lines, union_alignments, single_transcript_lines, single_transcript_alignments,
-                               transcript_seq, out_low_complexity_file, threshold_block_len, end_tail):
-    block_seq = ''
+                               transcript_seq, transcript_rev_comp_seq, fout_low_complexity, threshold_block_len, end_tail):
+    # k-mers spectrum of growing block sequence is updated only by k-mers of added part:
+    block_spectrum = KmersSpectrum()
+    block_parts = []
     for i in range(len(union_alignments)):
         if end_tail == True:
             i_alignment = len(union_alignments) - 1 - i
@@ -707,14 +777,16 @@ def remove_low_complexity_tail(union_lines, union_alignments, single_transcript_
             end = psl_alignment.query_fragment.ends[i_block]
 
             if psl_alignment.strand == '+':
-                block_seq += transcript_seq[start:end + 1]
+                block_part = transcript_seq[start:end + 1]
             else:
-                block_seq += UtilsGeneral.rev_comp(transcript_seq)[start:end + 1]
+                block_part = transcript_rev_comp_seq[start:end + 1]
+            block_spectrum.extend(block_part)
+            block_parts.append(block_part)
 
-            if len(block_seq) < threshold_block_len:
+            if block_spectrum.len < threshold_block_len:
                 continue
 
-            if not is_low_complexity(block_seq):
+            if not block_spectrum.is_low_complexity():
                 if (end_tail == True and i_block == psl_alignment.blocks_num - 1) or (end_tail == False and i_block == 0):
                     latest_alignment = psl_alignment
                     latest_line = union_lines[i_alignment]
@@ -733,48 +805,56 @@ def remove_low_complexity_tail(union_lines, union_alignments, single_transcript_
                     clear_union_lines = [latest_line] + union_lines[i_alignment + 1:]
 
                 # update single transcript lines / alignments:
-                for i_alignment in range(len(union_lines)):
-                    if union_lines[i_alignment] not in clear_union_lines:
-                        single_transcript_lines.remove(union_lines[i_alignment])
-                        single_transcript_alignments.remove(union_alignments[i_alignment])
-                for i_alignment in range(len(clear_union_lines)):
-                    if clear_union_lines[i_alignment] not in single_transcript_lines:
-                        single_transcript_lines.append(clear_union_lines[i_alignment])
-                        single_transcript_alignments.append(clear_union_alignments[i_alignment])
+                update_single_transcript_lines_alignments(union_lines, union_alignments, clear_union_lines, clear_union_alignments,
+                                                          single_transcript_lines, single_transcript_alignments)
 
                 return clear_union_lines, clear_union_alignments, single_transcript_lines, single_transcript_alignments,
 
-            else:
-                fastaparser.write_fasta(out_low_complexity_file, [('{}_block'.format(psl_alignment.query_fragment.name), block_seq)], mode='a')
+            elif fout_low_complexity is not None:
+                fastaparser.write_fasta_to_handle(fout_low_complexity,
+                                                  [(psl_alignment.query_fragment.name + '_block', ''.join(block_parts))])
 
-            if len(block_seq) > threshold_block_len:
-                block_seq = ''
+            if block_spectrum.len > threshold_block_len:
+                block_spectrum = KmersSpectrum()
+                block_parts = []
 
     # update single transcript lines / alignments:
-    for i_alignment in range(len(union_lines)):
-        single_transcript_lines.remove(union_lines[i_alignment])
-        single_transcript_alignments.remove(union_alignments[i_alignment])
+    update_single_transcript_lines_alignments(union_lines, union_alignments, [], [],
+                                              single_transcript_lines, single_transcript_alignments)
 
     return [], [], single_transcript_lines, single_transcript_alignments
 
 
-# determine low complexity regions as regions containing mainly two types of kmers:
+class KmersSpectrum():
+    """Class of k-mers spectrum of sequence, which is extended by parts"""
+
+    def __init__(self, k=4):
+        self.k = k
+        self.len = 0
+        self.counts = defaultdict(int)
+        # last k - 1 nucleotides, k-mers crossing the junction with next part start in them:
+        self.tail = ''
+
+    def extend(self, seq):
+        seq = self.tail + seq
+        for i in range(len(seq) - self.k + 1):
+            self.counts[seq[i:i + self.k]] += 1
+        self.len += len(seq) - len(self.tail)
+        self.tail = seq[max(0, len(seq) - self.k + 1):]
+
+    # determine low complexity regions as regions containing mainly two types of kmers:
+    def is_low_complexity(self):
+        majority_num = sum(heapq.nlargest(2, self.counts.values()))
+        if majority_num > 0.6 * (self.len - self.k + 1):
+            return True
+        else:
+            return False
+
+
 def is_low_complexity(seq, k=4):
-    k_spect = defaultdict(int)
-    for i in range(len(seq) - k + 1):
-        k_spect[seq[i:i + k]] += 1
-
-    max_key, max_value = 0, 0
-    for key, value in k_spect.items():
-        if value > max_value:
-            max_key, max_value = key, value
-    majority_num = max_value
-    k_spect[max_key] = 0
-    majority_num += max(k_spect.values())
-    if majority_num > 0.6 * (len(seq) - k + 1):
-        return True
-    else:
-        return False
+    spectrum = KmersSpectrum(k)
+    spectrum.extend(seq)
+    return spectrum.is_low_complexity()
 
 
 # extract from psl file single transcript lines and get them alignments:
@@ -821,27 +901,194 @@ def get_curr_single_transcript_lines_alignments(min_alignment_threshold, line1,
     return single_transcript_lines, single_transcript_alignments, line1, line2
 
 
+# group consecutive alignments of the same transcript, alignments shorter than min_alignment_threshold are skipped:
+def iterate_single_transcript_lines_alignments(lines_alignments, min_alignment_threshold):
+    single_transcript_lines = []
+    single_transcript_alignments = []
+
+    id_transcript = None
+    for line, alignment in lines_alignments:
+        if alignment.query_fragment.name != id_transcript:
+            if len(single_transcript_alignments) != 0:
+                yield single_transcript_lines, single_transcript_alignments
+
+            single_transcript_lines = []
+            single_transcript_alignments = []
+
+            id_transcript = alignment.query_fragment.name
+
+        if alignment.query_fragment.end - alignment.query_fragment.start >= min_alignment_threshold:
+            single_transcript_lines.append(line)
+            single_transcript_alignments.append(alignment)
+
+    if len(single_transcript_alignments) != 0:
+        yield single_transcript_lines, single_transcript_alignments
+
+
+# qName is 10th column of psl:
+def get_psl_query_name(line):
+    return line.split('\t', 10)[9]
+
+
+# k-way merge of psl files sorted by query names or, if queries_order is set, by positions of queries in it.
+# Alignments of each query stay together and keep order of files:
+def merge_psl_by_query(psl_pathes, out_psl_path, queries_order=None):
+    def iterate_keyed_lines(in_handle, i_file):
+        for line in in_handle:
+            q_name = get_psl_query_name(line)
+            yield q_name if queries_order is None else queries_order[q_name], i_file, line
+
+    in_handles = [open(psl_path, 'r') for psl_path in psl_pathes]
+    try:
+        with open(out_psl_path, 'w') as out_handle:
+            for q_name, i_file, line in heapq.merge(*[iterate_keyed_lines(in_handles[i_file], i_file)
+                                                      for i_file in range(len(in_handles))]):
+                out_handle.write(line)
+    finally:
+        for in_handle in in_handles:
+            in_handle.close()
+
+
+# lines of psl file with alignments of each query consecutive. Runs of query names are checked before file is read:
+# name of previous run means that file isn't grouped. Names are kept while their set fits in PSL_QUERY_NAMES_SET_SIZE,
+# file with more names is sorted:
+def iterate_grouped_psl_lines(psl_path, grouped_psl_path, logger):
+    q_names = set()
+    q_names_size = 0
+
+    # lines are not kept during the check: reading of grouped file again is cheaper than keeping its lines, and
+    # ungrouped file is usually detected on the first lines:
+    is_grouped = True
+    prev_q_name = None
+    with open(psl_path, 'r') as in_handle:
+        for line in in_handle:
+            # qName is 10th column of psl, empty lines are skipped:
+            fields = line.split('\t', 10)
+            if len(fields) < 11 or fields[9] == prev_q_name:
+                continue
+            prev_q_name = fields[9]
+
+            if prev_q_name in q_names:
+                logger.info('  Alignments in {} are not grouped by transcripts, sorting them by names...'.format(psl_path))
+                is_grouped = False
+                break
+
+            q_names.add(prev_q_name)
+            q_names_size += len(prev_q_name) + rqconfig.PSL_QUERY_NAME_OVERHEAD
+            if q_names_size > rqconfig.PSL_QUERY_NAMES_SET_SIZE:
+                logger.info('  Too many transcripts in {} to check grouping of alignments, sorting them by names...'.
+                            format(psl_path))
+                is_grouped = False
+                break
+    del q_names
+
+    if is_grouped:
+        return open_lines(psl_path)
+
+    return sort_psl_by_query(psl_path, grouped_psl_path, logger)
+
+
+# external merge sort of psl file by query names: parts of at most PSL_SORT_BUFFER_SIZE bytes are sorted in memory,
+# saved to spill files and merged to grouped_psl_path:
+def sort_psl_by_query(psl_path, grouped_psl_path, logger):
+    spill_pathes = []
+
+    def spill(lines, out_path):
+        # sort is stable, so alignments of the same query keep their order:
+        lines.sort(key=get_psl_query_name)
+        with open(out_path, 'w') as out_handle:
+            out_handle.writelines(lines)
+
+    lines = []
+    lines_size = 0
+    with open(psl_path, 'r') as in_handle:
+        for line in in_handle:
+            if line.strip() == '':
+                continue
+            if not line.endswith('\n'):
+                line += '\n'
+
+            lines.append(line)
+            lines_size += len(line)
+            if lines_size >= rqconfig.PSL_SORT_BUFFER_SIZE:
+                spill_pathes.append('{}.{}.spill'.format(grouped_psl_path, len(spill_pathes)))
+                spill(lines, spill_pathes[-1])
+                lines = []
+                lines_size = 0
+
+    # file fitting in memory is sorted without spill files:
+    if len(spill_pathes) == 0:
+        lines.sort(key=get_psl_query_name)
+        return lines
+
+    if len(lines) != 0:
+        spill_pathes.append('{}.{}.spill'.format(grouped_psl_path, len(spill_pathes)))
+        spill(lines, spill_pathes[-1])
+    del lines
+
+    merge_psl_by_query(spill_pathes, grouped_psl_path)
+
+    for spill_path in spill_pathes:
+        os.remove(spill_path)
+
+    logger.info('  saved to {}'.format(grouped_psl_path))
+
+    return open_lines(grouped_psl_path)
+
+
+def open_lines(path):
+    with open(path, 'r') as in_handle:
+        for line in in_handle:
+            yield line
+
+
 # temporary maybe needs some processing this alignments:
-def remove_strange_psl_alignments(in_psl_path, out_psl_path):
-    in_handle = open(in_psl_path)
+def is_strange_psl_alignment(psl_alignment):
+    if psl_alignment.blocks_num == 0:
+        return True
+
+    for i_block in range(psl_alignment.blocks_num - 1):
+        if psl_alignment.query_fragment.ends[i_block] - psl_alignment.query_fragment.starts[i_block + 1] > 0:
+            return True
+
+    return False
+
 
-    out_handle = open(out_psl_path, 'w')
+# parse psl file once and skip alignments with negative query gaps lengths, kept lines are written to fout_psl if it is set.
+# Alignments of each query are made consecutive (e.g. psl given by --alignment can be unsorted), see
+# iterate_grouped_psl_lines. Binary container of alignments (see UtilsBinaryAlignment) is read without parsing text:
+def iterate_unstrange_psl_alignments(in_psl_path, grouped_psl_path, logger, fout_psl=None):
+    unsorted_psl_path = None
+    if UtilsBinaryAlignment.is_binary_psl_file(in_psl_path):
+        if UtilsBinaryAlignment.is_binary_psl_grouped_by_query(in_psl_path):
+            for psl_alignment in UtilsBinaryAlignment.iterate_binary_psl_alignments(in_psl_path):
+                if is_strange_psl_alignment(psl_alignment):
+                    continue
+
+                line = psl_alignment.get_psl_line_from_alignment()
+                if fout_psl is not None:
+                    fout_psl.write(line + '\n')
+
+                yield line, psl_alignment
+            return
+
+        # binary container is sorted as text psl:
+        unsorted_psl_path = UtilsBinaryAlignment.convert_binary_to_psl(in_psl_path, '{}.unsorted'.format(grouped_psl_path))
+        in_psl_path = unsorted_psl_path
+
+    for line in iterate_grouped_psl_lines(in_psl_path, grouped_psl_path, logger):
+        line = line.strip()
+        if line == '':
+            continue
 
-    for line in in_handle:
         psl_alignment = Alignment.PSLFileAlignment.get_alignment_from_psl_line(line)
-        strange = False
-        if psl_alignment.blocks_num == 0:
-            strange = True
-        else:
-            for i_block in range(psl_alignment.blocks_num - 1):
-                if psl_alignment.query_fragment.ends[i_block] - psl_alignment.query_fragment.starts[i_block + 1] > 0:
-                    strange = True
-                    break
-        if not strange:
-            out_handle.write(line)
+        if is_strange_psl_alignment(psl_alignment):
+            continue
 
-    in_handle.close()
+        if fout_psl is not None:
+            fout_psl.write(line + '\n')
 
-    out_handle.close()
+        yield line, psl_alignment
 
-    return out_psl_path
\ No newline at end of file
+    if unsorted_psl_path is not None:
+        os.remove(unsorted_psl_path)
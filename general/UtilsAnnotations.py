@@ -7,6 +7,7 @@ import subprocess
 import gffutils
 
 from general import UtilsGeneral
+from general import UtilsCache
 
 default_type_genes = ['gene', 'miRNA_gene']
 
@@ -117,12 +118,23 @@ def load_sqlite3_db(sqlite3_db_path, logger):
 
 # create database for gff/gtf file:
 def create_sqlite3_db(in_gene_db, in_gff_path, label_db, disable_infer_genes, disable_infer_transcripts,
-                      output_dir, tmp_dir, logger):
+                      output_dir, tmp_dir, logger, cache_dir=None, annotation_key=None):
     tmp_sqlite3_db_path = os.path.join(tmp_dir, label_db + '.db')
     sqlite3_db_path = os.path.join(output_dir, label_db + '.db')
 
+    cached_sqlite3_db_path = UtilsCache.get_cache_path(cache_dir, annotation_key, 'db')
+
     if in_gene_db is not None:
         sqlite3_db_genes = load_sqlite3_db(in_gene_db, logger)
+    elif cached_sqlite3_db_path is not None:
+        # only one run builds database for the same annotation, others wait and reuse it:
+        with UtilsCache.CacheLock(cached_sqlite3_db_path):
+            if not os.path.exists(cached_sqlite3_db_path):
+                create_sqlite2_db_in_file(in_gff_path, disable_infer_genes, disable_infer_transcripts,
+                                          cached_sqlite3_db_path, '{}.{}.tmp'.format(cached_sqlite3_db_path, os.getpid()),
+                                          logger)
+
+        sqlite3_db_genes = load_sqlite3_db(cached_sqlite3_db_path, logger)
     elif os.path.exists(sqlite3_db_path):
         sqlite3_db_genes = load_sqlite3_db(sqlite3_db_path, logger)
     # elif store_sqlite3_db:
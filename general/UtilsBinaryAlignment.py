@@ -0,0 +1,288 @@
+__author__ = 'letovesnoi'
+
+import zipfile
+from array import array
+
+import numpy
+
+from general import rqconfig
+
+from objects import Alignment
+
+
+# Binary container of PSL alignments: numeric fields are stored in typed columns of the smallest integer type
+# which fits them, names of queries and targets and strands are interned to integer ids, blocks of all alignments
+# are stored in three concatenated columns. Alignments are stored in chunks of BINARY_PSL_CHUNK_SIZE alignments with
+# their own columns and names, so container is written and read chunk by chunk. Container is numpy .npz archive
+# with arrays named <column>.<chunk number>, so it is read without parsing text.
+
+# numeric columns in order of PSL fields:
+PSL_COLUMNS = ('matches', 'mismatches', 'repmatches', 'n_num', 'q_num_insert', 'q_base_insert', 't_num_insert',
+               't_base_insert', 'q_size', 'q_start', 'q_end', 't_size', 't_start', 't_end', 'blocks_num')
+
+# zip archive signature, text PSL never starts by it:
+BINARY_PSL_MAGIC = b'PK\x03\x04'
+
+
+def is_binary_psl_file(path):
+    with open(path, 'rb') as in_handle:
+        return in_handle.read(len(BINARY_PSL_MAGIC)) == BINARY_PSL_MAGIC
+
+
+def get_compact_column(values):
+    column = numpy.frombuffer(values, dtype=numpy.int64) if len(values) != 0 else numpy.zeros(0, dtype=numpy.int64)
+    for dtype in [numpy.int8, numpy.int16, numpy.int32]:
+        info = numpy.iinfo(dtype)
+        if len(column) == 0 or (column.min() >= info.min and column.max() <= info.max):
+            return column.astype(dtype)
+    return column
+
+
+class BinaryPSLWriter():
+    """Class of writer of PSL alignments to binary container, alignments are kept in columns until chunk is full"""
+
+    def __init__(self, path):
+        self.path = path
+
+        # chunks are written to zip archive as they are filled, numpy.load reads it as .npz:
+        self.out_zip = zipfile.ZipFile(path, 'w', allowZip64=True)
+        self.chunks_num = 0
+
+        self.start_chunk()
+
+    def start_chunk(self):
+        self.columns = dict((column, array('q')) for column in PSL_COLUMNS)
+
+        # interned names of queries and targets and strands:
+        self.names_ids = {'q_name': {}, 't_name': {}, 'strand': {}}
+        self.ids = dict((column, array('q')) for column in self.names_ids)
+
+        self.blocks_sizes = array('q')
+        self.q_starts = array('q')
+        self.t_starts = array('q')
+
+    def add_name(self, column, name):
+        names_ids = self.names_ids[column]
+        if name not in names_ids:
+            names_ids[name] = len(names_ids)
+        self.ids[column].append(names_ids[name])
+
+    # add alignment from text PSL line without creating object of alignment:
+    def add_psl_line(self, line):
+        parameters_list = line.rstrip('\n').split('\t')
+
+        for i_column, column in enumerate(PSL_COLUMNS[:8]):
+            self.columns[column].append(int(parameters_list[i_column]))
+        self.add_name('strand', parameters_list[8])
+        self.add_name('q_name', parameters_list[9])
+        self.columns['q_size'].append(int(parameters_list[10]))
+        self.columns['q_start'].append(int(parameters_list[11]))
+        self.columns['q_end'].append(int(parameters_list[12]))
+        self.add_name('t_name', parameters_list[13])
+        self.columns['t_size'].append(int(parameters_list[14]))
+        self.columns['t_start'].append(int(parameters_list[15]))
+        self.columns['t_end'].append(int(parameters_list[16]))
+        self.columns['blocks_num'].append(int(parameters_list[17]))
+
+        self.blocks_sizes.extend(int(block_size) for block_size in parameters_list[18].split(',')[:-1])
+        self.q_starts.extend(int(start) for start in parameters_list[19].split(',')[:-1])
+        self.t_starts.extend(int(start) for start in parameters_list[20].split(',')[:-1])
+
+        self.flush_full_chunk()
+
+    def add_alignment(self, psl_alignment):
+        query_fragment = psl_alignment.query_fragment
+        target_fragment = psl_alignment.target_fragment
+
+        for column, value in zip(PSL_COLUMNS, [psl_alignment.matches, psl_alignment.mismatches, psl_alignment.repmatches,
+                                               psl_alignment.n_num, query_fragment.num_insert, query_fragment.base_insert,
+                                               target_fragment.num_insert, target_fragment.base_insert,
+                                               query_fragment.size, query_fragment.start, query_fragment.end + 1,
+                                               target_fragment.size, target_fragment.start, target_fragment.end + 1,
+                                               psl_alignment.blocks_num]):
+            self.columns[column].append(value)
+        self.add_name('strand', psl_alignment.strand)
+        self.add_name('q_name', query_fragment.name)
+        self.add_name('t_name', target_fragment.name)
+
+        self.blocks_sizes.extend(psl_alignment.blocks_sizes[:psl_alignment.blocks_num])
+        self.q_starts.extend(query_fragment.starts[:psl_alignment.blocks_num])
+        self.t_starts.extend(target_fragment.starts[:psl_alignment.blocks_num])
+
+        self.flush_full_chunk()
+
+    def flush_full_chunk(self):
+        if len(self.columns['blocks_num']) >= rqconfig.BINARY_PSL_CHUNK_SIZE:
+            self.flush_chunk()
+
+    # write columns of chunk to archive as numpy.savez does and start new chunk:
+    def flush_chunk(self):
+        arrays = dict((column, get_compact_column(self.columns[column])) for column in PSL_COLUMNS)
+        for column in self.names_ids:
+            arrays[column] = get_compact_column(self.ids[column])
+            names = sorted(self.names_ids[column], key=self.names_ids[column].get)
+            arrays[column + 's'] = numpy.array(names, dtype=str) if len(names) != 0 else numpy.zeros(0, dtype='U1')
+        arrays['blocks_sizes'] = get_compact_column(self.blocks_sizes)
+        arrays['q_starts'] = get_compact_column(self.q_starts)
+        arrays['t_starts'] = get_compact_column(self.t_starts)
+
+        for column in sorted(arrays):
+            with self.out_zip.open(get_chunk_array_name(column, self.chunks_num) + '.npy', 'w', force_zip64=True) as out_handle:
+                numpy.lib.format.write_array(out_handle, arrays[column], allow_pickle=False)
+        self.chunks_num += 1
+
+        self.start_chunk()
+
+    def close(self):
+        # the last chunk is written even if it is empty, so container has at least one chunk:
+        if len(self.columns['blocks_num']) != 0 or self.chunks_num == 0:
+            self.flush_chunk()
+        self.out_zip.close()
+
+
+def get_chunk_array_name(column, i_chunk):
+    return '{}.{}'.format(column, i_chunk)
+
+
+def get_chunks_num(npz):
+    return sum(1 for array_name in npz.files if array_name.startswith('blocks_num.'))
+
+
+# columns of chunks of container as lists of python objects, only one chunk is converted at once:
+def iterate_binary_psl_chunks(path):
+    with numpy.load(path, allow_pickle=False) as npz:
+        for i_chunk in range(get_chunks_num(npz)):
+            columns = dict((column, npz[get_chunk_array_name(column, i_chunk)].tolist())
+                           for column in PSL_COLUMNS + ('blocks_sizes', 'q_starts', 't_starts'))
+
+            for column in ['q_name', 't_name', 'strand']:
+                names = npz[get_chunk_array_name(column + 's', i_chunk)].tolist()
+                columns[column] = [names[id_name] for id_name in npz[get_chunk_array_name(column, i_chunk)].tolist()]
+
+            # offsets of blocks of alignments in blocks columns of chunk:
+            blocks_offsets = [0]
+            for blocks_num in columns['blocks_num']:
+                blocks_offsets.append(blocks_offsets[-1] + blocks_num)
+            columns['blocks_offsets'] = blocks_offsets
+
+            yield columns
+
+
+def get_alignments_num(columns):
+    return len(columns['blocks_num'])
+
+
+def iterate_binary_psl_alignments(path):
+    for columns in iterate_binary_psl_chunks(path):
+        blocks_offsets = columns['blocks_offsets']
+        blocks_sizes_column = columns['blocks_sizes']
+        q_starts_column = columns['q_starts']
+        t_starts_column = columns['t_starts']
+
+        # whole rows are taken at once instead of lookups of columns by names for every field:
+        rows = zip(*[columns[column] for column in PSL_COLUMNS + ('strand', 'q_name', 't_name')])
+        for i_alignment, (matches, mismatches, repmatches, n_num, q_num_insert, q_base_insert, t_num_insert, t_base_insert,
+                          q_size, q_start, q_end, t_size, t_start, t_end, blocks_num, strand, q_name, t_name) in enumerate(rows):
+            psl_alignment = Alignment.PSLFileAlignment()
+
+            psl_alignment.matches = matches
+            psl_alignment.mismatches = mismatches
+            psl_alignment.repmatches = repmatches
+            psl_alignment.n_num = n_num
+            psl_alignment.strand = strand
+            psl_alignment.blocks_num = blocks_num
+            psl_alignment.score = matches
+
+            start_block = blocks_offsets[i_alignment]
+            end_block = blocks_offsets[i_alignment + 1]
+            blocks_sizes = blocks_sizes_column[start_block:end_block]
+            psl_alignment.blocks_sizes = blocks_sizes
+
+            query_fragment = psl_alignment.query_fragment
+            query_fragment.num_insert = q_num_insert
+            query_fragment.base_insert = q_base_insert
+            query_fragment.name = q_name
+            query_fragment.size = q_size
+            query_fragment.start = q_start
+            query_fragment.end = q_end - 1
+            query_fragment.starts = q_starts_column[start_block:end_block]
+            query_fragment.ends = [start + block_size - 1 for start, block_size in zip(query_fragment.starts, blocks_sizes)]
+
+            target_fragment = psl_alignment.target_fragment
+            target_fragment.num_insert = t_num_insert
+            target_fragment.base_insert = t_base_insert
+            target_fragment.name = t_name
+            target_fragment.size = t_size
+            target_fragment.start = t_start
+            target_fragment.end = t_end - 1
+            target_fragment.starts = t_starts_column[start_block:end_block]
+            target_fragment.ends = [start + block_size - 1 for start, block_size in zip(target_fragment.starts, blocks_sizes)]
+
+            yield psl_alignment
+
+
+# query names starting runs of alignments of the same query, taken from columns of ids of query names of chunks:
+def iterate_binary_psl_runs_q_names(path):
+    prev_q_name = None
+    with numpy.load(path, allow_pickle=False) as npz:
+        for i_chunk in range(get_chunks_num(npz)):
+            q_ids = npz[get_chunk_array_name('q_name', i_chunk)]
+            if len(q_ids) == 0:
+                continue
+
+            q_names = npz[get_chunk_array_name('q_names', i_chunk)]
+            runs_q_ids = q_ids[numpy.concatenate(([True], q_ids[1:] != q_ids[:-1]))]
+            for q_name in q_names[runs_q_ids].tolist():
+                if q_name != prev_q_name:
+                    yield q_name
+                    prev_q_name = q_name
+
+
+# check that alignments of each query are consecutive by names starting runs, as for text PSL
+# (see UtilsAlignment.iterate_grouped_psl_lines):
+def is_binary_psl_grouped_by_query(path):
+    q_names = set()
+    q_names_size = 0
+    for q_name in iterate_binary_psl_runs_q_names(path):
+        if q_name in q_names:
+            return False
+
+        q_names.add(q_name)
+        q_names_size += len(q_name) + rqconfig.PSL_QUERY_NAME_OVERHEAD
+        if q_names_size > rqconfig.PSL_QUERY_NAMES_SET_SIZE:
+            return False
+
+    return True
+
+
+# CONVERTERS:
+def convert_psl_to_binary(psl_path, binary_path):
+    writer = BinaryPSLWriter(binary_path)
+    with open(psl_path, 'r') as in_handle:
+        for line in in_handle:
+            if line.strip() == '':
+                continue
+            writer.add_psl_line(line)
+    writer.close()
+
+    return binary_path
+
+
+def convert_binary_to_psl(binary_path, psl_path):
+    with open(psl_path, 'w') as out_handle:
+        for columns in iterate_binary_psl_chunks(binary_path):
+            for i_alignment in range(get_alignments_num(columns)):
+                start_block = columns['blocks_offsets'][i_alignment]
+                end_block = columns['blocks_offsets'][i_alignment + 1]
+
+                fields = [str(columns[column][i_alignment]) for column in PSL_COLUMNS[:8]]
+                fields += [columns['strand'][i_alignment], columns['q_name'][i_alignment]]
+                fields += [str(columns[column][i_alignment]) for column in ['q_size', 'q_start', 'q_end']]
+                fields += [columns['t_name'][i_alignment]]
+                fields += [str(columns[column][i_alignment]) for column in ['t_size', 't_start', 't_end', 'blocks_num']]
+                for column in ['blocks_sizes', 'q_starts', 't_starts']:
+                    fields.append(''.join('{},'.format(value) for value in columns[column][start_block:end_block]))
+
+                out_handle.write('\t'.join(fields) + '\n')
+
+    return psl_path
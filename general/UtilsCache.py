@@ -0,0 +1,276 @@
+__author__ = 'letovesnoi'
+
+import os
+import time
+import json
+import fcntl
+import shutil
+import hashlib
+import pickle
+import subprocess
+
+from general import rqconfig
+
+
+# content hash of file read by chunks:
+def get_file_hash(path):
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as in_handle:
+        chunk = in_handle.read(rqconfig.CACHE_HASH_CHUNK_LEN)
+        while chunk:
+            file_hash.update(chunk)
+            chunk = in_handle.read(rqconfig.CACHE_HASH_CHUNK_LEN)
+
+    return file_hash.hexdigest()
+
+
+# key of cached entry by hash of source and options affecting it:
+def get_cache_key(*parts):
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+# key of annotation, all structures derived from gene database are cached under it:
+def get_annotation_key(in_gene_db, in_gff_path, disable_infer_genes, disable_infer_transcripts, logger):
+    logger.print_timestamp()
+    logger.info('Getting annotation hash for cache...')
+
+    if in_gene_db is not None:
+        annotation_key = get_cache_key(rqconfig.CACHE_VERSION, 'gene_db', get_file_hash(in_gene_db))
+    else:
+        annotation_key = get_cache_key(rqconfig.CACHE_VERSION, 'gtf', get_file_hash(in_gff_path),
+                                       disable_infer_genes, disable_infer_transcripts)
+
+    logger.info('Done.')
+
+    return annotation_key
+
+
+def get_cache_path(cache_dir, key, name):
+    if cache_dir is None or key is None:
+        return None
+
+    return os.path.join(cache_dir, '{}.{}'.format(key, name))
+
+
+class CacheLock():
+    """Class of exclusive lock of cached entry shared by several rnaQUAST runs"""
+
+    def __init__(self, cache_path):
+        self.lock_path = None
+        self.lock_handle = None
+        if cache_path is not None:
+            self.lock_path = cache_path + '.lock'
+
+    def __enter__(self):
+        if self.lock_path is not None:
+            self.lock_handle = open(self.lock_path, 'a')
+            fcntl.flock(self.lock_handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.lock_handle is not None:
+            fcntl.flock(self.lock_handle, fcntl.LOCK_UN)
+            self.lock_handle.close()
+            self.lock_handle = None
+        return False
+
+
+class CachedIndex():
+    """Class of index from cache held by shared lock while it is used, so other runs don't evict it"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+
+        self.lock_handle = open(index_dir + '.lock', 'a')
+        fcntl.flock(self.lock_handle, fcntl.LOCK_SH)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    def release(self):
+        if self.lock_handle is not None:
+            fcntl.flock(self.lock_handle, fcntl.LOCK_UN)
+            self.lock_handle.close()
+            self.lock_handle = None
+
+
+# indexes used until the end of run (e.g. blast database used by all assemblies) are held until process exits:
+_held_indexes = []
+
+
+def hold_index_until_exit(cached_index):
+    _held_indexes.append(cached_index)
+
+
+# hold index of cache with file of path (e.g. restored from checkpoint) until process exits.
+# Returns False if index was evicted before it was held:
+def hold_cached_path_until_exit(cache_dir, path):
+    index_dir = os.path.dirname(os.path.abspath(path))
+    if os.path.dirname(index_dir) != os.path.abspath(os.path.join(cache_dir, 'indexes')):
+        return True
+
+    hold_index_until_exit(CachedIndex(index_dir))
+
+    return os.path.exists(index_dir)
+
+
+# get object from cache or None if it is absent or broken:
+def load_object(cache_path, logger):
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+
+    logger.print_timestamp()
+    logger.info('Loading from cache {}...'.format(cache_path))
+
+    try:
+        with open(cache_path, 'rb') as in_handle:
+            cached_object = pickle.load(in_handle)
+    except Exception:
+        logger.warning('Can\'t load {} from cache, it will be rebuilt.'.format(cache_path))
+        return None
+
+    logger.info('Done.')
+
+    return cached_object
+
+
+# write to temporary file and rename it, so readers never see partially written objects:
+def save_object(cached_object, cache_path, logger):
+    if cache_path is None:
+        return
+
+    tmp_cache_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with open(tmp_cache_path, 'wb') as out_handle:
+            pickle.dump(cached_object, out_handle, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_cache_path, cache_path)
+    except Exception:
+        logger.warning('Can\'t save {} to cache.'.format(cache_path))
+        if os.path.exists(tmp_cache_path):
+            os.remove(tmp_cache_path)
+        return
+
+    logger.info('  saved to cache {}.'.format(cache_path))
+
+
+# INDEXES OF EXTERNAL TOOLS:
+# first line of tool version output or empty string if tool doesn't report it:
+def get_tool_version(command):
+    try:
+        output = subprocess.check_output(command, shell=True, stderr=subprocess.STDOUT)
+    except Exception:
+        return ''
+
+    return output.decode('utf-8', 'replace').strip().split('\n')[0].strip()
+
+
+def get_dir_size(dir):
+    dir_size = 0
+    for root, dirs, files in os.walk(dir):
+        for file in files:
+            path = os.path.join(root, file)
+            if not os.path.islink(path):
+                dir_size += os.path.getsize(path)
+
+    return dir_size
+
+
+def load_indexes_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, 'r') as in_handle:
+            return json.load(in_handle)
+    except ValueError:
+        return {}
+
+
+def save_indexes_manifest(manifest, manifest_path):
+    tmp_manifest_path = '{}.{}.tmp'.format(manifest_path, os.getpid())
+    with open(tmp_manifest_path, 'w') as out_handle:
+        json.dump(manifest, out_handle, indent=2, sort_keys=True)
+    os.rename(tmp_manifest_path, manifest_path)
+
+
+# remove least recently used indexes until total size fits in budget, index in use is kept:
+def evict_indexes(manifest, indexes_dir, index_name, max_size, logger):
+    for name in list(manifest.keys()):
+        if not os.path.exists(os.path.join(indexes_dir, name)):
+            del manifest[name]
+
+    tot_size = sum(manifest[name]['size'] for name in manifest)
+    for name in sorted(manifest.keys(), key=lambda name: manifest[name]['last_used']):
+        if tot_size <= max_size:
+            break
+        if name == index_name:
+            continue
+
+        # index held by shared lock is used by this or other run, it is kept:
+        with open(os.path.join(indexes_dir, name) + '.lock', 'a') as lock_handle:
+            try:
+                fcntl.flock(lock_handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                logger.info('  least recently used index {} is in use, kept in cache.'.format(name))
+                continue
+
+            logger.info('  removing least recently used index {} from cache...'.format(name))
+            shutil.rmtree(os.path.join(indexes_dir, name), ignore_errors=True)
+            fcntl.flock(lock_handle, fcntl.LOCK_UN)
+
+        tot_size -= manifest[name]['size']
+        del manifest[name]
+
+
+# get index from cache held by shared lock (CachedIndex), index is built by build_index(out_dir) only if it is absent.
+# Index must be released when it isn't used anymore. Returns None if building failed:
+def get_cached_index(cache_dir, tool, index_key, build_index, logger):
+    indexes_dir = os.path.join(cache_dir, 'indexes')
+    if not os.path.exists(indexes_dir):
+        os.makedirs(indexes_dir)
+
+    manifest_path = os.path.join(indexes_dir, 'manifest.json')
+
+    index_name = '{}.{}'.format(tool, index_key)
+    index_dir = os.path.join(indexes_dir, index_name)
+
+    # index is held before it is looked up, so it can't be evicted by other run after that:
+    cached_index = CachedIndex(index_dir)
+
+    # only one run builds index, others wait and reuse it:
+    with CacheLock(index_dir + '.build'):
+        build_time = None
+        if os.path.exists(index_dir):
+            logger.info('  {} index found in cache {}.'.format(tool, index_dir))
+        else:
+            tmp_index_dir = '{}.{}.tmp'.format(index_dir, os.getpid())
+            if os.path.exists(tmp_index_dir):
+                shutil.rmtree(tmp_index_dir)
+            os.makedirs(tmp_index_dir)
+
+            start_time = time.time()
+            if not build_index(tmp_index_dir):
+                shutil.rmtree(tmp_index_dir, ignore_errors=True)
+                cached_index.release()
+                return None
+            build_time = time.time() - start_time
+
+            os.rename(tmp_index_dir, index_dir)
+            logger.info('  {} index saved to cache {}.'.format(tool, index_dir))
+
+        with CacheLock(manifest_path):
+            manifest = load_indexes_manifest(manifest_path)
+
+            if index_name not in manifest or build_time is not None:
+                manifest[index_name] = {'tool': tool, 'size': get_dir_size(index_dir), 'build_time': build_time}
+            manifest[index_name]['last_used'] = time.time()
+
+            evict_indexes(manifest, indexes_dir, index_name, rqconfig.INDEX_CACHE_MAX_SIZE, logger)
+
+            save_indexes_manifest(manifest, manifest_path)
+
+    return cached_index
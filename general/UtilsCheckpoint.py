@@ -0,0 +1,72 @@
+__author__ = 'letovesnoi'
+
+import os
+
+from general import rqconfig
+from general import UtilsCache
+
+
+# Completed stages of run are saved to checkpoints directory together with fingerprint of their input.
+# Run with --resume skips stages, which fingerprint is unchanged and which output files are untouched.
+
+
+# fingerprint of input file(s): path, size and modification time:
+def get_files_stamps(paths):
+    if paths is None:
+        return None
+    if not isinstance(paths, (list, tuple)):
+        paths = [paths]
+
+    stamps = []
+    for path in paths:
+        if path is not None and os.path.exists(path):
+            stat = os.stat(path)
+            stamps.append((path, stat.st_size, int(stat.st_mtime)))
+        else:
+            stamps.append((path, None, None))
+
+    return stamps
+
+
+def get_stage_key(stage, *inputs):
+    return UtilsCache.get_cache_key(rqconfig.CACHE_VERSION, stage, inputs)
+
+
+def get_checkpoint_path(checkpoints_dir, stage):
+    if checkpoints_dir is None:
+        return None
+
+    return os.path.join(checkpoints_dir, '{}.pkl'.format(stage))
+
+
+# get output of stage completed in previous run or None if stage must be recomputed:
+def load_stage(checkpoints_dir, stage, stage_key, resume, logger):
+    checkpoint_path = get_checkpoint_path(checkpoints_dir, stage)
+    if not resume or checkpoint_path is None or not os.path.exists(checkpoint_path):
+        return None
+
+    checkpoint = UtilsCache.load_object(checkpoint_path, logger)
+    if checkpoint is None or checkpoint['key'] != stage_key:
+        logger.info('  input of stage {} is changed, it will be recomputed.'.format(stage))
+        return None
+
+    # output files of stage must be the same as after it:
+    files_stamps = get_files_stamps(checkpoint['files'])
+    if checkpoint['files_stamps'] != files_stamps or any(size is None for path, size, mtime in files_stamps):
+        logger.info('  output files of stage {} are changed, it will be recomputed.'.format(stage))
+        return None
+
+    logger.info('  stage {} is completed in previous run, skipped.'.format(stage))
+
+    return checkpoint['output']
+
+
+# save output of completed stage, files are paths of stage output files used by next stages:
+def save_stage(checkpoints_dir, stage, stage_key, output, files, logger):
+    checkpoint_path = get_checkpoint_path(checkpoints_dir, stage)
+    if checkpoint_path is None or output is None:
+        return
+
+    checkpoint = {'key': stage_key, 'output': output, 'files': files, 'files_stamps': get_files_stamps(files)}
+
+    UtilsCache.save_object(checkpoint, checkpoint_path, logger)
@@ -9,80 +9,36 @@ def get_coverage_positions(target_ids, target_starts, target_ends, query_ids, qu
     target_cov_pos = {}
     query_cov_pos = {}
 
-    tmp_stack_i_exons = []
-    tmp_stack_i_blocks = []
-
-    # needs sorted coordinates:
-    dict_coordinates = {}
-    dict_coordinates['blocks_starts'] = query_starts
-    dict_coordinates['blocks_ends'] = query_ends
-
-    dict_coordinates['exons_starts'] = target_starts
-    dict_coordinates['exons_ends'] = target_ends
-
-    i_current = {'blocks_starts': 0, 'blocks_ends': 0, 'exons_starts': 0, 'exons_ends': 0}
-
-    # get count of covered bases:
-    while dict_coordinates != {}:
-        (current, key) = min((dict_coordinates[key0][i_current[key0]], key0) for key0 in dict_coordinates.keys())
-
-        # if start and end are equal, we choose start:
-        if key == 'blocks_ends' and 'blocks_starts' in dict_coordinates and \
-                        dict_coordinates['blocks_ends'][i_current['blocks_ends']] == dict_coordinates['blocks_starts'][i_current['blocks_starts']]:
-                key = 'blocks_starts'
-        elif key == 'blocks_ends' and 'exons_starts' in dict_coordinates and \
-                        dict_coordinates['exons_starts'][i_current['exons_starts']] == dict_coordinates['blocks_ends'][i_current['blocks_ends']]:
-                key = 'exons_starts'
-        elif key == 'exons_ends' and 'exons_starts' in dict_coordinates and \
-                        dict_coordinates['exons_ends'][i_current['exons_ends']] == dict_coordinates['exons_starts'][i_current['exons_starts']]:
-                key = 'exons_starts'
-        elif key == 'exons_ends' and 'blocks_starts' in dict_coordinates and \
-                        dict_coordinates['exons_ends'][i_current['exons_ends']] == dict_coordinates['blocks_starts'][i_current['blocks_starts']]:
-                key = 'blocks_starts'
-
-        if key == 'exons_starts':
-            tmp_stack_i_exons.append(i_current[key])
-
-        elif key == 'blocks_starts':
-            tmp_stack_i_blocks.append(i_current[key])
-
-        elif key == 'exons_ends':
-            for i_block in tmp_stack_i_blocks:
-                start_coverage = max(query_starts[i_block], target_starts[i_current[key]])
-                end_coverage = min(query_ends[i_block], target_ends[i_current[key]])
-
-                if target_ids[i_current[key]] not in target_cov_pos:
-                    target_cov_pos[target_ids[i_current[key]]] = []
-                target_cov_pos[target_ids[i_current[key]]].append((start_coverage - target_starts[i_current[key]],
-                                                                   end_coverage - target_starts[i_current[key]]))
-
-                if query_ids[i_block] not in query_cov_pos:
-                    query_cov_pos[query_ids[i_block]] = []
-                query_cov_pos[query_ids[i_block]].append((start_coverage - query_starts[query_ids[i_block]],
-                                                          end_coverage - query_starts[query_ids[i_block]]))
-            if i_current[key] in tmp_stack_i_exons:
-                tmp_stack_i_exons.remove(i_current[key])
-
-        elif key == 'blocks_ends':
-            for i_exon in tmp_stack_i_exons:
-                start_coverage = max(query_starts[i_current[key]], target_starts[i_exon])
-                end_coverage = min(query_ends[i_current[key]], target_ends[i_exon])
-
-                if target_ids[i_exon] not in target_cov_pos:
-                    target_cov_pos[target_ids[i_exon]] = []
-                target_cov_pos[target_ids[i_exon]].append((start_coverage - target_starts[i_exon],
-                                                           end_coverage - target_starts[i_exon]))
-
-                if query_ids[i_current[key]] not in query_cov_pos:
-                    query_cov_pos[query_ids[i_current[key]]] = []
-                query_cov_pos[query_ids[i_current[key]]].append((start_coverage - query_starts[query_ids[i_current[key]]],
-                                                                 end_coverage - query_starts[query_ids[i_current[key]]]))
-            if i_current[key] in tmp_stack_i_blocks:
-                tmp_stack_i_blocks.remove(i_current[key])
-        if i_current[key] == len(dict_coordinates[key]) - 1:
-            del dict_coordinates[key]
-        else:
-            i_current[key] += 1
+    # needs coordinates sorted by starts, blocks mustn't overlap (their ends are sorted too).
+    # Single merge pass: pointer to the first block, which may overlap current or next exons,
+    # moves only forward; coordinates are inclusive:
+    n_blocks = len(query_starts)
+    i_first_block = 0
+    for i_exon in range(len(target_starts)):
+        exon_start = target_starts[i_exon]
+        exon_end = target_ends[i_exon]
+
+        while i_first_block < n_blocks and query_ends[i_first_block] < exon_start:
+            i_first_block += 1
+
+        i_block = i_first_block
+        while i_block < n_blocks and query_starts[i_block] <= exon_end:
+            start_coverage = max(query_starts[i_block], exon_start)
+            end_coverage = min(query_ends[i_block], exon_end)
+
+            if start_coverage <= end_coverage:
+                id_exon = target_ids[i_exon]
+                if id_exon not in target_cov_pos:
+                    target_cov_pos[id_exon] = []
+                target_cov_pos[id_exon].append((start_coverage - exon_start, end_coverage - exon_start))
+
+                id_block = query_ids[i_block]
+                if id_block not in query_cov_pos:
+                    query_cov_pos[id_block] = []
+                query_cov_pos[id_block].append((start_coverage - query_starts[id_block],
+                                                end_coverage - query_starts[id_block]))
+
+            i_block += 1
 
     return target_cov_pos, query_cov_pos
 
@@ -143,83 +99,35 @@ def get_internal_exons(strand, sqlite3_db_genes, target_name, target_starts, tar
     return internal_exons
 
 
-def get_internal_isoforms(sqlite3_db_genes, type_isoforms, internal_exons):
-    internal_isoforms = set()
+def get_internal_isoforms(genes_model, internal_exons):
+    internal_isoforms = []
+    ids_internal_isoforms = set()
     for exon in internal_exons:
         if exon.featuretype in UtilsAnnotations.default_type_exons:
-            internal_isoforms.update(list(sqlite3_db_genes.parents(exon.id, featuretype=type_isoforms)))
+            parent_isoforms = genes_model.get_parent_isoforms(exon)
         # for prokaryotes:
         else:
-            internal_isoforms.update([exon])
+            parent_isoforms = [exon]
+
+        for isoform in parent_isoforms:
+            if isoform.id not in ids_internal_isoforms:
+                ids_internal_isoforms.add(isoform.id)
+                internal_isoforms.append(isoform)
 
     return internal_isoforms
 
 
-# get internal exons faster (without gff utils binning strategy -- usage sorted coordinates of exons):
-def get_internal_exons_faster(sqlite3_db_genes, sorted_exons_attr, alignment_t_starts, alignment_t_ends, strand, id_chr):
+# get internal exons faster (without gff utils binning strategy -- usage interval index over sorted exons):
+def get_internal_exons_faster(genes_model, sorted_exons_attr, alignment_t_starts, alignment_t_ends, strand, id_chr):
     ids_internal_exons = set()
-    internal_exons = set()
-
-    # ids_internal_exons_tmp = set()
 
+    exons_index = sorted_exons_attr.exons_index[str(strand)][id_chr]
     for i_block in range(len(alignment_t_starts)):
-        bin_start_i_in_ends, bin_end_i_in_ends = \
-            get_bin_indexes(alignment_t_starts[i_block], sorted_exons_attr.sort_target_ends[str(strand)][id_chr],
-                            sorted_exons_attr.index_sort_ends[str(strand)][id_chr], sorted_exons_attr.index_step[id_chr])
-        if bin_start_i_in_ends is not None and bin_end_i_in_ends is not None:
-            bin_ends = sorted_exons_attr.sort_target_ends[str(strand)][id_chr][bin_start_i_in_ends:bin_end_i_in_ends]
-            begin = UtilsGeneral.get_bin_search_position_of_element(bin_ends, alignment_t_starts[i_block]) + bin_start_i_in_ends
-            ids_ends_set = set(sorted_exons_attr.ids_by_end[strand][id_chr][begin:])
-        else:
-            ids_ends_set = set()
-
-
-        bin_start_i_in_starts, bin_end_i_in_starts = \
-            get_bin_indexes(alignment_t_ends[i_block], sorted_exons_attr.sort_target_starts[str(strand)][id_chr],
-                            sorted_exons_attr.index_sort_starts[str(strand)][id_chr], sorted_exons_attr.index_step[id_chr])
-        if bin_start_i_in_starts is not None and bin_end_i_in_starts is not None:
-            bin_starts = sorted_exons_attr.sort_target_starts[str(strand)][id_chr][bin_start_i_in_starts:bin_end_i_in_starts]
-            end = UtilsGeneral.get_bin_search_position_of_element(bin_starts, alignment_t_ends[i_block]) + bin_start_i_in_starts
-            while end != len(sorted_exons_attr.sort_target_starts[strand][id_chr]) and end == sorted_exons_attr.sort_target_starts[strand][id_chr][end]:
-                end += 1
-            ids_starts_set = set(sorted_exons_attr.ids_by_start[strand][id_chr][:end])
-        else:
-            ids_starts_set = set(sorted_exons_attr.ids_by_start[strand][id_chr])
-
-        ids_internal_exons = ids_internal_exons.union(ids_ends_set.intersection(ids_starts_set))
-
-        for id_exon in ids_internal_exons:
-            internal_exons.add(sqlite3_db_genes[id_exon])
-
-        # TODO: delete
-        # begin_tmp = UtilsGeneral.get_bin_search_position_of_element(sorted_exons_attr.sort_target_ends[str(strand)][id_chr], alignment_t_starts[i_block])
-        # ids_ends_set_tmp = set(sorted_exons_attr.ids_by_end[strand][id_chr][begin_tmp:])
-        #
-        #
-        # end_tmp = UtilsGeneral.get_bin_search_position_of_element(sorted_exons_attr.sort_target_starts[str(strand)][id_chr], alignment_t_ends[i_block])
-        # while end_tmp != len(sorted_exons_attr.sort_target_starts[strand][id_chr]) and end_tmp == sorted_exons_attr.sort_target_starts[strand][id_chr][end_tmp]:
-        #     end_tmp += 1
-        # ids_starts_set_tmp = set(sorted_exons_attr.ids_by_start[strand][id_chr][:end_tmp])
-        #
-        # ids_internal_exons_tmp = ids_internal_exons_tmp.union(ids_ends_set_tmp.intersection(ids_starts_set_tmp))
-        #
-        # if ids_internal_exons != ids_internal_exons_tmp:
-        #     print '!!!!'
-        #     import sys
-        #     sys.exit()
-
-    return list(internal_exons)
-
-
-def get_bin_indexes(alignment_pos, arr, index_arr, step_i):
-    int_part_start = alignment_pos // step_i
-
-    if int_part_start >= len(index_arr):
-        return None, None
-    start_index = index_arr[int_part_start]
-    end_index = max(len(arr), start_index + step_i)
-
-    return start_index, end_index
+        ids_internal_exons.update(exons_index.get_overlapping_ids(alignment_t_starts[i_block], alignment_t_ends[i_block]))
+
+    internal_exons = sorted([genes_model[id_exon] for id_exon in ids_internal_exons], key=lambda exon: exon.index)
+
+    return internal_exons
 
 
 # get id best mapped isoform or transcript:
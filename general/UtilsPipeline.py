@@ -81,6 +81,8 @@ def get_arguments():
     group_basic.add_argument('-o', '--output_dir', help='Directory to store all results [default: rnaQUAST_results/results_<datetime>]', type=str)
     group_basic.add_argument('--test', help='Run rnaQUAST on the test data from the test_data folder, output directory is rnaOUAST_test_output', action='store_true')
     group_basic.add_argument('-d', '--debug', help='Report detailed information, typically used only for detecting problems.', action='store_true')
+    group_basic.add_argument('--resume', help='Resume interrupted run in the output directory, completed stages with unchanged '
+                                              'input are not recomputed', action='store_true')
 
     group_advanced = parser.add_argument_group('Advanced options')
     group_advanced.add_argument('-t',  '--threads', help='Maximum number of threads, default: min(number of CPUs / 2, 16)', type=int)
@@ -116,6 +118,8 @@ def get_arguments():
     group_gffutils = parser.add_argument_group('Gffutils related options')
     group_gffutils.add_argument('--disable_infer_genes', help='Use this option if your GTF file already contains genes records', action='store_true')
     group_gffutils.add_argument('--disable_infer_transcripts', help='Use this option if your GTF already contains transcripts records', action='store_true')
+    group_gffutils.add_argument('--cache_dir', help='Directory to keep gene databases and structures derived from them '
+                                                    'between runs (speeds up next runs with the same annotation)', type=str)
     # group_gffutils.add_argument('--store_db', help='Save new complete gene database generated by gffutils (speeds up next runs with these database)', action='store_true')
 
 
@@ -135,6 +139,9 @@ def get_arguments():
 
     args = parser.parse_args()
 
+    if args.resume and args.output_dir is None:
+        parser.error('--resume requires --output_dir of interrupted run')
+
     return args
 
 
@@ -399,6 +406,9 @@ def get_abspath_input_data(args):
     if args.gmap_index and not os.path.isabs(args.gmap_index):
         args.gmap_index = os.path.abspath(args.gmap_index)
 
+    if args.cache_dir and not os.path.isabs(args.cache_dir):
+        args.cache_dir = os.path.abspath(args.cache_dir)
+
     if args.output_dir and not os.path.isabs(args.output_dir):
         args.output_dir = os.path.abspath(args.output_dir)
 
@@ -0,0 +1,202 @@
+__author__ = 'letovesnoi'
+
+import os
+import sys
+import time
+import json
+import shlex
+import signal
+import resource
+import threading
+import subprocess
+
+
+# Profile of run: wall time, CPU time, peak RSS and throughput of every pipeline stage and external command.
+# Records of forked worker processes are gathered in main process as notifications of logger.
+
+_run_start_time = time.time()
+
+_records = []
+_records_lock = threading.Lock()
+
+# stack of names of running stages of current thread, commands are attributed to the innermost one:
+_local = threading.local()
+
+
+def get_current_stage():
+    stages_stack = getattr(_local, 'stages_stack', None)
+    if not stages_stack:
+        return None
+    return stages_stack[-1]
+
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS:
+def get_rss_mb(ru_maxrss):
+    if sys.platform == 'darwin':
+        return ru_maxrss / float(1 << 20)
+    return ru_maxrss / float(1 << 10)
+
+
+def add_record(record):
+    with _records_lock:
+        _records.append(record)
+
+
+def get_cpu_time(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def get_throughput(items, wall_time):
+    if wall_time <= 0:
+        return {}
+    return dict((items_name, items[items_name] / wall_time) for items_name in items)
+
+
+class ProfileStage():
+    """Class of profiled pipeline stage used as context manager, CPU time and peak RSS are of whole process"""
+
+    def __init__(self, name, parent=None, **items):
+        self.name = name
+        self.parent = parent
+        # numbers of processed items (transcripts, alignments, reads) for throughput:
+        self.items = items
+
+        self.start_time = None
+        self.start_cpu_time = None
+        self.start_children_cpu_time = None
+
+    def add_items(self, items_name, items_num):
+        self.items[items_name] = self.items.get(items_name, 0) + items_num
+
+    def __enter__(self):
+        if self.parent is None:
+            self.parent = get_current_stage()
+        if getattr(_local, 'stages_stack', None) is None:
+            _local.stages_stack = []
+        _local.stages_stack.append(self.name)
+
+        self.start_time = time.time()
+        self.start_cpu_time = get_cpu_time(resource.RUSAGE_SELF)
+        self.start_children_cpu_time = get_cpu_time(resource.RUSAGE_CHILDREN)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.stages_stack.pop()
+
+        wall_time = time.time() - self.start_time
+
+        add_record({'name': self.name, 'type': 'stage', 'parent': self.parent, 'pid': os.getpid(),
+                    'start': self.start_time - _run_start_time, 'wall_time': wall_time,
+                    'cpu_time': get_cpu_time(resource.RUSAGE_SELF) - self.start_cpu_time,
+                    'children_cpu_time': get_cpu_time(resource.RUSAGE_CHILDREN) - self.start_children_cpu_time,
+                    'peak_rss_mb': get_rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+                    'items': self.items, 'throughput': get_throughput(self.items, wall_time),
+                    'failed': exc_type is not None})
+
+        return False
+
+
+def profile_stage(name, parent=None, **items):
+    return ProfileStage(name, parent, **items)
+
+
+# EXTERNAL COMMANDS:
+class Command():
+    """Class of external command started in shell, its resources usage is recorded when it is waited"""
+
+    def __init__(self, command, name, new_process_group=False):
+        self.command = command
+        self.name = name
+        self.parent = get_current_stage()
+
+        self.start_time = time.time()
+        # command in its own process group can be killed together with programs started by shell:
+        self.process = subprocess.Popen(command, shell=True, start_new_session=new_process_group)
+        self.new_process_group = new_process_group
+
+    def wait(self):
+        # wait4 gives resources used by shell and all commands it waited for:
+        pid, status, usage = os.wait4(self.process.pid, 0)
+        if os.WIFSIGNALED(status):
+            exit_code = -os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+        self.process.returncode = exit_code
+
+        add_record({'name': self.name, 'type': 'command', 'parent': self.parent, 'pid': os.getpid(),
+                    'start': self.start_time - _run_start_time, 'wall_time': time.time() - self.start_time,
+                    'cpu_time': usage.ru_utime + usage.ru_stime, 'children_cpu_time': 0.0,
+                    'peak_rss_mb': get_rss_mb(usage.ru_maxrss), 'items': {}, 'throughput': {},
+                    'command': self.command, 'exit_code': exit_code})
+
+        return exit_code
+
+    # terminate command, which is not waited yet:
+    def kill(self):
+        try:
+            if self.new_process_group:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            else:
+                self.process.terminate()
+        except OSError:
+            pass
+
+
+# name of command is name of program, without path:
+def get_command_name(command):
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        words = command.split()
+    if not words:
+        return command
+    return os.path.basename(words[0])
+
+
+def start_command(command, name=None, new_process_group=False):
+    return Command(command, name if name is not None else get_command_name(command), new_process_group)
+
+
+# the same as subprocess.call(command, shell=True), but resources usage of command is recorded:
+def call(command, name=None):
+    return start_command(command, name).wait()
+
+
+# RECORDS OF WORKER PROCESSES:
+def reset_records():
+    with _records_lock:
+        del _records[:]
+
+
+def get_records():
+    with _records_lock:
+        return list(_records)
+
+
+def add_records(records):
+    with _records_lock:
+        _records.extend(records)
+
+
+def save_profile(output_dir, logger):
+    profile_path = os.path.join(output_dir, 'profile.json')
+
+    profile = {'wall_time': time.time() - _run_start_time,
+               'cpu_time': get_cpu_time(resource.RUSAGE_SELF),
+               'children_cpu_time': get_cpu_time(resource.RUSAGE_CHILDREN),
+               'peak_rss_mb': get_rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+               'children_peak_rss_mb': get_rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss),
+               'records': sorted(get_records(), key=lambda record: record['start'])}
+
+    try:
+        with open(profile_path, 'w') as out_handle:
+            json.dump(profile, out_handle, indent=2, sort_keys=True)
+    except (IOError, OSError):
+        logger.warning('Can\'t save profile to {}.'.format(profile_path))
+        return None
+
+    logger.info('  Profile of run saved to {}'.format(profile_path))
+
+    return profile_path
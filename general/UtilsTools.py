@@ -2,7 +2,6 @@ __author__ = 'letovesnoi'
 
 import os
 import sys
-import subprocess
 import shutil
 
 import math
@@ -12,8 +11,12 @@ import datetime
 from general import rqconfig
 from general import UtilsGeneral
 from general import UtilsPipeline
+from general import UtilsCache
+from general import UtilsProfile
 from general import parallel_blat_run
 
+from quast_libs import fastaparser
+
 
 def run_blat(args_database, args_reference, transcripts_dicts, args_labels, args_threads, tmp_dir, logger, log_dir):
 
@@ -61,7 +64,7 @@ def run_blat(args_database, args_reference, transcripts_dicts, args_labels, args
 def get_database_split_chr(output_dir, reference_path, logger):
     database_dir = os.path.join(output_dir, 'database_dir')
     command = 'mkdir {}'.format(database_dir)
-    subprocess.call(command, shell=True)
+    UtilsProfile.call(command)
 
     # path to file with pathes to scaffolds/chromosomes/patches:
     chrs_database_path = os.path.join(output_dir, 'scaffolds.database')
@@ -99,7 +102,7 @@ def get_database_split_chr(output_dir, reference_path, logger):
 def get_upper_case_database_split_chr(database, tmp_dir, logger):
     database_dir = os.path.join(tmp_dir, 'database_upper_dir')
     command = 'mkdir {}'.format(database_dir)
-    subprocess.call(command, shell=True)
+    UtilsProfile.call(command)
 
     # path to file with pathes to scaffolds/chromosomes/patches:
     chrs_database_path = os.path.join(tmp_dir, 'scaffolds.upper.database')
@@ -135,7 +138,7 @@ def get_upper_case_database_split_chr(database, tmp_dir, logger):
     return reference_pathes
 
 
-def get_blast_db(isoforms_fa_path, gtf_label, tmp_dir, logger, log_dir):
+def get_blast_db(isoforms_fa_path, gtf_label, tmp_dir, logger, log_dir, cache_dir=None):
     program_name = 'makeblastdb'
 
     log_out = os.path.join(log_dir, program_name + '.log')
@@ -143,20 +146,43 @@ def get_blast_db(isoforms_fa_path, gtf_label, tmp_dir, logger, log_dir):
     logger.print_timestamp()
     logger.info('Getting blast database for {}'.format(isoforms_fa_path))
 
-    isoforms_blast_db = os.path.join(tmp_dir, '{}.isoforms'.format(gtf_label))
+    if cache_dir is not None:
+        index_key = UtilsCache.get_cache_key(rqconfig.CACHE_VERSION, UtilsCache.get_file_hash(isoforms_fa_path), gtf_label,
+                                             UtilsCache.get_tool_version('{} -version'.format(program_name)))
 
-    command = '{} -in {} -dbtype nucl -out {} >> {}'.format(program_name, isoforms_fa_path, isoforms_blast_db, log_out)
-    exit_code = subprocess.call(command, shell=True)
-    if exit_code != 0:
-        logger.error(message='{} failed!'.format(program_name), exit_with_code=exit_code, to_stderr=True)
-        sys.exit(exit_code)
+        def build_index(index_dir):
+            return build_blast_db(program_name, isoforms_fa_path, os.path.join(index_dir, '{}.isoforms'.format(gtf_label)),
+                                  log_out) == 0
+
+        cached_index = UtilsCache.get_cached_index(cache_dir, 'blast', index_key, build_index, logger)
+        if cached_index is None:
+            logger.error(message='{} failed!'.format(program_name), exit_with_code=1, to_stderr=True)
+            sys.exit(1)
+        # database is used by blastn for all assemblies:
+        UtilsCache.hold_index_until_exit(cached_index)
+
+        isoforms_blast_db = os.path.join(cached_index.index_dir, '{}.isoforms'.format(gtf_label))
+    else:
+        isoforms_blast_db = os.path.join(tmp_dir, '{}.isoforms'.format(gtf_label))
+
+        exit_code = build_blast_db(program_name, isoforms_fa_path, isoforms_blast_db, log_out)
+        if exit_code != 0:
+            logger.error(message='{} failed!'.format(program_name), exit_with_code=exit_code, to_stderr=True)
+            sys.exit(exit_code)
 
     logger.info('  saved to {}'.format(isoforms_blast_db))
 
     return isoforms_blast_db
 
 
-def align_transcripts_to_isoforms_by_blastn(transcripts_path, isoforms_blast_db, tmp_dir, label, logger, log_dir):
+def build_blast_db(program_name, isoforms_fa_path, isoforms_blast_db, log_out):
+    command = '{} -in {} -dbtype nucl -out {} >> {}'.format(program_name, isoforms_fa_path, isoforms_blast_db, log_out)
+
+    return UtilsProfile.call(command)
+
+
+def align_transcripts_to_isoforms_by_blastn(transcripts_path, isoforms_blast_db, tmp_dir, label, logger, log_dir,
+                                            threads=1):
     program_name = 'blastn'
 
     log_out = os.path.join(log_dir, label + '.' + program_name + '.log')
@@ -166,14 +192,52 @@ def align_transcripts_to_isoforms_by_blastn(transcripts_path, isoforms_blast_db,
 
     alignment_isoforms_path = '{}.blast6'.format(os.path.join(tmp_dir, label))
 
-    command = '{} -query {} -out {} -db {} -num_alignments 10 -evalue 0.01 -outfmt "6 qseqid sseqid pident length ' \
-              'mismatch gapopen qstart qend sstart send evalue bitscore sstrand" 1>> {}'.\
-        format(program_name, transcripts_path, alignment_isoforms_path, isoforms_blast_db, log_out)
-    exit_code = subprocess.call(command, shell=True)
+    # shards of transcripts are aligned by parallel blastn processes, outputs are glued in order of shards,
+    # so transcripts keep their order as after single blastn:
+    shards_dir = None
+    if threads > 1:
+        shards_dir = UtilsPipeline.create_empty_folder(os.path.join(tmp_dir, '{}_blastn_shards'.format(label)))
+        transcripts_shards = split_fasta_by_length(transcripts_path, threads, shards_dir)
+        alignment_shards = [shard_path + '.blast6' for shard_path in transcripts_shards]
+        logger.info('    {} shards are aligned in parallel.'.format(len(transcripts_shards)))
+    else:
+        transcripts_shards = [transcripts_path]
+        alignment_shards = [alignment_isoforms_path]
+
+    processes = []
+    for i_shard in range(len(transcripts_shards)):
+        command = '{} -query {} -out {} -db {} -num_alignments 10 -evalue 0.01 -outfmt "6 qseqid sseqid pident length ' \
+                  'mismatch gapopen qstart qend sstart send evalue bitscore sstrand" 1>> {}'.\
+            format(program_name, transcripts_shards[i_shard], alignment_shards[i_shard], isoforms_blast_db, log_out)
+        processes.append(UtilsProfile.start_command(command, new_process_group=shards_dir is not None))
+
+    exit_code = 0
+    i_process = 0
+    try:
+        while exit_code == 0 and i_process < len(processes):
+            exit_code = processes[i_process].wait()
+            i_process += 1
+    finally:
+        # failed shard (or interruption) stops other shards, they are waited so no blastn outlives this stage:
+        if exit_code != 0 or i_process < len(processes):
+            for process in processes[i_process:]:
+                process.kill()
+            for process in processes[i_process:]:
+                process.wait()
+            if shards_dir is not None:
+                shutil.rmtree(shards_dir, ignore_errors=True)
+
     if exit_code != 0:
         logger.error(message='{} failed for {}!'.format(program_name, label), exit_with_code=exit_code, to_stderr=True)
         sys.exit(exit_code)
 
+    if shards_dir is not None:
+        with open(alignment_isoforms_path, 'w') as out_handle:
+            for alignment_shard_path in alignment_shards:
+                with open(alignment_shard_path, 'r') as in_handle:
+                    shutil.copyfileobj(in_handle, out_handle)
+        shutil.rmtree(shards_dir)
+
     logger.info('    saved to {}'.format(alignment_isoforms_path))
 
     logger.info('    log can be found in {}.'.format(log_out))
@@ -181,7 +245,36 @@ def align_transcripts_to_isoforms_by_blastn(transcripts_path, isoforms_blast_db,
     return alignment_isoforms_path
 
 
-def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_threads, args_gmap_index, tmp_dir, logger, log_dir):
+# split FASTA into consecutive shards of about equal total length of sequences, empty shards are not created:
+def split_fasta_by_length(fasta_path, shards_num, out_dir):
+    tot_len = 0
+    for name, seq in fastaparser.read_fasta(fasta_path):
+        tot_len += len(seq)
+
+    shards_pathes = []
+    curr_len = 0
+    out_handle = None
+    for name, seq in fastaparser.read_fasta(fasta_path):
+        # next shard starts when current one reaches its part of total length:
+        if out_handle is None or curr_len * shards_num >= tot_len * len(shards_pathes):
+            if out_handle is not None:
+                out_handle.close()
+            shards_pathes.append(os.path.join(out_dir, '{}.fasta'.format(len(shards_pathes))))
+            out_handle = open(shards_pathes[-1], 'w')
+
+        out_handle.write('>{}\n'.format(name))
+        for i in range(0, len(seq), 60):
+            out_handle.write(seq[i:i + 60] + '\n')
+        curr_len += len(seq)
+
+    if out_handle is not None:
+        out_handle.close()
+
+    return shards_pathes
+
+
+def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_threads, args_gmap_index, tmp_dir, logger,
+             log_dir, cache_dir=None):
     args_alignment = []
 
     if genome_len < 2 ** 32:
@@ -194,6 +287,7 @@ def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_thr
     gmap_build_logger_out_path = os.path.join(log_dir, gmap_build + '.out.log')
     gmap_build_logger_err_path = os.path.join(log_dir, gmap_build + '.err.log')
 
+    in_reference = args_reference
     args_reference = UtilsGeneral.get_upper_case_fasta(args_reference, tmp_dir, logger)
 
     ref_label = os.path.split(args_reference)[-1][:os.path.split(args_reference)[-1].rfind('.f')]
@@ -203,18 +297,31 @@ def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_thr
     # else:
     # RUN GMAP:
     # create index (gmap_build):
+    cached_index = None
+    if args_gmap_index is None and cache_dir is not None:
+        logger.print_timestamp()
+        logger.info('Getting genome index by {} from cache...'.format(gmap_build))
+
+        index_key = UtilsCache.get_cache_key(rqconfig.CACHE_VERSION, UtilsCache.get_file_hash(in_reference), ref_label,
+                                             UtilsCache.get_tool_version('{} --version'.format(gmap_run)))
+
+        def build_index(index_dir):
+            return build_gmap_index(gmap_build, index_dir, ref_label, args_reference, gmap_build_logger_out_path,
+                                    gmap_build_logger_err_path, logger) == 0
+
+        cached_index = UtilsCache.get_cached_index(cache_dir, 'gmap', index_key, build_index, logger)
+        if cached_index is None:
+            logger.error(message='{} failed!'.format(gmap_build), exit_with_code=1, to_stderr=True)
+        args_gmap_index = os.path.join(cached_index.index_dir, ref_label)
+
     if args_gmap_index is None:
         logger.print_timestamp()
         logger.info('Creating genome index by {}...'.format(gmap_build))
 
         start_time = datetime.datetime.now()
 
-        command = '{gmap_build} -D {tmp_dir} -d {ref_index_name} {reference} 1>> {log_out_1} 2>> {log_out_2}'.\
-            format(gmap_build=gmap_build, tmp_dir=tmp_dir, ref_index_name=ref_label, reference=args_reference,
-                   log_out_1=gmap_build_logger_out_path, log_out_2=gmap_build_logger_err_path)
-        exit_code = subprocess.call(command, shell=True)
-
-        logger.info('  logs can be found in {} and {}.'.format(gmap_build_logger_out_path, gmap_build_logger_err_path))
+        exit_code = build_gmap_index(gmap_build, tmp_dir, ref_label, args_reference, gmap_build_logger_out_path,
+                                     gmap_build_logger_err_path, logger)
 
         if exit_code != 0:
             logger.error(message='{} failed!'.format(gmap_build), exit_with_code=exit_code, to_stderr=True)
@@ -227,7 +334,7 @@ def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_thr
         logger.info('\nGMAP_BUILD TIME: {}\n\n'.format(spent_time))
     else:
         command = 'ln -s {} {}'.format(args_gmap_index, os.path.join(tmp_dir, ref_label))
-        subprocess.call(command, shell=True)
+        UtilsProfile.call(command)
 
     # align (gmap):
     for i_transcripts in range(len(args_transcripts)):
@@ -244,7 +351,7 @@ def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_thr
                   ' 2>> {log_out_2}'.\
             format(gmap=gmap_run, tmp_dir=tmp_dir, ref_index_name=ref_label, transcripts=args_transcripts[i_transcripts],
                    threads=args_threads, alignment_out=alignment_psl_path, log_out_2=gmap_run_logger_err_path)
-        exit_code = subprocess.call(command, shell=True)
+        exit_code = UtilsProfile.call(command)
 
         logger.info('  log can be found in {}.'.format(gmap_run_logger_err_path))
 
@@ -261,13 +368,28 @@ def run_gmap(args_reference, genome_len, args_transcripts, args_labels, args_thr
 
         logger.info('\nGMAP TIME: {}\n\n'.format(spent_time))
 
+    # index from cache isn't used anymore, so other runs can evict it:
+    if cached_index is not None:
+        cached_index.release()
+
     return args_alignment
 
 
+def build_gmap_index(gmap_build, index_dir, ref_label, reference, log_out_1, log_out_2, logger):
+    command = '{gmap_build} -D {index_dir} -d {ref_index_name} {reference} 1>> {log_out_1} 2>> {log_out_2}'.\
+        format(gmap_build=gmap_build, index_dir=index_dir, ref_index_name=ref_label, reference=reference,
+               log_out_1=log_out_1, log_out_2=log_out_2)
+    exit_code = UtilsProfile.call(command)
+
+    logger.info('  logs can be found in {} and {}.'.format(log_out_1, log_out_2))
+
+    return exit_code
+
+
 # https://github.com/alexdobin/STAR/releases
 # It is strongly recommended to include major chromosomes as well as un-placed and un-localized scaffolds.
 def run_STAR(threads, reference_path, gtf_path, single_reads, left_reads, right_reads, output_dir,
-             sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genome_len, logger, log_dir):
+             sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genome_len, logger, log_dir, cache_dir=None):
     # Basic STAR workflow consists of 2 steps:
     program_name = 'STAR'
 
@@ -285,40 +407,43 @@ def run_STAR(threads, reference_path, gtf_path, single_reads, left_reads, right_
     # and annotations (GTF file))
     genome_dir = os.path.join(star_outdir, 'genome_dir')
 
-    if not os.path.exists(genome_dir):
-        mode = '--runMode'
+    genomeSAindexNbases = min(14, math.log(genome_len, 2) // 2 - 1)
 
+    cached_index = None
+    if cache_dir is not None:
+        index_key_parts = [rqconfig.CACHE_VERSION, UtilsCache.get_file_hash(reference_path), genomeSAindexNbases,
+                           UtilsCache.get_tool_version('{} --version'.format(program_name))]
+        if gtf_path is not None:
+            index_key_parts += [UtilsCache.get_file_hash(gtf_path), sjdbGTFtagExonParentTranscript,
+                                sjdbGTFtagExonParentGene]
+        index_key = UtilsCache.get_cache_key(*index_key_parts)
+
+        def build_index(index_dir):
+            return build_STAR_index(program_name, threads, index_dir, reference_path, gtf_path,
+                                    sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genomeSAindexNbases,
+                                    star_logger_out_path, star_logger_err_path, logger) == 0
+
+        cached_index = UtilsCache.get_cached_index(cache_dir, 'STAR', index_key, build_index, logger)
+        if cached_index is None:
+            logger.error('{program_name} --runMode failed!'.format(program_name=program_name))
+            return None
+        genome_dir = cached_index.index_dir
+    elif not os.path.exists(genome_dir):
         # create tmp output directory:
         tmp_dir = UtilsPipeline.create_empty_folder(os.path.join(star_outdir, 'tmp_dir'))
 
         # create tmp_genome_dir directory:
         tmp_genome_dir = UtilsPipeline.create_empty_folder(os.path.join(tmp_dir, 'genome_dir'))
 
-        genomeSAindexNbases = min(14, math.log(genome_len, 2) // 2 - 1)
-
-        command = '{program_name} {mode} genomeGenerate --runThreadN {threads} --genomeDir {tmp_genome_dir} ' \
-                  '--genomeFastaFiles {reference} --genomeSAindexNbases {genomeSAindexNbases}'.\
-            format(program_name=program_name, mode=mode, threads=threads, tmp_genome_dir=tmp_genome_dir,
-                   reference=reference_path, genomeSAindexNbases=genomeSAindexNbases)
-
-        if gtf_path is not None:
-            command += ' --sjdbGTFfile {gtf} --sjdbGTFtagExonParentTranscript {parent_transcript} --sjdbGTFtagExonParentGene {parent_gene}'.\
-                format(gtf=gtf_path, parent_transcript=sjdbGTFtagExonParentTranscript, parent_gene=sjdbGTFtagExonParentGene)
-        command += ' 1>> {log_out_1} 2>> {log_out_2}'.format(log_out_1=star_logger_out_path, log_out_2=star_logger_err_path)
-
-        logger.print_timestamp()
-        logger.info('  ' + command)
-
-        exit_code = subprocess.call(command, shell=True)
-
-        logger.info('    logs can be found in {} and {}.'.format(star_logger_out_path, star_logger_err_path))
+        exit_code = build_STAR_index(program_name, threads, tmp_genome_dir, reference_path, gtf_path,
+                                     sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genomeSAindexNbases,
+                                     star_logger_out_path, star_logger_err_path, logger)
 
         if exit_code != 0:
-            logger.error('{program_name_mode} failed!'. format(program_name_mode=program_name + ' ' + mode,
-                                                               program_name=program_name))
+            logger.error('{program_name} --runMode failed!'.format(program_name=program_name))
         else:
             command = 'mv {} {}'.format(tmp_genome_dir, star_outdir)
-            subprocess.call(command, shell=True)
+            UtilsProfile.call(command)
 
     # 2 Mapping reads to the genome (supplied the genome files generated in the 1st step, as well as the RNA-seq reads
     # (sequences) in the form of FASTA or FASTQ files.)
@@ -343,7 +468,12 @@ def run_STAR(threads, reference_path, gtf_path, single_reads, left_reads, right_
 
     logger.print_timestamp()
     logger.info('  ' + command)
-    exit_code = subprocess.call(command, shell=True)
+    exit_code = UtilsProfile.call(command)
+
+    # index from cache isn't used anymore, so other runs can evict it:
+    if cached_index is not None:
+        cached_index.release()
+
     if exit_code != 0:
         star_outdir = None
 
@@ -356,10 +486,36 @@ def run_STAR(threads, reference_path, gtf_path, single_reads, left_reads, right_
     return star_outdir
 
 
+def build_STAR_index(program_name, threads, genome_dir, reference_path, gtf_path, sjdbGTFtagExonParentTranscript,
+                     sjdbGTFtagExonParentGene, genomeSAindexNbases, log_out_1, log_out_2, logger):
+    mode = '--runMode'
+
+    command = '{program_name} {mode} genomeGenerate --runThreadN {threads} --genomeDir {genome_dir} ' \
+              '--genomeFastaFiles {reference} --genomeSAindexNbases {genomeSAindexNbases}'.\
+        format(program_name=program_name, mode=mode, threads=threads, genome_dir=genome_dir,
+               reference=reference_path, genomeSAindexNbases=genomeSAindexNbases)
+
+    if gtf_path is not None:
+        command += ' --sjdbGTFfile {gtf} --sjdbGTFtagExonParentTranscript {parent_transcript} --sjdbGTFtagExonParentGene {parent_gene}'.\
+            format(gtf=gtf_path, parent_transcript=sjdbGTFtagExonParentTranscript, parent_gene=sjdbGTFtagExonParentGene)
+    command += ' 1>> {log_out_1} 2>> {log_out_2}'.format(log_out_1=log_out_1, log_out_2=log_out_2)
+
+    logger.print_timestamp()
+    logger.info('  ' + command)
+
+    exit_code = UtilsProfile.call(command)
+
+    logger.info('    logs can be found in {} and {}.'.format(log_out_1, log_out_2))
+
+    return exit_code
+
+
 def get_sam_by_STAR(threads, reference_path, gtf_path, single_reads, left_reads, right_reads, output_dir,
-                           sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genome_len, logger, log_dir):
+                           sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genome_len, logger, log_dir,
+                           cache_dir=None):
     star_outdir = run_STAR(threads, reference_path, gtf_path, single_reads, left_reads, right_reads, output_dir,
-                           sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genome_len, logger, log_dir)
+                           sjdbGTFtagExonParentTranscript, sjdbGTFtagExonParentGene, genome_len, logger, log_dir,
+                           cache_dir)
 
     if star_outdir is not None:
         out_sam_path = os.path.join(star_outdir, 'Aligned.out.sam')
@@ -379,7 +535,7 @@ def bam2sam(in_bam_path, output_dir, logger):
     out_sam_path = os.path.join(output_dir, in_bam_name[:in_bam_name.rfind('.bam')] + '.sam')
 
     command = '{program_name} -h -o {sam} {bam}'.format(program_name=program_name, sam=out_sam_path, bam=in_bam_path)
-    exit_code = subprocess.call(command, shell=True)
+    exit_code = UtilsProfile.call(command)
     if exit_code != 0:
         logger.error('{program_name} failed! Please add {program_name} in your PATH.'.format(program_name=program_name))
         sys.exit(2)
@@ -406,7 +562,7 @@ def get_sort_bam(in_bam_path, output_dir, logger, type='name'):
         command = '{program_name} {in_bam} {out_bam}'.format(program_name=program_name, in_bam=in_bam_path,
                                                              out_bam=out_bam_path[:-4])
 
-    exit_code = subprocess.call(command, shell=True)
+    exit_code = UtilsProfile.call(command)
     if exit_code != 0:
         logger.error('{program_name} failed! Please add {program_name} in your PATH.'.format(program_name=program_name),
                      exit_with_code=exit_code)
@@ -433,7 +589,7 @@ def get_genome_bowtie2_index(reference_path, logger, log_dir):
     command = '{program_name} {reference} {index} 1>> {log_out_1} 2>> {log_out_2}'.\
         format(program_name=program_name, reference=reference_path, index=out_bowtie2_index_path,
                log_out_1=bowtie_logger_out_path, log_out_2=bowtie_logger_err_path)
-    exit_code = subprocess.call(command, shell=True)
+    exit_code = UtilsProfile.call(command)
     if exit_code != 0:
         out_bowtie2_index_path = None
 
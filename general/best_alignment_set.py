@@ -1,5 +1,7 @@
 __author__ = 'letovesnoi'
 
+import bisect
+
 from general import UtilsGeneral
 
 
@@ -7,30 +9,69 @@ from general import UtilsGeneral
 # for determine misassemblies find best union with score define by union_penalty for non close (define as fake blat) alignments:
 def get_best_alignment_set(transcript_alignments, ALIGNMENT_THRESHOLDS):
     #logger.debug('      Getting best union alignments...')
-    best_score = - float('Inf')
-    best_b = None
+    if len(transcript_alignments) == 0:
+        return None
 
     q_ends = []
     for i in range(len(transcript_alignments)):
         q_ends.append(transcript_alignments[i].query_fragment.end)
     q_ends_sort_index, q_ends_sort_array = UtilsGeneral.get_order_indexes_elements(q_ends)
 
-    best_list = [[]]
-    scores = {str([]): 0}
-
-    for i in q_ends_sort_index:
-        a_i = transcript_alignments[i]
-        best_i, curr_best_score = \
-            get_best_i(best_list, a_i, scores, ALIGNMENT_THRESHOLDS)
+    sorted_alignments = [transcript_alignments[i] for i in q_ends_sort_index]
 
-        best_list.append(best_i)
+    # score of best set ending by p-th alignment in order of query ends and position of previous alignment in this set:
+    scores = [0] * len(sorted_alignments)
+    prev_positions = [-1] * len(sorted_alignments)
+    # position of max score over scores[:p + 1] (the last one for equal scores):
+    prefix_best_positions = [0] * len(sorted_alignments)
 
-        scores[str(best_i)] = curr_best_score
+    best_score = - float('Inf')
+    best_position = None
+
+    for p in range(len(sorted_alignments)):
+        a_i = sorted_alignments[p]
+
+        # set consisting only of a_i:
+        curr_best_score = a_i.score
+        curr_prev_position = -1
+
+        # alignments distant more than err_space in query from a_i can't be union with it as fake blat,
+        # so they don't cross a_i and union penalty is constant, the best of them has max score:
+        far_end = min(p, bisect.bisect_left(q_ends_sort_array, a_i.query_fragment.start - 1 - ALIGNMENT_THRESHOLDS.ERR_SPACE_QUERY_FAKE_BLAT))
+        if far_end > 0:
+            j = prefix_best_positions[far_end - 1]
+            score_j_i = scores[j] + a_i.score - ALIGNMENT_THRESHOLDS.UNION_PENALTY
+            if score_j_i >= curr_best_score:
+                curr_best_score = score_j_i
+                curr_prev_position = j
+
+        # alignments close to a_i in query and crossing it at most err_cross:
+        window_end = min(p, bisect.bisect_right(q_ends_sort_array, a_i.query_fragment.start + ALIGNMENT_THRESHOLDS.ERR_CROSS_QUERY_UNION - 1))
+        for j in range(far_end, window_end):
+            score_j_i = get_score_b_a_i(sorted_alignments[j], scores[j], a_i, ALIGNMENT_THRESHOLDS)
+            if score_j_i >= curr_best_score:
+                curr_best_score = score_j_i
+                curr_prev_position = j
+
+        scores[p] = curr_best_score
+        prev_positions[p] = curr_prev_position
+        if p != 0 and scores[p] < scores[prefix_best_positions[p - 1]]:
+            prefix_best_positions[p] = prefix_best_positions[p - 1]
+        else:
+            prefix_best_positions[p] = p
 
         if curr_best_score >= best_score:
-            best_b = best_i
+            best_position = p
             best_score = curr_best_score
 
+    # restore best set by back pointers:
+    best_b = []
+    p = best_position
+    while p != -1:
+        best_b.append(sorted_alignments[p])
+        p = prev_positions[p]
+    best_b.reverse()
+
     return best_b
 
 
@@ -57,15 +98,8 @@ def is_union_fake_blat(a_0, a_1, ALIGNMENT_THRESHOLDS):
     return False
 
 
-# b -- list of alignments ordered by end crossing at most err_cross in query
-# a_i -- one alignment
-def get_score_b_a_i(b, a_i, scores, ALIGNMENT_THRESHOLDS):
-    if not b:
-        return a_i.score
-
-    b_i = b[-1]
-
-    dist = max(0, a_i.query_fragment.start - b_i.query_fragment.end - 1)
+# b_i -- last alignment of set with score score_b, a_i -- one alignment ordered after b_i by query end:
+def get_score_b_a_i(b_i, score_b, a_i, ALIGNMENT_THRESHOLDS):
     cross = max(0, b_i.query_fragment.end - a_i.query_fragment.start + 1)
 
     if cross > ALIGNMENT_THRESHOLDS.ERR_CROSS_QUERY_UNION:
@@ -75,23 +109,11 @@ def get_score_b_a_i(b, a_i, scores, ALIGNMENT_THRESHOLDS):
     if is_union_fake_blat(b_i, a_i, ALIGNMENT_THRESHOLDS) and a_i.format == 'psl':
         current_union_penalty = 0
 
-    score_b_a_i = scores[str(b)] + a_i.score - current_union_penalty - cross
+    score_b_a_i = score_b + a_i.score - current_union_penalty - cross
 
     return score_b_a_i
 
 
-def get_best_i(best_list, a_i, scores, ALIGNMENT_THRESHOLDS):
-    best_score = - float('Inf')
-
-    for b in best_list:
-        score_b_a_i = get_score_b_a_i(b, a_i, scores, ALIGNMENT_THRESHOLDS)
-        if score_b_a_i >= best_score:
-            best_score = score_b_a_i
-            best_i = b + [a_i]
-
-    return best_i, best_score
-
-
 # alignment0 = Alignment.Alignment()
 # alignment0.create('+', 'tst', 5, 2, 6)
 #
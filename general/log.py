@@ -15,6 +15,21 @@ import logging
 
 _loggers = {}
 
+
+# version of installed package without importing it:
+def get_package_version(name):
+    try:
+        from importlib import metadata
+        return metadata.version(name)
+    except Exception:
+        pass
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution(name).version
+    except Exception:
+        return 'unknown'
+
+
 def get_logger(name):
     if name in _loggers.keys():
         return _loggers[name]
@@ -116,6 +131,26 @@ class QLogger(object):
         global _loggers
         del _loggers[self._name]
 
+    # notifications of worker processes are gathered in main process:
+    def reset_notifications(self):
+        self._num_notices = 0
+        self._num_warnings = 0
+        self._num_nf_errors = 0
+
+        self._list_warnings = []
+        self._list_non_fatal_errors = []
+
+    def get_notifications(self):
+        return self._num_notices, self._list_warnings, self._list_non_fatal_errors
+
+    def add_notifications(self, num_notices, list_warnings, list_non_fatal_errors):
+        self._num_notices += num_notices
+        self._num_warnings += len(list_warnings)
+        self._num_nf_errors += len(list_non_fatal_errors)
+
+        self._list_warnings = self._list_warnings + list_warnings
+        self._list_non_fatal_errors = self._list_non_fatal_errors + list_non_fatal_errors
+
     def debug(self, message='', indent=''):
         self._logger.debug(indent + message)
 
@@ -223,10 +258,11 @@ class QLogger(object):
 
 
     def print_tools_versions(self, blat, busco, gene_mark, tmp_dir, to_stderr=False):
-        import matplotlib, joblib, gffutils
+        import joblib, gffutils
 
         self._logger.info('External tools:')
-        self.print_version('  matplotlib', version=matplotlib.__version__, to_stderr=to_stderr)
+        # matplotlib isn't imported until plots are drawn:
+        self.print_version('  matplotlib', version=get_package_version('matplotlib'), to_stderr=to_stderr)
         self.print_version('  joblib', version=joblib.__version__, to_stderr=to_stderr)
         self.print_version('  gffutils', version=gffutils.__version__, to_stderr=to_stderr)
 
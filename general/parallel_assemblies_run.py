@@ -0,0 +1,74 @@
+__author__ = 'letovesnoi'
+
+import multiprocessing
+
+from general import log
+from general import rqconfig
+from general import UtilsProfile
+
+# function processing one assembly and read-only arguments shared by all assemblies,
+# they are inherited by forked worker processes instead of pickling:
+_process_function = None
+_shared_args = None
+
+
+def parallel_assemblies_run(process_function, shared_args, assemblies_num, threads, logger):
+    global _process_function
+    global _shared_args
+
+    us_jobs = min(threads, assemblies_num)
+
+    # sharing structures without copying requires fork:
+    if us_jobs <= 1 or not hasattr(multiprocessing, 'get_context') or \
+            'fork' not in multiprocessing.get_all_start_methods():
+        return [process_function(i_assembly, threads, *shared_args) for i_assembly in range(assemblies_num)]
+
+    logger.print_timestamp()
+    logger.info('Processing {} assemblies in {} processes...'.format(assemblies_num, us_jobs))
+
+    _process_function = process_function
+    _shared_args = shared_args
+
+    # split threads for external tools between processes:
+    job_threads = max(1, threads // us_jobs)
+
+    pool = multiprocessing.get_context('fork').Pool(us_jobs)
+    try:
+        results = pool.map(run_one_assembly, [(i_assembly, job_threads) for i_assembly in range(assemblies_num)],
+                           chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+        _process_function = None
+        _shared_args = None
+
+    assemblies_results = []
+    for exit_code, result, notifications, profile_records in results:
+        logger.add_notifications(*notifications)
+        UtilsProfile.add_records(profile_records)
+        if exit_code != 0:
+            logger.error(message='Processing of assembly failed!', exit_with_code=exit_code, to_stderr=True)
+        assemblies_results.append(result)
+
+    return assemblies_results
+
+
+def run_one_assembly(i_assembly_threads):
+    i_assembly, job_threads = i_assembly_threads
+
+    logger = log.get_logger(rqconfig.LOGGER_DEFAULT_NAME)
+
+    # count only notifications and profile records of this worker:
+    logger.reset_notifications()
+    UtilsProfile.reset_records()
+
+    exit_code = 0
+    result = None
+    # logger.error exits on fatal errors, return code to main process instead of killing worker:
+    try:
+        result = _process_function(i_assembly, job_threads, *_shared_args)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) and e.code != 0 else 1
+
+    return exit_code, result, logger.get_notifications(), UtilsProfile.get_records()
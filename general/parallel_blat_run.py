@@ -1,9 +1,10 @@
 __author__ = 'letovesnoi'
 
-import subprocess
 import sys
 import os
 import shutil
+import heapq
+import itertools
 
 this_location = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append(os.path.join(this_location, 'quast_libs'))
@@ -18,6 +19,8 @@ else:
 
 from general import log
 from general import rqconfig
+from general import UtilsProfile
+from general import UtilsAlignment
 
 
 logger = log.get_logger('parallel_blat_run')
@@ -32,79 +35,89 @@ def parallel_blat_run(transcripts_dict, reference_pathes, threads, tmp_dir, labe
     tmp_dirs = []
 
     us_threads = min(threads, len(transcripts_dict))
+    # more shards than threads, so threads finished their shards take next ones from queue:
+    shards_num = min(us_threads * rqconfig.BLAT_SHARDS_PER_THREAD, len(transcripts_dict))
 
-    # CREATE TEMPORARY DIRECTORIES FOR THREADS:
-    for i_thread in range(us_threads):
-        output_dirs.append(os.path.join(tmp_dir, '{}_thread'.format(i_thread)))
+    # CREATE TEMPORARY DIRECTORIES FOR SHARDS:
+    for i_shard in range(shards_num):
+        output_dirs.append(os.path.join(tmp_dir, '{}_{}_shard'.format(label, i_shard)))
         if not os.path.exists(output_dirs[-1]):
             os.mkdir(output_dirs[-1])
         tmp_dirs.append(os.path.join(output_dirs[-1], 'tmp'))
         if not os.path.exists(tmp_dirs[-1]):
             os.mkdir(tmp_dirs[-1])
 
-    # SPLIT CONTIGS TO FILES FOR EACH THREAD:
-    transcripts_pathes_threads = split_file_with_transcripts(transcripts_dict, us_threads, output_dirs)
+    # positions of transcripts in input, psl keeps this order of transcripts:
+    transcripts_order = dict((id_transcript, i_transcript) for i_transcript, id_transcript in enumerate(transcripts_dict))
 
-    # PARALLEL RUNS BLAT:
-    tmp_names_psl = Parallel(n_jobs=us_threads)(delayed(align_fa_transcripts_to_psl_by_blat)
-                                                (transcripts_pathes_threads[i_thread], reference_pathes,
-                                                 output_dirs[i_thread], label, log_out_1)
-                                                for i_thread in range(us_threads))
+    # SPLIT CONTIGS TO SHARDS OF ABOUT EQUAL TOTAL LENGTH:
+    transcripts_pathes_shards = split_transcripts_by_length(transcripts_dict, transcripts_order, shards_num, output_dirs)
 
-    # GLUING PSL FILES:
-    f_pathes = ''
-    for i_thread in range(us_threads):
-        f_pathes += tmp_names_psl[i_thread] + ' '
+    # PARALLEL RUNS BLAT (threads only wait for blat processes, so they also work inside scheduler stages).
+    # Shards are dispatched in order of decreasing length to threads as they become free:
+    tmp_names_psl = Parallel(n_jobs=us_threads, backend='threading')(delayed(align_fa_transcripts_to_psl_by_blat)
+                                                (transcripts_pathes_shards[i_shard], reference_pathes,
+                                                 output_dirs[i_shard], label, log_out_1, transcripts_order)
+                                                for i_shard in range(shards_num))
+    if None in tmp_names_psl:
+        logger.error(message='blat failed for {}!'.format(label), exit_with_code=1, to_stderr=True)
 
+    # GLUING PSL FILES:
     logger.print_timestamp()
-    logger.info('Gluing psl files by cat for {}...'.format(label))
+    logger.info('Merging psl files in order of transcripts for {}...'.format(label))
     out_name_psl = os.path.join(tmp_dir, '{}.psl'.format(label))
-    command = 'cat {} >> {}'.format(f_pathes, out_name_psl)
-    exit_code = subprocess.call(command, shell=True)
-    if exit_code != 0:
-        logger.error(message='cat failed!', exit_with_code=exit_code, to_stderr=True)
+    UtilsAlignment.merge_psl_by_query(tmp_names_psl, out_name_psl, transcripts_order)
     logger.info('  saved to {}.'.format(out_name_psl))
     logger.info('  logs can be found in {}.'.format(log_out_1))
 
-    # REMOVE TEMPORARY DIRECTORIES FOR THREADS:
+    # REMOVE TEMPORARY DIRECTORIES FOR SHARDS:
     logger.debug('Remove temporary directories...')
-    for i_thread in range(us_threads):
-        shutil.rmtree(output_dirs[i_thread])
+    for i_shard in range(shards_num):
+        shutil.rmtree(output_dirs[i_shard])
     logger.debug('Done.')
 
     return out_name_psl
 
 
-def split_file_with_transcripts(transcripts_dict, us_threads, output_dirs):
-    f_fa_pathes = []
+# longest transcripts are distributed first, each to the shard with the least total length.
+# Shards are sorted by decreasing total length and transcripts inside shards keep their input order,
+# so alignments in psl of each shard are in order of transcripts_order as BLAT aligns queries one by one:
+def split_transcripts_by_length(transcripts_dict, transcripts_order, shards_num, output_dirs):
+    shards_heap = [(0, i_shard) for i_shard in range(shards_num)]
+    shards_ids = [[] for i_shard in range(shards_num)]
+    shards_lens = [0] * shards_num
 
-    file_n = len(transcripts_dict)
-    thread_n = file_n // us_threads
+    for id_transcript in sorted(transcripts_dict, key=lambda id_transcript: -len(transcripts_dict[id_transcript])):
+        len_shard, i_shard = heapq.heappop(shards_heap)
+        shards_ids[i_shard].append(id_transcript)
+        shards_lens[i_shard] = len_shard + len(transcripts_dict[id_transcript])
+        heapq.heappush(shards_heap, (shards_lens[i_shard], i_shard))
 
-    id_transcripts = list(transcripts_dict.keys())
-    for i_thread in range(us_threads):
-        fpath = os.path.join(output_dirs[i_thread], '{}.fasta'.format(i_thread))
+    f_fa_pathes = []
+    for i_shard, shard in enumerate(sorted(range(shards_num), key=lambda i_shard: -shards_lens[i_shard])):
+        fpath = os.path.join(output_dirs[i_shard], '{}.fasta'.format(i_shard))
         f_fa_pathes.append(fpath)
-        for i_transcript in range(thread_n):
-            fastaparser.write_fasta(fpath, [(id_transcripts[i_thread * thread_n + i_transcript], transcripts_dict[id_transcripts[i_thread * thread_n + i_transcript]])], mode='a')
-
-    for i_thread in range(file_n - us_threads * thread_n):
-        fastaparser.write_fasta(f_fa_pathes[i_thread], [(id_transcripts[us_threads * thread_n + i_thread], transcripts_dict[id_transcripts[us_threads * thread_n + i_thread]])], mode='a')
+        with open(fpath, 'w') as out_handle:
+            for id_transcript in sorted(shards_ids[shard], key=transcripts_order.get):
+                seq = transcripts_dict[id_transcript]
+                out_handle.write('>{}\n'.format(id_transcript))
+                for i in range(0, len(seq), 60):
+                    out_handle.write(seq[i:i + 60] + '\n')
 
     return f_fa_pathes
 
 
-def align_fa_transcripts_to_psl_by_blat(transcripts_path, reference_pathes, output_dir, label, log_out_1):
+def align_fa_transcripts_to_psl_by_blat(transcripts_path, reference_pathes, output_dir, label, log_out_1, transcripts_order):
     tmp_out_names_psl = []
 
     # create folder for alignments one file with transcripts to several chromosomes/scaffolds/patches:
     if len(reference_pathes) > 1:
         alignment_dir_i = os.path.join(output_dir, 'tmp', 'alignment_dir_{}'.format(label))
         command = 'mkdir {}'.format(alignment_dir_i)
-        exit_code = subprocess.call(command, shell=True)
+        exit_code = UtilsProfile.call(command)
         if exit_code != 0:
             #logger.error(message='mkdir {} failed!'.format(alignment_dir_i), exit_with_code=2, to_stderr=True)
-            sys.exit(exit_code)
+            return None
     else:
         alignment_dir_i = os.path.join(output_dir, 'tmp')
 
@@ -124,32 +137,18 @@ def align_fa_transcripts_to_psl_by_blat(transcripts_path, reference_pathes, outp
 
         command = '{} {} {} {} -q=rna -trimHardA -trimT -noHead 1>> {}'.\
             format(blat_run, reference_pathes[i_reference], transcripts_path, tmp_out_names_psl[-1], log_out_1)
-        exit_code = subprocess.call(command, shell=True)
+        exit_code = UtilsProfile.call(command)
         if exit_code != 0:
             #logger.error(message='blat failed!', exit_with_code=2, to_stderr=True)
-            sys.exit(exit_code)
+            return None
 
         #logger.info('  saved to {}'.format(tmp_out_names_psl[i_transcripts][-1]))
 
     if len(reference_pathes) > 1:
-        # glue all files with alignments for all chromosomes/scaffolds/patches and one file with transcripts:
-        #logger.info('Gluing psl files by pslSort for {}...'.format(alignment_dir_i))
-
-        pslSort_run = os.path.join(rqconfig.rnaQUAST_LOCATION, '.', 'pslSort')
-
-        tmp_alignment_dir_i = os.path.join(alignment_dir_i, 'tmp')
-
+        # glue all files with alignments for all chromosomes/scaffolds/patches and one file with transcripts
+        # in order of transcripts, alignments of transcript are sorted by query starts as by pslSort:
         OUTPSL = os.path.join(output_dir, 'tmp', '{}.psl'.format(label))
-
-        if not os.path.isfile(pslSort_run):
-            pslSort_run = "pslSort"
-        command = '{} dirs {} {} {} -nohead 1>> {}'.\
-            format(pslSort_run, OUTPSL, tmp_alignment_dir_i, alignment_dir_i, log_out_1)
-        exit_code = subprocess.call(command, shell=True)
-        if exit_code != 0:
-            #logger.error(message='pslSort failed! File with reference more than 4G, please install pslSort '
-            #                     '(http://hgwdev.cse.ucsc.edu/~kent/exe/linux/), add them to PATH and restart', exit_with_code=2, to_stderr=True)
-            sys.exit(exit_code)
+        merge_references_psl(tmp_out_names_psl, OUTPSL, transcripts_order)
 
         # remove temporary directory with separately transcripts to chromosomes/scaffolds/patches alignments:
         if os.path.exists(alignment_dir_i):
@@ -160,3 +159,22 @@ def align_fa_transcripts_to_psl_by_blat(transcripts_path, reference_pathes, outp
         OUTPSL = tmp_out_names_psl[0]
 
     return OUTPSL
+
+
+# k-way merge of psl files of one shard aligned to parts of reference, only alignments of one transcript are in memory:
+def merge_references_psl(psl_pathes, out_psl_path, transcripts_order):
+    def iterate_keyed_lines(in_handle, i_file):
+        for line in in_handle:
+            yield transcripts_order[UtilsAlignment.get_psl_query_name(line)], i_file, line
+
+    in_handles = [open(psl_path, 'r') for psl_path in psl_pathes]
+    try:
+        with open(out_psl_path, 'w') as out_handle:
+            merged_lines = heapq.merge(*[iterate_keyed_lines(in_handles[i_file], i_file) for i_file in range(len(in_handles))])
+            for i_transcript, keyed_lines in itertools.groupby(merged_lines, key=lambda keyed_line: keyed_line[0]):
+                # qStart is 12th column of psl:
+                lines = sorted((line for i_transcript, i_file, line in keyed_lines), key=lambda line: int(line.split('\t', 12)[11]))
+                out_handle.writelines(lines)
+    finally:
+        for in_handle in in_handles:
+            in_handle.close()
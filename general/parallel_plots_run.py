@@ -0,0 +1,61 @@
+__author__ = 'letovesnoi'
+
+import os
+import multiprocessing
+
+from general import log
+from general import rqconfig
+
+
+# draw plots from their data in pool of processes, plots are pickled to workers, so only data is sent.
+# Drawn plots are kept in cache directory by hash of their data and aren't drawn again:
+def parallel_plots_run(plots, threads, cache_dir, logger):
+    plots_cache_dir = None
+    matplotlib_version = None
+    if cache_dir is not None:
+        plots_cache_dir = os.path.join(cache_dir, 'plots')
+        if not os.path.exists(plots_cache_dir):
+            os.makedirs(plots_cache_dir)
+        matplotlib_version = log.get_package_version('matplotlib')
+
+    us_jobs = min(threads, len(plots))
+
+    # daemonic processes (workers of assemblies) can't have children, so they draw plots sequentially:
+    if us_jobs <= 1 or not hasattr(multiprocessing, 'get_context') or \
+            'fork' not in multiprocessing.get_all_start_methods() or multiprocessing.current_process().daemon:
+        for plot in plots:
+            plot.draw(plots_cache_dir, matplotlib_version)
+        return
+
+    logger.info('    drawing {} plots in {} processes...'.format(len(plots), us_jobs))
+
+    pool = multiprocessing.get_context('fork').Pool(us_jobs)
+    try:
+        results = pool.map(draw_one_plot, [(plot, plots_cache_dir, matplotlib_version) for plot in plots],
+                           chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    for exit_code, notifications in results:
+        logger.add_notifications(*notifications)
+        if exit_code != 0:
+            logger.error(message='Drawing of plot failed!', exit_with_code=exit_code, to_stderr=True)
+
+
+def draw_one_plot(plot_args):
+    plot, plots_cache_dir, matplotlib_version = plot_args
+
+    logger = log.get_logger(rqconfig.LOGGER_DEFAULT_NAME)
+
+    # count only notifications of this worker:
+    logger.reset_notifications()
+
+    exit_code = 0
+    # logger.error exits on fatal errors, return code to main process instead of killing worker:
+    try:
+        plot.draw(plots_cache_dir, matplotlib_version)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) and e.code != 0 else 1
+
+    return exit_code, logger.get_notifications()
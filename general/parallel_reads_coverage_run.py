@@ -0,0 +1,101 @@
+__author__ = 'letovesnoi'
+
+import os
+import multiprocessing
+
+from general import log
+from general import rqconfig
+
+from objects import DifferenceCoverage
+
+# function getting coverage by one shard of reads alignments and read-only arguments shared by all shards,
+# they are inherited by forked worker processes instead of pickling:
+_process_function = None
+_shared_args = None
+
+
+# split alignment file into byte ranges [start, end), line belongs to shard containing its first byte:
+def get_sam_shards(sam_path, shards_num):
+    sam_size = os.path.getsize(sam_path)
+
+    shards_num = max(1, min(shards_num, sam_size // rqconfig.MIN_SAM_SHARD_LEN))
+    shard_len = sam_size // shards_num + 1
+
+    return [(i_shard * shard_len, min((i_shard + 1) * shard_len, sam_size)) for i_shard in range(shards_num)]
+
+
+# iterate lines of shard [start, end) of file:
+def iterate_shard_lines(in_path, start, end):
+    with open(in_path, 'rb') as in_handle:
+        pos = start
+        if start > 0:
+            # skip line started in previous shard:
+            in_handle.seek(start - 1)
+            pos = start - 1 + len(in_handle.readline())
+
+        while pos < end:
+            line = in_handle.readline()
+            if not line:
+                break
+            pos += len(line)
+
+            yield line.decode('utf-8')
+
+
+def parallel_reads_coverage_run(process_function, shared_args, sam_path, threads, logger):
+    global _process_function
+    global _shared_args
+
+    shards = get_sam_shards(sam_path, threads)
+
+    # sharing structures without copying requires fork:
+    if len(shards) <= 1 or not hasattr(multiprocessing, 'get_context') or \
+            'fork' not in multiprocessing.get_all_start_methods():
+        return process_function(0, os.path.getsize(sam_path), *shared_args)
+
+    logger.info('  processing reads alignments in {} processes...'.format(len(shards)))
+
+    _process_function = process_function
+    _shared_args = shared_args
+
+    pool = multiprocessing.get_context('fork').Pool(len(shards))
+    try:
+        results = pool.map(run_one_shard, shards, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+        _process_function = None
+        _shared_args = None
+
+    # merge partial coverages in order of shards, so result doesn't depend on number of processes:
+    reads_coverage = DifferenceCoverage.DifferenceCoverage()
+    for exit_code, shard_coverage, notifications in results:
+        logger.add_notifications(*notifications)
+        if exit_code != 0:
+            logger.error(message='Getting coverage by reads failed!', exit_with_code=exit_code, to_stderr=True)
+        reads_coverage.add_coverage(shard_coverage)
+
+    return reads_coverage
+
+
+def run_one_shard(shard):
+    start, end = shard
+
+    logger = log.get_logger(rqconfig.LOGGER_DEFAULT_NAME)
+
+    # count only notifications of this worker:
+    logger.reset_notifications()
+
+    exit_code = 0
+    shard_coverage = None
+    # logger.error exits on fatal errors, return code to main process instead of killing worker:
+    try:
+        shard_coverage = _process_function(start, end, *_shared_args)
+        # send only used part of difference array to main process:
+        shard_coverage.flush_events()
+        shard_coverage.diff = shard_coverage.diff[:shard_coverage.len + 1].copy()
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) and e.code != 0 else 1
+
+    return exit_code, shard_coverage, logger.get_notifications()
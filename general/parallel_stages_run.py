@@ -0,0 +1,136 @@
+__author__ = 'letovesnoi'
+
+import time
+import threading
+
+from general import UtilsProfile
+
+
+class Stage():
+    """Class of pipeline stage, which is run by scheduler after stages it depends on"""
+
+    def __init__(self, name, function, dependencies=None, max_threads=None):
+        self.name = name
+        # function(threads) runs stage and returns its result:
+        self.function = function
+        self.dependencies = dependencies if dependencies is not None else []
+        # single-threaded stages don't take share of threads budget from others:
+        self.max_threads = max_threads
+
+        self.threads = 0
+        self.start_time = None
+        self.end_time = None
+        self.result = None
+
+
+# run stages of dependency graph, independent stages run concurrently in threads (they mostly wait for external tools)
+# and share threads budget. Returns dictionary of results of stages by names:
+def parallel_stages_run(stages, threads, logger):
+    stages_by_name = dict((stage.name, stage) for stage in stages)
+    for stage in stages:
+        for dependency in stage.dependencies:
+            if dependency not in stages_by_name:
+                logger.error(message='Unknown stage {} in dependencies of {}!'.format(dependency, stage.name),
+                             exit_with_code=1, to_stderr=True)
+
+    pending = list(stages)
+    done = set()
+    running = {}
+    # exceptions of stages (including SystemExit of logger.error) are raised again in calling thread:
+    errors = []
+
+    free_threads = threads
+    condition = threading.Condition()
+
+    # stages run in their own threads, so they are profiled as children of stage calling scheduler:
+    parent = UtilsProfile.get_current_stage()
+
+    def run_stage(stage):
+        try:
+            with UtilsProfile.profile_stage(stage.name, parent):
+                stage.result = stage.function(stage.threads)
+        except BaseException as e:
+            errors.append(e)
+        with condition:
+            stage.end_time = time.time()
+            condition.notify()
+
+    run_start_time = time.time()
+    with condition:
+        while True:
+            # stages which are finished free their threads:
+            for name in list(running.keys()):
+                if running[name].end_time is not None:
+                    free_threads += running[name].threads
+                    done.add(name)
+                    del running[name]
+            if not pending and not running:
+                break
+
+            ready = [] if errors else \
+                [stage for stage in pending if all(dependency in done for dependency in stage.dependencies)]
+            if not ready and not running:
+                if errors:
+                    break
+                logger.error(message='Cycle in dependencies of stages {}!'.format(', '.join(stage.name for stage in pending)),
+                             exit_with_code=1, to_stderr=True)
+
+            # split free threads between ready stages, at least one stage is run;
+            # stages with limited number of threads get their share first:
+            ready.sort(key=lambda stage: stage.max_threads is None)
+            for i_stage in range(len(ready)):
+                if free_threads < 1 and running:
+                    break
+                stage = ready[i_stage]
+                stage.threads = max(1, free_threads // (len(ready) - i_stage))
+                if stage.max_threads is not None:
+                    stage.threads = min(stage.threads, stage.max_threads)
+                free_threads -= stage.threads
+                stage.start_time = time.time()
+
+                pending.remove(stage)
+                running[stage.name] = stage
+                threading.Thread(target=run_stage, args=(stage,)).start()
+
+            if running:
+                condition.wait()
+
+    if errors:
+        raise errors[0]
+
+    log_critical_path(stages, stages_by_name, time.time() - run_start_time, logger)
+
+    return dict((stage.name, stage.result) for stage in stages)
+
+
+# critical path is the longest chain of dependent stages by their running time:
+def log_critical_path(stages, stages_by_name, makespan, logger):
+    if not stages:
+        return
+
+    path_time = {}
+    previous = {}
+
+    def get_path_time(stage):
+        if stage.name not in path_time:
+            path_time[stage.name] = 0.0
+            previous[stage.name] = None
+            for dependency in stage.dependencies:
+                if get_path_time(stages_by_name[dependency]) > path_time[stage.name]:
+                    path_time[stage.name] = path_time[dependency]
+                    previous[stage.name] = dependency
+            path_time[stage.name] += stage.end_time - stage.start_time
+        return path_time[stage.name]
+
+    last = max(stages, key=get_path_time).name
+
+    critical_path = []
+    while last is not None:
+        critical_path.append(last)
+        last = previous[last]
+    critical_path.reverse()
+
+    logger.info('  critical path: {}; {:.1f} s of {:.1f} s.'.format(
+        ' -> '.join('{} ({:.1f} s, {} threads)'.format(name, stages_by_name[name].end_time - stages_by_name[name].start_time,
+                                                     stages_by_name[name].threads) for name in critical_path),
+        path_time[critical_path[-1]], makespan))
@@ -30,9 +30,34 @@ NUM_ONE_THREAD_TRANSCRIPTS = 100
 # REPORT CONSTANTS:
 PRECISION = 3
 
-SORT_INDEX_LEN = 10000
+# CACHE CONSTANTS:
+# change it when cached structures change, old entries will be not used:
+CACHE_VERSION = 1
+# size of chunks for hashing files:
+CACHE_HASH_CHUNK_LEN = 1 << 20
+# total size of cached GMAP / STAR / BLAST indexes, least recently used are removed above it:
+INDEX_CACHE_MAX_SIZE = 100 * (1 << 30)
 
 # COVERAGE CONSTANTS:
+# number of buffered covered intervals before adding them to difference array:
+COVERAGE_EVENTS_BUFFER_LEN = 1000000
+# min size of part of reads alignments file processed by one process:
+MIN_SAM_SHARD_LEN = 1 << 26
+
+# BLAT CONSTANTS:
+# number of shards of transcripts per thread, threads which finished their shards take next ones:
+BLAT_SHARDS_PER_THREAD = 4
+
+# PSL CONSTANTS:
+# total length in bytes of psl lines sorted in memory at once, if psl file isn't grouped by query names:
+PSL_SORT_BUFFER_SIZE = 256 * 1024 * 1024
+# maximal size in bytes of set of query names used to check that psl file is grouped by query names and size of each
+# name in this set besides its length (python string and set entry), file with more names is sorted:
+PSL_QUERY_NAMES_SET_SIZE = 256 * 1024 * 1024
+PSL_QUERY_NAME_OVERHEAD = 100
+# number of alignments in chunk of binary container of psl alignments, chunks are written and read one by one:
+BINARY_PSL_CHUNK_SIZE = 100000
+
 class well_fully_coverage_thresholds():
     """thresholds for well/fully coverages"""
 
@@ -13,6 +13,7 @@ from datetime import datetime
 from metrics import IsoformsCoverage
 
 from general import UtilsPipeline
+from general import UtilsProfile
 
 class CegmaMetrics():
 
@@ -41,14 +42,14 @@ class CegmaMetrics():
         cegma_completeness_report_path = None
 
         command = 'cegma -g {} -o {} -T {}'.format(transcripts_path, os.path.join(tmp_dir, label), args_threads)
-        exit_code = subprocess.call(command, shell=True)
+        exit_code = UtilsProfile.call(command)
         if exit_code != 0:
             logger.warning(message='CEGMA failed! Please install and add to PATH CEGMA: '
                                    '(http://korflab.ucdavis.edu/Datasets/cegma/)')
         else:
             cegma_completeness_report_path = os.path.join(tmp_dir, '{}.completeness_report'.format(label))
             # command = 'mv {} {}'.format(os.path.join(tmp_dir, 'output.completeness_report'), cegma_completeness_report_path)
-            # subprocess.call(command, shell=True)
+            # UtilsProfile.call(command)
 
         return cegma_completeness_report_path
 
@@ -159,7 +160,7 @@ class BuscoMetrics():
         os.chdir(tmp_dir)
 
         logger.debug('    ' + command)
-        exit_code = subprocess.call(command, shell=True)
+        exit_code = UtilsProfile.call(command)
 
         os.chdir(initial_dir)
 
@@ -266,7 +267,7 @@ class GeneMarkS_TMetrics():
 
         logger.debug(command)
 
-        exit_code = subprocess.call(command, shell=True)
+        exit_code = UtilsProfile.call(command)
 
         os.chdir(initial_dir)
 
@@ -344,18 +345,18 @@ class AssemblyCompletenessMetrics():
 
 
     # UPDATE COVERAGE OF ANNOTATION BY SPECIFIC ISOFORM:
-    def update_assembly_completeness_metrics(self, sqlite3_db_genes, internal_isoforms_coverage, id_mapped_isoform):
+    def update_assembly_completeness_metrics(self, genes_model, internal_isoforms_coverage, id_mapped_isoform):
         start_time = datetime.now()
 
         # update coverage of annotated isoforms:
-        self.isoforms_coverage.update_isoforms_coverage_by_specific_isoform(sqlite3_db_genes, internal_isoforms_coverage, id_mapped_isoform)
+        self.isoforms_coverage.update_isoforms_coverage_by_specific_isoform(genes_model, internal_isoforms_coverage, id_mapped_isoform)
 
         elapsed_time = datetime.now() - start_time
 
         return elapsed_time
 
 
-    def get_assembly_completeness_metrics(self, args, sqlite3_db_genes, db_genes_metrics, reads_coverage, transcripts_path,
+    def get_assembly_completeness_metrics(self, args, genes_model, db_genes_metrics, reads_coverage, transcripts_path,
                                           type_organism, tmp_dir, label, threads, WELL_FULLY_COVERAGE_THRESHOLDS,
                                           logger, log_dir):
         # get average metrics of coverage of annotated isoforms (included exons coverages) by aligned transcripts:
@@ -363,20 +364,35 @@ class AssemblyCompletenessMetrics():
 
         # get coverages of annotated isoforms:
         if self.isoforms_coverage is not None:
-            self.isoforms_coverage.get_isoforms_coverage(sqlite3_db_genes, db_genes_metrics, reads_coverage, WELL_FULLY_COVERAGE_THRESHOLDS)
+            self.isoforms_coverage.get_isoforms_coverage(genes_model, db_genes_metrics, reads_coverage, WELL_FULLY_COVERAGE_THRESHOLDS)
 
         # CEGMA:
         # if self.cegma_metrics is not None:
         #     self.cegma_metrics.get_metrics(args.threads, transcripts_path, tmp_dir, self.label, logger)
 
-        if args.busco:
-            self.busco_metrics = \
-                BuscoMetrics.get_busco_metrics(args.busco, args.prokaryote, threads, transcripts_path, tmp_dir, label, logger, log_dir)
+        # BUSCO and GeneMarkS-T metrics depend only on transcripts, they are got by separate stages concurrently
+        # with alignments processing (see get_busco_metrics and get_GeneMarkS_T_metrics).
 
-        if args.gene_mark or not ((args.gtf is not None or args.gene_db is not None) and args.alignment is not None and
-                                          args.reference is not None and args.transcripts is not None):
-            self.geneMarkS_T_metrics = \
-                GeneMarkS_TMetrics.get_GeneMarkS_T_metrics(type_organism, threads, args.strand_specific,
-                                                           transcripts_path, tmp_dir, label, logger, log_dir)
+        logger.info('  Done.')
 
-        logger.info('  Done.')
\ No newline at end of file
+
+    @staticmethod
+    def is_busco_run(args):
+        return bool(args.busco)
+
+
+    @staticmethod
+    def is_GeneMarkS_T_run(args):
+        return args.gene_mark or not ((args.gtf is not None or args.gene_db is not None) and args.alignment is not None and
+                                      args.reference is not None and args.transcripts is not None)
+
+
+    def get_busco_metrics(self, args, transcripts_path, tmp_dir, label, threads, logger, log_dir):
+        self.busco_metrics = \
+            BuscoMetrics.get_busco_metrics(args.busco, args.prokaryote, threads, transcripts_path, tmp_dir, label, logger, log_dir)
+
+
+    def get_GeneMarkS_T_metrics(self, args, transcripts_path, type_organism, tmp_dir, label, threads, logger, log_dir):
+        self.geneMarkS_T_metrics = \
+            GeneMarkS_TMetrics.get_GeneMarkS_T_metrics(type_organism, threads, args.strand_specific,
+                                                       transcripts_path, tmp_dir, label, logger, log_dir)
\ No newline at end of file
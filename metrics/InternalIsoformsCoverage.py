@@ -15,21 +15,24 @@ class InternalIsoformsCoverage(object):
         self.assembled_bases_exons = {}
         self.assembled_fraction_exons = {}
 
-        self.num_transcripts_covered_pos = {}
+        # covered intervals of exons (relative exon start) and exons lengths:
+        self.exons_cov_pos = {}
+        self.exons_len = {}
 
 
-    def update_internal_isoforms_coverage(self, sqlite3_db_genes, id_isoform, exon_cov_pos):
+    def update_internal_isoforms_coverage(self, genes_model, id_isoform, exon_cov_pos):
         if id_isoform not in self.assembled_fraction:
             self.assembled_fraction[id_isoform] = 0.0
             self.assembled_bases_exons[id_isoform] = {}
 
-            self.num_transcripts_covered_pos[id_isoform] = {}
+            self.exons_cov_pos[id_isoform] = {}
 
         for id_exon in exon_cov_pos:
             if id_exon not in self.assembled_bases_exons[id_isoform]:
                 self.assembled_bases_exons[id_isoform][id_exon] = 0
 
-                self.num_transcripts_covered_pos[id_isoform][id_exon] = [0] * len(sqlite3_db_genes[id_exon])
+                self.exons_cov_pos[id_isoform][id_exon] = []
+                self.exons_len[id_exon] = len(genes_model[id_exon])
 
             for i_pos in range(len(exon_cov_pos[id_exon])):
                 start_coverage = exon_cov_pos[id_exon][i_pos][0]
@@ -40,8 +43,7 @@ class InternalIsoformsCoverage(object):
 
                 self.assembled_bases_exons[id_isoform][id_exon] += end_coverage - start_coverage + 1
 
-                for i_pos in range(start_coverage, end_coverage + 1):
-                    self.num_transcripts_covered_pos[id_isoform][id_exon][i_pos] += 1
+                self.exons_cov_pos[id_isoform][id_exon].append((start_coverage, end_coverage))
 
 
     def get_internal_isoforms_coverage(self, internal_isoforms, children_exons_dict):
@@ -50,7 +52,7 @@ class InternalIsoformsCoverage(object):
 
             self.assembled_fraction_exons[id_isoform] = {}
             for id_exon in self.assembled_bases_exons[id_isoform]:
-                exon_len = len(self.num_transcripts_covered_pos[id_isoform][id_exon])
+                exon_len = self.exons_len[id_exon]
 
                 self.assembled_fraction_exons[id_isoform][id_exon] = \
                     self.assembled_bases_exons[id_isoform][id_exon] * 1.0 / exon_len
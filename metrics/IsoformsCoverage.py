@@ -1,6 +1,6 @@
 __author__ = 'lenk'
 
-from general import UtilsAnnotations
+from objects import DifferenceCoverage
 
 
 class IsoformsCoverage():
@@ -103,8 +103,8 @@ class IsoformsCoverage():
         # dictionary of mapped isoforms ids and number of transcripts mapped to annotated isoforms:
         self.num_transcripts_mapped_to_isoform = {}
 
-        # number of aligned transcripts covered this position:
-        self.num_transcripts_covered_pos = {}
+        # number of aligned transcripts covered positions of exons:
+        self.transcripts_coverage = DifferenceCoverage.DifferenceCoverage()
 
         # number of transcripts mapped to at least one isoform:
         self.annotated_transcripts_num = 0
@@ -195,15 +195,11 @@ class IsoformsCoverage():
                 self.percentage_fully_covered_exons = isoforms_coverage.num_fully_covered_exons * 1.0 / reads_coverage.num_fully_expressed_exons
 
 
-    def update_isoforms_coverage_by_specific_isoform(self, sqlite3_db_genes, internal_isoforms_coverage, id_isoform):
+    def update_isoforms_coverage_by_specific_isoform(self, genes_model, internal_isoforms_coverage, id_isoform):
         self.annotated_transcripts_num += 1
 
         if id_isoform not in self.num_transcripts_mapped_to_isoform:
-            parent_genes = list(sqlite3_db_genes.parents(id_isoform, featuretype=UtilsAnnotations.default_type_genes))
-            if parent_genes == []:
-                parent_gene_id = id_isoform
-            else:
-                parent_gene_id = parent_genes[0].id
+            parent_gene_id = genes_model.get_parent_gene_id(id_isoform)
 
             self.num_transcripts_mapped_to_isoform[id_isoform] = 0
 
@@ -213,32 +209,24 @@ class IsoformsCoverage():
 
             self.assembled_fraction[id_isoform] = internal_isoforms_coverage.assembled_fraction[id_isoform]
 
-            self.num_transcripts_covered_pos[id_isoform] = {}
-
         self.num_transcripts_mapped_to_isoform[id_isoform] += 1
 
         if internal_isoforms_coverage.assembled_fraction[id_isoform] > self.assembled_fraction[id_isoform]:
             self.assembled_fraction[id_isoform] = internal_isoforms_coverage.assembled_fraction[id_isoform]
 
-        for id_exon in internal_isoforms_coverage.num_transcripts_covered_pos[id_isoform]:
+        for id_exon in internal_isoforms_coverage.exons_cov_pos[id_isoform]:
             self.ids_assembled_exons.add(id_exon)
 
-            len_exon = len(internal_isoforms_coverage.num_transcripts_covered_pos[id_isoform][id_exon])
-
-            if id_exon not in self.num_transcripts_covered_pos[id_isoform]:
-                self.num_transcripts_covered_pos[id_isoform][id_exon] = [0] * len_exon
-
             if id_exon not in self.assembled_bases_exons or \
                             internal_isoforms_coverage.assembled_bases_exons[id_isoform][id_exon] > self.assembled_bases_exons[id_exon]:
                 self.assembled_bases_exons[id_exon] = internal_isoforms_coverage.assembled_bases_exons[id_isoform][id_exon]
                 self.assembled_fraction_exons[id_exon] = internal_isoforms_coverage.assembled_fraction_exons[id_isoform][id_exon]
 
-            self.num_transcripts_covered_pos[id_isoform][id_exon] = \
-                list(map(lambda a, b: a + b, self.num_transcripts_covered_pos[id_isoform][id_exon],
-                    internal_isoforms_coverage.num_transcripts_covered_pos[id_isoform][id_exon]))
+            self.transcripts_coverage.add_exon_intervals(id_isoform, id_exon, internal_isoforms_coverage.exons_len[id_exon],
+                                                         internal_isoforms_coverage.exons_cov_pos[id_isoform][id_exon])
 
 
-    def get_isoforms_coverage(self, sqlite3_db_genes, db_genes_metrics, reads_coverage, WELL_FULLY_COVERAGE_THRESHOLDS):
+    def get_isoforms_coverage(self, genes_model, db_genes_metrics, reads_coverage, WELL_FULLY_COVERAGE_THRESHOLDS):
         self.num_assembled_genes = len(self.ids_assembled_genes)
 
         self.num_assembled_isoforms = len(self.ids_assembled_isoforms)
@@ -246,19 +234,11 @@ class IsoformsCoverage():
         self.num_assembled_exons = len(self.ids_assembled_exons)
 
         self.covered_fraction_exons = {}
+        self.transcripts_coverage.get_coverage()
         for id_isoform in self.num_transcripts_mapped_to_isoform:
-            isoform = sqlite3_db_genes[id_isoform]
-
-            parent_genes = list(sqlite3_db_genes.parents(id_isoform, featuretype=UtilsAnnotations.default_type_genes))
-            if parent_genes == []:
-                parent_gene_id = id_isoform
-            else:
-                parent_gene_id = parent_genes[0].id
+            parent_gene_id = genes_model.get_parent_gene_id(id_isoform)
 
-            children_exons = list(sqlite3_db_genes.children(isoform.id, featuretype=UtilsAnnotations.default_type_exons, order_by='start'))
-            # for prokaryotes:
-            if len(children_exons) == 0:
-                children_exons = [isoform]
+            children_exons = genes_model.get_children_exons(id_isoform)
 
             len_isoform = 0
             for exon in children_exons:
@@ -276,10 +256,9 @@ class IsoformsCoverage():
 
             # CONSIDER COVERED BASES (BY ALL MAPPED TRANSCRIPTS) WITHOUT OVERLAPS:
             self.covered_fraction[id_isoform] = 0.0
-            for id_exon in self.num_transcripts_covered_pos[id_isoform]:
-                len_exon = len(self.num_transcripts_covered_pos[id_isoform][id_exon])
-                num_uncovered_bases = self.num_transcripts_covered_pos[id_isoform][id_exon].count(0)
-                num_covered_bases = len_exon - num_uncovered_bases
+            for id_exon in self.transcripts_coverage.slots.get(id_isoform, {}):
+                len_exon = self.transcripts_coverage.get_len_exon(id_isoform, id_exon)
+                num_covered_bases = self.transcripts_coverage.get_covered_bases_exon(id_isoform, id_exon)
                 covered_fraction_exon = num_covered_bases * 1.0 / len_exon
 
                 if covered_fraction_exon >= WELL_FULLY_COVERAGE_THRESHOLDS.well_exon_threshold:
@@ -293,7 +272,7 @@ class IsoformsCoverage():
                 self.covered_fraction[id_isoform] += num_covered_bases
 
                 self.num_covered_pos_at_least_one += num_covered_bases
-                self.avg_duplication_ratio += sum(self.num_transcripts_covered_pos[id_isoform][id_exon])
+                self.avg_duplication_ratio += self.transcripts_coverage.get_sum_coverage_exon(id_isoform, id_exon)
 
             self.covered_fraction[id_isoform] /= len_isoform
             if self.covered_fraction[id_isoform] not in self.covered_fraction_distribution:
@@ -438,7 +417,7 @@ class IsoformsCoverage():
         logger.info('    Getting ' + str + ' assembled isoforms list...')
 
         with open(path_assembled_list, 'w') as fout:
-            for id_isoform in ids:
+            for id_isoform in sorted(ids):
                 fout.write(id_isoform + '\n')
 
         logger.info('      saved to {}'.format(path_assembled_list))
\ No newline at end of file
@@ -2,17 +2,18 @@ __author__ = 'letovesnoi'
 
 from general import UtilsTools
 from general import UtilsCoverage
-from general import UtilsAnnotations
+from general import parallel_reads_coverage_run
 
 from objects import Alignment
+from objects import DifferenceCoverage
 
 
 class ReadsCoverage():
     """Class, which represent coverage of annotated isoforms by aligned exons"""
 
     def __init__(self, sorted_sam_path, reference_path, single_reads, left_reads, right_reads,
-                 reference_dict, sqlite3_db_genes, type_isoforms, sorted_exons_attr, strand_specific, tot_isoforms_len, genome_len,
-                 output_dir, threads, WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir):
+                 reference_dict, genes_model, sorted_exons_attr, strand_specific, tot_isoforms_len, genome_len,
+                 output_dir, threads, WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir, cache_dir=None):
         # COVERAGE BY READS (upper bound):
         # GENES:
         self.ids_well_expressed_genes = set()
@@ -39,7 +40,7 @@ class ReadsCoverage():
 
 
         # DATABASE COVERAGE:
-        self.num_reads_covered_pos = {}
+        self.reads_coverage = DifferenceCoverage.DifferenceCoverage()
         self.num_expressed_pos_at_least_one_by_reads = 0
         self.fraction_annotation_mapped_by_reads = 0.0
 
@@ -47,19 +48,19 @@ class ReadsCoverage():
         self.expressed_fraction_exon = {}
 
         self.get_database_coverage_by_reads(sorted_sam_path, reference_path, single_reads, left_reads,
-                                            right_reads, reference_dict, sqlite3_db_genes, type_isoforms, sorted_exons_attr,
+                                            right_reads, reference_dict, genes_model, sorted_exons_attr,
                                             strand_specific, tot_isoforms_len, genome_len, output_dir, threads,
-                                            WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir)
+                                            WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir, cache_dir)
 
 
     def get_database_coverage_by_reads(self, sam_path, reference_path, single_reads, left_reads,
-                                       right_reads, reference_dict, sqlite3_db_genes, type_isoforms, sorted_exons_attr,
+                                       right_reads, reference_dict, genes_model, sorted_exons_attr,
                                        strand_specific, tot_isoforms_len, genome_len, output_dir, threads,
-                                       WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir):
+                                       WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir, cache_dir=None):
             if sam_path is None:
                 sam_path = \
                     UtilsTools.get_sam_by_STAR(threads, reference_path, None, single_reads, left_reads, right_reads,
-                                                output_dir, None, None, genome_len, logger, log_dir)
+                                                output_dir, None, None, genome_len, logger, log_dir, cache_dir)
 
             if sam_path is None:
                 return
@@ -67,60 +68,22 @@ class ReadsCoverage():
             logger.print_timestamp()
             logger.info('Getting database coverage by reads...')
 
-            with open(sam_path, 'r') as in_handle:
-                for line in in_handle:
-                    if line[0] == '@':
-                        continue
-
-                    curr_sam_alignment = Alignment.SAMFileAlignment.get_alignment_from_sam_line(line, logger, reference_dict)
-
-                    if strand_specific:
-                        strand = curr_sam_alignment.strand
-                    else:
-                        strand = None
-
-                    internal_exons = \
-                        UtilsCoverage.get_internal_exons_faster(sqlite3_db_genes, sorted_exons_attr, curr_sam_alignment.target_fragment.starts,
-                                                                    curr_sam_alignment.target_fragment.ends, str(strand), curr_sam_alignment.target_fragment.name)
-
-                    internal_isoforms = list(UtilsCoverage.get_internal_isoforms(sqlite3_db_genes, type_isoforms, internal_exons))
-
-                    for isoform in internal_isoforms:
-                        children_exons = list(sqlite3_db_genes.children(isoform.id, featuretype=UtilsAnnotations.default_type_exons, order_by='start'))
-                        # for prokaryotes:
-                        if len(children_exons) == 0:
-                            children_exons = [isoform]
-
-                        exon_starts = [exon.start for exon in children_exons]
-                        exon_ends = [exon.end for exon in children_exons]
-                        exon_ids = [exon.id for exon in children_exons]
-
-                        target_cov_pos, query_cov_pos = \
-                            UtilsCoverage.get_coverage_positions(exon_ids, exon_starts, exon_ends, range(len(curr_sam_alignment.target_fragment.starts)),
-                                                                 curr_sam_alignment.target_fragment.starts, curr_sam_alignment.target_fragment.ends)
-
-                        if isoform.id not in self.num_reads_covered_pos:
-                            self.num_reads_covered_pos[isoform.id] = {}
-                        for id_exon in target_cov_pos:
-                            if id_exon not in self.num_reads_covered_pos[isoform.id]:
-                                self.num_reads_covered_pos[isoform.id][id_exon] = [0] * len(sqlite3_db_genes[id_exon])
-                            for i_cov_pos in range(len(target_cov_pos[id_exon])):
-                                for i_pos in range(target_cov_pos[id_exon][i_cov_pos][0], target_cov_pos[id_exon][i_cov_pos][1] + 1):
-                                    self.num_reads_covered_pos[isoform.id][id_exon][i_pos] += 1
-
-            for id_isoform in self.num_reads_covered_pos:
-                parent_genes = list(sqlite3_db_genes.parents(id_isoform, featuretype=UtilsAnnotations.default_type_genes))
-                if parent_genes == []:
-                    parent_gene_id = id_isoform
-                else:
-                    parent_gene_id = parent_genes[0].id
+            # shards of alignments file are processed in parallel and partial coverages are merged:
+            self.reads_coverage = \
+                parallel_reads_coverage_run.parallel_reads_coverage_run(get_reads_coverage_shard,
+                                                                        (sam_path, reference_dict, genes_model,
+                                                                         sorted_exons_attr, strand_specific, logger),
+                                                                        sam_path, threads, logger)
+
+            self.reads_coverage.get_coverage()
+            for id_isoform in self.reads_coverage.slots:
+                parent_gene_id = genes_model.get_parent_gene_id(id_isoform)
 
                 self.expressed_fraction_isoform[id_isoform] = 0.0
                 len_isoform = 0
-                for id_exon in self.num_reads_covered_pos[id_isoform]:
-                    len_exon = len(self.num_reads_covered_pos[id_isoform][id_exon])
-                    num_uncovered_pos = self.num_reads_covered_pos[id_isoform][id_exon].count(0)
-                    num_expressed_bases = len_exon - num_uncovered_pos
+                for id_exon in self.reads_coverage.slots[id_isoform]:
+                    len_exon = self.reads_coverage.get_len_exon(id_isoform, id_exon)
+                    num_expressed_bases = self.reads_coverage.get_covered_bases_exon(id_isoform, id_exon)
 
                     if id_exon not in self.expressed_fraction_exon:
                         self.expressed_fraction_exon[id_exon] = num_expressed_bases * 1.0 / len_exon
@@ -166,7 +129,7 @@ class ReadsCoverage():
         logger.info('    Getting Fully covered isoforms list by reads...')
 
         with open(path_fully_expressed_list, 'w') as fout:
-            for id_isoform in self.ids_fully_expressed_isoforms:
+            for id_isoform in sorted(self.ids_fully_expressed_isoforms):
                 fout.write(id_isoform + '\n')
 
         logger.info('      saved to {}'.format(path_fully_expressed_list))
@@ -176,7 +139,46 @@ class ReadsCoverage():
         logger.info('    Getting Well covered isoforms list by reads...')
 
         with open(path_well_expressed_list, 'w') as fout:
-            for id_isoform in self.ids_well_expressed_isoforms:
+            for id_isoform in sorted(self.ids_well_expressed_isoforms):
                 fout.write(id_isoform + '\n')
 
-        logger.info('      saved to {}'.format(path_well_expressed_list))
\ No newline at end of file
+        logger.info('      saved to {}'.format(path_well_expressed_list))
+
+
+# get coverage of annotated isoforms by alignments of reads from shard [start, end) of alignments file:
+def get_reads_coverage_shard(start, end, sam_path, reference_dict, genes_model, sorted_exons_attr, strand_specific, logger):
+    reads_coverage = DifferenceCoverage.DifferenceCoverage()
+
+    for line in parallel_reads_coverage_run.iterate_shard_lines(sam_path, start, end):
+        if line[0] == '@':
+            continue
+
+        curr_sam_alignment = Alignment.SAMFileAlignment.get_alignment_from_sam_line(line, logger, reference_dict)
+        reads_coverage.alignments_num += 1
+
+        if strand_specific:
+            strand = curr_sam_alignment.strand
+        else:
+            strand = None
+
+        internal_exons = \
+            UtilsCoverage.get_internal_exons_faster(genes_model, sorted_exons_attr, curr_sam_alignment.target_fragment.starts,
+                                                    curr_sam_alignment.target_fragment.ends, str(strand), curr_sam_alignment.target_fragment.name)
+
+        internal_isoforms = UtilsCoverage.get_internal_isoforms(genes_model, internal_exons)
+
+        for isoform in internal_isoforms:
+            children_exons = genes_model.get_children_exons(isoform.id)
+
+            exon_starts = [exon.start for exon in children_exons]
+            exon_ends = [exon.end for exon in children_exons]
+            exon_ids = [exon.id for exon in children_exons]
+
+            target_cov_pos, query_cov_pos = \
+                UtilsCoverage.get_coverage_positions(exon_ids, exon_starts, exon_ends, range(len(curr_sam_alignment.target_fragment.starts)),
+                                                     curr_sam_alignment.target_fragment.starts, curr_sam_alignment.target_fragment.ends)
+
+            for id_exon in target_cov_pos:
+                reads_coverage.add_exon_intervals(isoform.id, id_exon, len(genes_model[id_exon]), target_cov_pos[id_exon])
+
+    return reads_coverage
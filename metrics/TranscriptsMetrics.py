@@ -4,6 +4,7 @@ from datetime import datetime
 
 from general import UtilsAlignment
 from general import UtilsCoverage
+from general import UtilsProfile
 
 from objects import AlignedTranscript
 
@@ -58,7 +59,7 @@ class TranscriptsMetrics():
 
 
     def get_transcripts_metrics(self, args, type_organism, reference_dict, transcripts_path, transcripts_dict, label, threads,
-                                sqlite3_db_genes, db_genes_metrics, reads_coverage, logger, tmp_dir, log_dir,
+                                genes_model, db_genes_metrics, reads_coverage, logger, tmp_dir, log_dir,
                                 WELL_FULLY_COVERAGE_THRESHOLDS, TRANSCRIPT_LENS):
         logger.print_timestamp('  ')
 
@@ -77,13 +78,14 @@ class TranscriptsMetrics():
 
         if self.assembly_completeness_metrics is not None:
             self.assembly_completeness_metrics. \
-                get_assembly_completeness_metrics(args, sqlite3_db_genes, db_genes_metrics, reads_coverage,
+                get_assembly_completeness_metrics(args, genes_model, db_genes_metrics, reads_coverage,
                                                   transcripts_path, type_organism, tmp_dir, label, threads,
                                                   WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir)
 
 
-    def processing_assembled_psl_file(self, assembled_psl_file, sorted_exons_attr, strand_specific, logger,
-                                      sqlite3_db_genes, type_isoforms, WELL_FULLY_COVERAGE_THRESHOLDS):
+    # update metrics by best alignments of assembled and misassembled transcripts from psl alignments report:
+    def processing_psl_alignments(self, psl_alignments, sorted_exons_attr, strand_specific, logger, genes_model,
+                                  WELL_FULLY_COVERAGE_THRESHOLDS):
         init_time = datetime.now()
         init_time -= init_time
         simple_time = init_time
@@ -94,14 +96,19 @@ class TranscriptsMetrics():
         transcript_time = init_time
 
         logger.print_timestamp('  ')
-        logger.info('  Processing assembled aligned transcripts...')
+        logger.info('  Processing aligned transcripts...')
 
-        with open(assembled_psl_file, 'r') as fin:
-            line1 = fin.readline().strip()
-            line2 = fin.readline().strip()
-            while line1 != '':
-                best_lines, best_alignments, line1, line2 = \
-                    UtilsAlignment.get_curr_single_transcript_lines_alignments(0, line1, line2, fin, True)
+        with UtilsProfile.profile_stage('aligned_transcripts_processing', transcripts=0, alignments=0) \
+                as alignments_profile:
+            for best_lines, best_alignments, is_misassembled in psl_alignments:
+                # number of transcripts and alignments for throughput in profile of run:
+                alignments_profile.add_items('transcripts', 1)
+                alignments_profile.add_items('alignments', len(best_alignments))
+
+                # UPDATE METRICS BY MISASSEMBLED TRANSCRIPTS:
+                if is_misassembled:
+                    self.simple_metrics.update_metrics_by_misassembled_alignments(best_alignments, True)
+                    continue
 
                 # GET BEST MAPPED ALIGNMENTS:
                 # in case when we havn't annotation:
@@ -109,7 +116,7 @@ class TranscriptsMetrics():
                 best_mapped_aligned_transcripts_coverages, best_mapped_internal_isoforms_coverages,\
                 curr_best_mapped_time, curr_transcript_time = \
                     self.get_best_mapped_from_best_aligned(best_lines, best_alignments, sorted_exons_attr,
-                                                           strand_specific, sqlite3_db_genes, type_isoforms,
+                                                           strand_specific, genes_model,
                                                            WELL_FULLY_COVERAGE_THRESHOLDS)
 
                 best_mapped_time += curr_best_mapped_time
@@ -161,7 +168,7 @@ class TranscriptsMetrics():
 
                         if id_isoform is not None:
                             assembly_completeness_time += self.assembly_completeness_metrics.\
-                                update_assembly_completeness_metrics(sqlite3_db_genes, best_mapped_internal_isoforms_coverages[i_alignment], id_isoform)
+                                update_assembly_completeness_metrics(genes_model, best_mapped_internal_isoforms_coverages[i_alignment], id_isoform)
 
         logger.info('  Done.')
 
@@ -192,7 +199,7 @@ class TranscriptsMetrics():
 
 
     def get_best_mapped_from_best_aligned(self, best_lines, best_alignments, sorted_exons_attr, strand_specific,
-                                          sqlite3_db_genes, type_isoforms, WELL_FULLY_COVERAGE_THRESHOLDS):
+                                          genes_model, WELL_FULLY_COVERAGE_THRESHOLDS):
         start_time = datetime.now()
 
         best_aligned_transcripts = []
@@ -202,7 +209,7 @@ class TranscriptsMetrics():
             curr_aligned_transcript, curr_aligned_transcript_coverage, curr_internal_isoforms_coverage, \
             elapsed_transcript_time = \
                 self.get_aligned_transcript_and_coverages(best_alignments[i_line_alignment], sorted_exons_attr,
-                                                          strand_specific, sqlite3_db_genes, type_isoforms,
+                                                          strand_specific, genes_model,
                                                           WELL_FULLY_COVERAGE_THRESHOLDS)
 
             best_aligned_transcripts.append(curr_aligned_transcript)
@@ -212,7 +219,7 @@ class TranscriptsMetrics():
             best_aligned_internal_isoforms_coverages.append(curr_internal_isoforms_coverage)
 
         # IN CASE WHEN WE HAVN'T ANNOTATION:
-        if sqlite3_db_genes is None:
+        if genes_model is None:
             elapsed_time = datetime.now() - start_time
 
             return best_lines, best_alignments, best_aligned_transcripts, \
@@ -262,14 +269,14 @@ class TranscriptsMetrics():
 
 
     # get aligned transcript, transcript coverage and internal isoforms coverage:
-    def get_aligned_transcript_and_coverages(self, psl_alignment, sorted_exons_attr, strand_specific, sqlite3_db_genes,
-                                             type_isoforms, WELL_FULLY_COVERAGE_THRESHOLDS):
+    def get_aligned_transcript_and_coverages(self, psl_alignment, sorted_exons_attr, strand_specific, genes_model,
+                                             WELL_FULLY_COVERAGE_THRESHOLDS):
         # CREATE ALIGNED TRANSCRIPT:
         start_time = datetime.now()
 
         # print 'aligned transcript: ', datetime.now()
         aligned_transcript = AlignedTranscript.AlignedTranscript(psl_alignment, sorted_exons_attr, strand_specific,
-                                                                 sqlite3_db_genes, type_isoforms)
+                                                                 genes_model)
         # print 'done: ', datetime.now()
 
         elapsed_transcript_time = datetime.now() - start_time
@@ -300,7 +307,7 @@ class TranscriptsMetrics():
                     UtilsCoverage.get_coverage_positions(exons_ids, exons_starts, exons_ends, range(aligned_transcript.alignment.blocks_num),
                                                          aligned_transcript.alignment.target_fragment.starts, aligned_transcript.alignment.target_fragment.ends)
 
-                internal_isoforms_coverage.update_internal_isoforms_coverage(sqlite3_db_genes, internal_isoform.id, target_cov_pos)
+                internal_isoforms_coverage.update_internal_isoforms_coverage(genes_model, internal_isoform.id, target_cov_pos)
 
                 aligned_transcript_coverage.update_transcript_coverage(internal_isoform.id, query_cov_pos)
 
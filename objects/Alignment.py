@@ -1,16 +1,14 @@
-import matplotlib
-matplotlib.use('Agg')
-
 __author__ = 'lenk'
 
 from abc import ABCMeta, abstractmethod
 
-from pylab import *
-
 
 class Alignment(object):
     """Class, which represent alignment"""
 
+    # slotted attributes: millions of alignments are created while parsing alignment files:
+    __slots__ = ('format', 'score', 'mismatches', 'strand', 'query_fragment', 'target_fragment')
+
     def __init__(self):
         # psl or blast6 formats:
         self.format = ''
@@ -33,11 +31,13 @@ class Alignment(object):
         self.score = size
 
 
-    class Attributes:
+    class Attributes(object):
         """Abstract class of Ouery's or Target's attributes, which represent alignment line"""
 
         __metaclass__ = ABCMeta
 
+        __slots__ = ('name', 'size', 'start', 'end')
+
         def __init__(self):
             self.name = ''
             self.size = 0
@@ -47,6 +47,8 @@ class Alignment(object):
     class QueryAttributes(Attributes):
         """Class of Query's attributes"""
 
+        __slots__ = ()
+
         def create(self, name, size, start, end):
             self.name = name
             self.size = size
@@ -57,6 +59,8 @@ class Alignment(object):
     class TargetAttributes(Attributes):
         """Class of Target's attributes"""
 
+        __slots__ = ()
+
         def create(self, name, size, start, end):
             self.name = name
             self.size = size
@@ -67,6 +71,8 @@ class Alignment(object):
 class PSLFileAlignment(Alignment):
     """Class of PSL line, which represent alignment"""
 
+    __slots__ = ('matches', 'repmatches', 'n_num', 'blocks_num', 'blocks_sizes')
+
     def __init__(self):
         Alignment.__init__(self)
 
@@ -90,10 +96,7 @@ class PSLFileAlignment(Alignment):
         self.blocks_num = 0
         # Comma-separated list of len of each block
         self.blocks_sizes = []
-        # attributes of query
-        self.query_fragment = self.QueryAttributes()
-        # attributes of target
-        self.target_fragment = self.TargetAttributes()
+        # attributes of query and target are created by Alignment.__init__ from classes of this format
 
 
     class PSLAttributes(Alignment.Attributes):
@@ -101,6 +104,8 @@ class PSLFileAlignment(Alignment):
 
         __metaclass__ = ABCMeta
 
+        __slots__ = ('num_insert', 'base_insert', 'starts', 'ends')
+
         def __init__(self):
             Alignment.Attributes.__init__(self)
 
@@ -111,11 +116,14 @@ class PSLFileAlignment(Alignment):
             # self.start = 0
             # self.end = 0
             self.starts = []
+            self.ends = []
 
 
     class QueryAttributes(PSLAttributes):
         """Class of Query's (aligned on genome transcripts) attributes, which represent line in PSL-file"""
 
+        __slots__ = ()
+
         def set_from_psl_line(self, parameters_list, blocks_sizes):
             # Number of inserts in query
             self.num_insert = int(parameters_list[4])
@@ -130,16 +138,15 @@ class PSLFileAlignment(Alignment):
             # Alignment end position in query
             self.end = int(parameters_list[12]) - 1
             # Comma-separated list of starting positions of each block in query
-            self.starts = parameters_list[19].split(',')[:-1]
-            self.ends = []
-            for i in range(len(self.starts)):
-                self.starts[i] = int(self.starts[i])
-                self.ends.append(self.starts[i] + blocks_sizes[i] - 1)
+            self.starts = [int(start) for start in parameters_list[19].split(',')[:-1]]
+            self.ends = [start + block_size - 1 for start, block_size in zip(self.starts, blocks_sizes)]
 
 
     class TargetAttributes(PSLAttributes):
         """Class of Target's (genome) attributes, which represent line in PSL-file"""
 
+        __slots__ = ()
+
         def set_from_psl_line(self, parameters_list, blocks_sizes):
             #  Number of inserts in target
             self.num_insert = int(parameters_list[6])
@@ -154,11 +161,8 @@ class PSLFileAlignment(Alignment):
             # Alignment end position in target
             self.end = int(parameters_list[16]) - 1
             # Comma-separated list of starting positions of each block in target
-            self.starts = parameters_list[20].split(',')[:-1]
-            self.ends = []
-            for i in range(len(self.starts)):
-                self.starts[i] = int(self.starts[i])
-                self.ends.append(self.starts[i] + blocks_sizes[i] - 1)
+            self.starts = [int(start) for start in parameters_list[20].split(',')[:-1]]
+            self.ends = [start + block_size - 1 for start, block_size in zip(self.starts, blocks_sizes)]
 
 
     # get attributes of class Alignment from line in PSL-file:
@@ -181,9 +185,7 @@ class PSLFileAlignment(Alignment):
         # Needs to remove this alignment in remove_strange_psl_alignments procedure
         if self.blocks_num == 0:
             return
-        self.blocks_sizes = parameters_list[18][:-1].split(',')
-        for i in range(len(self.blocks_sizes)):
-            self.blocks_sizes[i] = int(self.blocks_sizes[i])
+        self.blocks_sizes = [int(block_size) for block_size in parameters_list[18][:-1].split(',')]
         self.query_fragment.set_from_psl_line(parameters_list, self.blocks_sizes)
         self.target_fragment.set_from_psl_line(parameters_list, self.blocks_sizes)
 
@@ -296,6 +298,8 @@ class PSLFileAlignment(Alignment):
 class BLAST6FileAlignment(Alignment):
     """Class which represent alignment line by blast in outfmt 6"""
 
+    __slots__ = ('line', 'pident', 'alen', 'gapopen', 'evalue', 'bitscore')
+
     def __init__(self):
         Alignment.__init__(self)
 
@@ -311,14 +315,12 @@ class BLAST6FileAlignment(Alignment):
         self.bitscore = 0.0
         # self.strand = ''
 
-        # attributes of query
-        self.query_fragment = self.QueryAttributes()
-        # attributes of target
-        self.target_fragment = self.TargetAttributes()
-
 
     class QueryAttributes(Alignment.QueryAttributes):
         """Class of Query's attributes, which represent line in BLAST6-file"""
+
+        __slots__ = ()
+
         def set_from_blast6_line(self, parameters_list):
             # Query sequence name
             self.name = parameters_list[0]
@@ -332,6 +334,9 @@ class BLAST6FileAlignment(Alignment):
 
     class TargetAttributes(Alignment.TargetAttributes):
         """Class of Target's attributes, which represent line in BLAST6-file"""
+
+        __slots__ = ()
+
         def set_from_blast6_line(self, parameters_list):
             # Target sequence name
             self.name = parameters_list[1]
@@ -476,6 +481,8 @@ class BLAST6FileAlignment(Alignment):
 class SAMFileAlignment(Alignment):
     '''Docs: https://samtools.github.io/hts-specs/SAMv1.pdf'''
 
+    __slots__ = ('line', 'flag', 'mapq', 'cigar', 'rnext', 'pnext', 'tlen', 'qual', 'comments', 'cigar_commands')
+
     def __init__(self):
         Alignment.__init__(self)
 
@@ -490,16 +497,15 @@ class SAMFileAlignment(Alignment):
         self.qual = "*"
         self.comments = "AS:i:0"
 
-        # attributes of query
-        self.query_fragment = self.QueryAttributes()
-        # attributes of target
-        self.target_fragment = self.TargetAttributes()
+        self.line = ''
 
         self.cigar_commands = []
 
 
     class QueryAttributes(Alignment.QueryAttributes):
 
+        __slots__ = ('seq', 'aligned_seq', 'starts', 'ends')
+
         def __init__(self):
             Alignment.QueryAttributes.__init__(self)
 
@@ -525,6 +531,8 @@ class SAMFileAlignment(Alignment):
 
     class TargetAttributes(Alignment.TargetAttributes):
 
+        __slots__ = ('aligned_seq', 'starts', 'ends')
+
         def __init__(self):
             Alignment.TargetAttributes.__init__(self)
 
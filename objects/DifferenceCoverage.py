@@ -0,0 +1,138 @@
+__author__ = 'letovesnoi'
+
+from array import array
+
+import numpy
+
+from general import rqconfig
+
+
+class DifferenceCoverage():
+    """Class of per base coverage of exons of annotated isoforms, which stored as one difference array"""
+
+    # each covered exon of isoform gets a slot -- contiguous range of positions of exon length, slots follow one another.
+    # Covered intervals are recorded as +1 / -1 events, which are added to difference array by chunks;
+    # per base coverage is obtained by single prefix sum and summarized over slots in get_coverage.
+
+    def __init__(self):
+        # slots of covered exons of isoforms:
+        self.slots = {}
+        self.slots_offsets = array('q')
+
+        self.len = 0
+
+        # buffered +1 / -1 events:
+        self.starts_events = array('q')
+        self.ends_events = array('q')
+
+        self.diff = numpy.zeros(1, dtype=numpy.int32)
+
+        # number of processed alignments:
+        self.alignments_num = 0
+
+        # number of covered bases and sum of coverage over slots:
+        self.covered_bases = None
+        self.sum_coverage = None
+
+
+    def get_slot_offset(self, id_isoform, id_exon, len_exon):
+        if id_isoform not in self.slots:
+            self.slots[id_isoform] = {}
+        if id_exon not in self.slots[id_isoform]:
+            self.slots[id_isoform][id_exon] = len(self.slots_offsets)
+            self.slots_offsets.append(self.len)
+            self.len += len_exon
+
+        return self.slots_offsets[self.slots[id_isoform][id_exon]]
+
+
+    # add intervals of exon covered positions, coordinates are relative exon start, inclusive:
+    def add_exon_intervals(self, id_isoform, id_exon, len_exon, intervals):
+        offset = self.get_slot_offset(id_isoform, id_exon, len_exon)
+        for start_coverage, end_coverage in intervals:
+            self.starts_events.append(offset + start_coverage)
+            self.ends_events.append(offset + end_coverage + 1)
+
+        if len(self.starts_events) >= rqconfig.COVERAGE_EVENTS_BUFFER_LEN:
+            self.flush_events()
+
+
+    def flush_events(self):
+        if len(self.diff) < self.len + 1:
+            diff = numpy.zeros(max(self.len + 1, 2 * len(self.diff)), dtype=numpy.int32)
+            diff[:len(self.diff)] = self.diff
+            self.diff = diff
+
+        if len(self.starts_events) != 0:
+            numpy.add.at(self.diff, numpy.frombuffer(self.starts_events, dtype=numpy.int64), 1)
+            numpy.subtract.at(self.diff, numpy.frombuffer(self.ends_events, dtype=numpy.int64), 1)
+
+        self.starts_events = array('q')
+        self.ends_events = array('q')
+
+
+    # add per base coverage of other, which is built for another part of alignments (e.g. shard of reads).
+    # New slots are created in order of slots of other, so merging parts in order of alignments
+    # gives the same slots as processing of all alignments at once:
+    def add_coverage(self, other):
+        self.alignments_num += other.alignments_num
+
+        other.flush_events()
+        if other.len == 0:
+            return
+
+        other_offsets = numpy.frombuffer(other.slots_offsets, dtype=numpy.int64)
+        other_lens = numpy.diff(numpy.append(other_offsets, other.len))
+
+        slots_other = [None] * len(other.slots_offsets)
+        for id_isoform in other.slots:
+            for id_exon in other.slots[id_isoform]:
+                slots_other[other.slots[id_isoform][id_exon]] = (id_isoform, id_exon)
+
+        offsets = numpy.zeros(len(slots_other), dtype=numpy.int64)
+        for i_slot in range(len(slots_other)):
+            id_isoform, id_exon = slots_other[i_slot]
+            offsets[i_slot] = self.get_slot_offset(id_isoform, id_exon, int(other_lens[i_slot]))
+
+        # resize difference array for new slots:
+        self.flush_events()
+
+        # positions of other are mapped to positions of self slot by slot, coverage is turned back to differences:
+        coverage = numpy.cumsum(other.diff[:other.len], dtype=numpy.int32)
+        positions = numpy.arange(other.len, dtype=numpy.int64) + numpy.repeat(offsets - other_offsets, other_lens)
+        self.diff[positions] += coverage
+        self.diff[positions + 1] -= coverage
+
+
+    # get number of covered bases and sum of coverage for each slot by prefix sum over difference array:
+    def get_coverage(self):
+        self.flush_events()
+
+        if self.len == 0:
+            self.covered_bases = numpy.zeros(0, dtype=numpy.int64)
+            self.sum_coverage = numpy.zeros(0, dtype=numpy.int64)
+        else:
+            coverage = numpy.cumsum(self.diff[:self.len], dtype=numpy.int32)
+            offsets = numpy.frombuffer(self.slots_offsets, dtype=numpy.int64)
+
+            self.covered_bases = numpy.add.reduceat(coverage > 0, offsets, dtype=numpy.int64)
+            self.sum_coverage = numpy.add.reduceat(coverage, offsets, dtype=numpy.int64)
+
+        # per base arrays are not needed anymore:
+        self.diff = numpy.zeros(1, dtype=numpy.int32)
+
+
+    def get_len_exon(self, id_isoform, id_exon):
+        i_slot = self.slots[id_isoform][id_exon]
+        if i_slot + 1 < len(self.slots_offsets):
+            return self.slots_offsets[i_slot + 1] - self.slots_offsets[i_slot]
+
+        return self.len - self.slots_offsets[i_slot]
+
+
+    def get_covered_bases_exon(self, id_isoform, id_exon):
+        return int(self.covered_bases[self.slots[id_isoform][id_exon]])
+
+
+    def get_sum_coverage_exon(self, id_isoform, id_exon):
+        return int(self.sum_coverage[self.slots[id_isoform][id_exon]])
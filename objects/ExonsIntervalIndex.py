@@ -0,0 +1,85 @@
+__author__ = 'letovesnoi'
+
+
+class ExonsIntervalIndex():
+    """Class of implicit augmented interval tree over exons of one chromosome / scaffold and strand"""
+
+    # exons are stored sorted by start in flat lists, the tree is laid over the indexes of these lists:
+    # leaves are even indexes, node with k trailing ones in binary representation of index is at level k;
+    # self.max_ends[i] is the max end over the subtree rooted in the i-th exon.
+    # Query exons overlapping [start, end] costs O(log(n) + number of overlapping exons).
+
+    def __init__(self, starts, ends, ids):
+        # 0-based inclusive coordinates of exons sorted by start:
+        self.starts = starts
+        self.ends = ends
+        self.ids = ids
+
+        self.max_ends = list(ends)
+        self.max_level = self.set_max_ends()
+
+    def set_max_ends(self):
+        n = len(self.starts)
+        if n == 0:
+            return -1
+
+        last_i = 0
+        last = self.ends[0]
+        # leaves:
+        for i in range(0, n, 2):
+            last_i = i
+            last = self.max_ends[i] = self.ends[i]
+
+        # internal nodes in the bottom-up order:
+        k = 1
+        while 1 << k <= n:
+            x = 1 << (k - 1)
+            for i in range((x << 1) - 1, n, x << 2):
+                max_end_left = self.max_ends[i - x]
+                max_end_right = self.max_ends[i + x] if i + x < n else last
+                self.max_ends[i] = max(self.ends[i], max_end_left, max_end_right)
+
+            # last_i points to the parent of the previous last_i:
+            last_i = last_i - x if (last_i >> k) & 1 else last_i + x
+            if last_i < n and self.max_ends[last_i] > last:
+                last = self.max_ends[last_i]
+            k += 1
+
+        return k - 1
+
+    # get indexes of exons overlapping [start, end], coordinates are 0-based inclusive:
+    def get_overlapping_indexes(self, start, end):
+        indexes = []
+
+        n = len(self.starts)
+        if n == 0:
+            return indexes
+
+        # stack of (node, level, is left child processed):
+        stack = [((1 << self.max_level) - 1, self.max_level, False)]
+        while stack:
+            x, k, is_left_done = stack.pop()
+            # small subtree, traverse every node in it:
+            if k <= 3:
+                i0 = x >> k << k
+                i1 = min(i0 + (1 << (k + 1)) - 1, n)
+                i = i0
+                while i < i1 and self.starts[i] <= end:
+                    if self.ends[i] >= start:
+                        indexes.append(i)
+                    i += 1
+            elif not is_left_done:
+                stack.append((x, k, True))
+                y = x - (1 << (k - 1))
+                # left child may be out of range or may overlap with the query:
+                if y >= n or self.max_ends[y] >= start:
+                    stack.append((y, k - 1, False))
+            elif x < n and self.starts[x] <= end:
+                if self.ends[x] >= start:
+                    indexes.append(x)
+                stack.append((x + (1 << (k - 1)), k - 1, False))
+
+        return indexes
+
+    def get_overlapping_ids(self, start, end):
+        return [self.ids[i] for i in self.get_overlapping_indexes(start, end)]
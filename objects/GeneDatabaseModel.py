@@ -0,0 +1,112 @@
+__author__ = 'letovesnoi'
+
+from general import UtilsAnnotations
+
+
+class GeneDatabaseModel():
+    """Class of in-memory gene -> isoform -> exon model loaded from gene database by bulk SQL passes"""
+
+    class Feature(object):
+        """Class of lightweight annotated feature, provides the same coordinates as gffutils Feature"""
+
+        __slots__ = ('index', 'id', 'seqid', 'featuretype', 'start', 'end', 'strand')
+
+        def __init__(self, index, id, seqid, featuretype, start, end, strand):
+            self.index = index
+            self.id = id
+            self.seqid = seqid
+            self.featuretype = featuretype
+            # 1-based inclusive coordinates:
+            self.start = start
+            self.end = end
+            self.strand = strand
+
+        def __len__(self):
+            return self.end - self.start + 1
+
+
+    def __init__(self, sqlite3_db_genes, type_genes, type_isoforms, type_exons, logger):
+        logger.print_timestamp()
+        logger.info('Loading gene database model...')
+
+        # features indexed by integers:
+        self.features = []
+        self.index_by_id = {}
+
+        # parent and children links between features indexes:
+        # exons of isoform sorted by start:
+        self.children_exons = []
+        # isoforms of exon:
+        self.parent_isoforms = []
+        # first gene of isoform or None:
+        self.parent_gene = []
+
+        featuretypes = set(type_genes + type_isoforms + type_exons +
+                           UtilsAnnotations.default_type_genes + UtilsAnnotations.default_type_exons)
+
+        cursor = sqlite3_db_genes.conn.cursor()
+
+        # FEATURES:
+        query = 'SELECT id, seqid, featuretype, start, end, strand FROM features WHERE featuretype IN ({})'.\
+            format(', '.join(['?'] * len(featuretypes)))
+        for id, seqid, featuretype, start, end, strand in cursor.execute(query, list(featuretypes)):
+            self.index_by_id[id] = len(self.features)
+            self.features.append(GeneDatabaseModel.Feature(len(self.features), id, seqid, featuretype, start, end, strand))
+
+        self.children_exons = [[] for i in range(len(self.features))]
+        self.parent_isoforms = [[] for i in range(len(self.features))]
+        self.parent_gene = [None] * len(self.features)
+
+        # RELATIONS (all levels as children / parents of gffutils do):
+        for id_parent, id_child in cursor.execute('SELECT DISTINCT parent, child FROM relations'):
+            if id_parent not in self.index_by_id or id_child not in self.index_by_id:
+                continue
+            parent = self.features[self.index_by_id[id_parent]]
+            child = self.features[self.index_by_id[id_child]]
+
+            if child.featuretype in UtilsAnnotations.default_type_exons:
+                self.children_exons[parent.index].append(child.index)
+
+            if parent.featuretype in type_isoforms:
+                self.parent_isoforms[child.index].append(parent.index)
+
+            if parent.featuretype in UtilsAnnotations.default_type_genes and self.parent_gene[child.index] is None:
+                self.parent_gene[child.index] = parent.index
+
+        for exons_indexes in self.children_exons:
+            exons_indexes.sort(key=lambda i_exon: self.features[i_exon].start)
+
+        logger.info('  Loaded {} features.'.format(len(self.features)))
+        logger.info('Done.')
+
+
+    def __getitem__(self, id_feature):
+        return self.features[self.index_by_id[id_feature]]
+
+
+    def __contains__(self, id_feature):
+        return id_feature in self.index_by_id
+
+
+    # get exons of isoform sorted by start:
+    def get_children_exons(self, id_isoform):
+        isoform = self[id_isoform]
+        children_exons = [self.features[i_exon] for i_exon in self.children_exons[isoform.index]]
+        # for prokaryotes:
+        if len(children_exons) == 0:
+            children_exons = [isoform]
+
+        return children_exons
+
+
+    def get_parent_isoforms(self, exon):
+        return [self.features[i_isoform] for i_isoform in self.parent_isoforms[exon.index]]
+
+
+    # get id of parent gene or id of isoform itself if gene is absent:
+    def get_parent_gene_id(self, id_isoform):
+        i_gene = self.parent_gene[self.index_by_id[id_isoform]]
+        if i_gene is None:
+            return id_isoform
+
+        return self.features[i_gene].id
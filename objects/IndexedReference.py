@@ -0,0 +1,181 @@
+__author__ = 'letovesnoi'
+
+import os
+import mmap
+
+
+class IndexedReference():
+    """Class of reference, which sequences are read on demand from memory-mapped FASTA by faidx-style index"""
+
+    # provides the same interface as dict of reference sequences: names, len(seq) and seq[start:end],
+    # but only index is kept in memory. Index line: name, length, offset, bases per line, bytes per line.
+
+    class Sequence(object):
+        """Class of one reference sequence, which subsequences are read from memory-mapped FASTA"""
+
+        __slots__ = ('reference_mmap', 'len', 'offset', 'line_bases', 'line_width')
+
+        def __init__(self, reference_mmap, len_seq, offset, line_bases, line_width):
+            self.reference_mmap = reference_mmap
+            self.len = len_seq
+            self.offset = offset
+            self.line_bases = line_bases
+            self.line_width = line_width
+
+        def __len__(self):
+            return self.len
+
+        def get_file_pos(self, pos):
+            if self.line_bases == 0:
+                return self.offset
+            return self.offset + pos // self.line_bases * self.line_width + pos % self.line_bases
+
+        def __getitem__(self, key):
+            if isinstance(key, slice):
+                start, end, step = key.indices(self.len)
+                if start >= end:
+                    return ''
+                subseq = self.reference_mmap[self.get_file_pos(start):self.get_file_pos(end - 1) + 1]
+                subseq = subseq.replace(b'\n', b'').replace(b'\r', b'').decode('ascii')
+                if step != 1:
+                    subseq = subseq[::step]
+                return subseq
+
+            if key < 0:
+                key += self.len
+            if key < 0 or key >= self.len:
+                raise IndexError('reference position out of range')
+            return self.reference_mmap[self.get_file_pos(key):self.get_file_pos(key) + 1].decode('ascii')
+
+
+    def __init__(self, reference_path, index):
+        self.reference_path = reference_path
+
+        self.reference_handle = open(reference_path, 'rb')
+        self.reference_mmap = mmap.mmap(self.reference_handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.sequences = {}
+        for name, len_seq, offset, line_bases, line_width in index:
+            self.sequences[name] = \
+                IndexedReference.Sequence(self.reference_mmap, len_seq, offset, line_bases, line_width)
+
+
+    # get indexed reference or None if FASTA can't be indexed (compressed or with irregular lines):
+    @classmethod
+    def get_indexed_reference(cls, reference_path, tmp_dir, logger):
+        if os.path.splitext(reference_path)[1] in ['.gz', '.gzip', '.bz2', '.bzip2', '.zip'] or \
+                os.path.getsize(reference_path) == 0:
+            return None
+
+        # index made by samtools faidx can be reused:
+        index = None
+        for index_path in [reference_path + '.fai', os.path.join(tmp_dir, os.path.basename(reference_path) + '.fai')]:
+            if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(reference_path):
+                index = read_fai(index_path)
+                if index is not None:
+                    break
+
+        if index is None:
+            logger.info('  indexing reference...')
+            index = get_fai(reference_path)
+            if index is None:
+                logger.info('  reference has lines of different length, it will be loaded to memory.')
+                return None
+            index_path = os.path.join(tmp_dir, os.path.basename(reference_path) + '.fai')
+            write_fai(index, index_path)
+            logger.info('  index saved to {}'.format(index_path))
+
+        return cls(reference_path, index)
+
+
+    def __getitem__(self, id_chr):
+        return self.sequences[id_chr]
+
+
+    def __contains__(self, id_chr):
+        return id_chr in self.sequences
+
+
+    def __iter__(self):
+        return iter(self.sequences)
+
+
+    def __len__(self):
+        return len(self.sequences)
+
+
+    def keys(self):
+        return list(self.sequences.keys())
+
+
+# get faidx-style index of FASTA or None if lines of sequence have different length:
+def get_fai(reference_path):
+    index = []
+
+    name = None
+    len_seq = offset = line_bases = line_width = 0
+    # line shorter than previous ones must be the last line of sequence:
+    is_last_line = False
+
+    pos = 0
+    with open(reference_path, 'rb') as in_handle:
+        for line in in_handle:
+            line_pos = pos
+            pos += len(line)
+
+            if line[:1] == b'>':
+                if name is not None:
+                    index.append((name, len_seq, offset, line_bases, line_width))
+                # name is the first word as in dict of reference sequences:
+                words = line[1:].decode('ascii').split()
+                if len(words) == 0:
+                    return None
+                name = words[0]
+                len_seq = line_bases = line_width = 0
+                offset = pos
+                is_last_line = False
+                continue
+
+            bases = len(line.rstrip(b'\r\n'))
+            if bases == 0:
+                is_last_line = True
+                continue
+            if name is None or is_last_line or len(line.strip()) != bases:
+                return None
+
+            if line_bases == 0:
+                line_bases = bases
+                line_width = len(line)
+                offset = line_pos
+            elif bases > line_bases or (bases == line_bases and len(line) != line_width and line.endswith(b'\n')):
+                return None
+            elif bases < line_bases or len(line) != line_width:
+                is_last_line = True
+
+            len_seq += bases
+
+    if name is not None:
+        index.append((name, len_seq, offset, line_bases, line_width))
+
+    return index
+
+
+def read_fai(index_path):
+    index = []
+    with open(index_path, 'r') as in_handle:
+        for line in in_handle:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                return None
+            try:
+                index.append((fields[0], int(fields[1]), int(fields[2]), int(fields[3]), int(fields[4])))
+            except ValueError:
+                return None
+
+    return index
+
+
+def write_fai(index, index_path):
+    with open(index_path, 'w') as out_handle:
+        for name, len_seq, offset, line_bases, line_width in index:
+            out_handle.write('{}\t{}\t{}\t{}\t{}\n'.format(name, len_seq, offset, line_bases, line_width))
@@ -275,12 +275,15 @@ def print_fasta(fasta):
 
 def write_fasta(fpath, fasta, mode='w'):
     outfile = open(fpath, mode)
+    write_fasta_to_handle(outfile, fasta)
+    outfile.close()
+
 
+def write_fasta_to_handle(outfile, fasta):
     for name, seq in fasta:
         outfile.write('>%s\n' % name)
         for i in range(0, len(seq), 60):
             outfile.write(seq[i:i + 60] + '\n')
-    outfile.close()
 
 
 def comp(letter):
@@ -51,5 +51,6 @@ class ComparisonReport():
             self.distribution_report = \
                 DistributionReport.DistributionReport(transcripts_metrics, db_genes_metrics, self.output_dir, logger,
                                                       PRECISION)
+            self.distribution_report.draw_plots(args.threads, args.cache_dir, logger)
 
         logger.info('  saved to {}'.format(self.output_dir))
\ No newline at end of file
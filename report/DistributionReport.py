@@ -2,6 +2,8 @@ __author__ = 'letovesnoi'
 
 import os
 
+from general import parallel_plots_run
+
 from report import UtilsPictures
 
 
@@ -13,6 +15,8 @@ class DistributionReport():
 
         logger.print_timestamp('  ')
         logger.info('  Getting DISTRIBUTION report...')
+        # plots with computed data, they are drawn separately by draw_plots:
+        self.plots = []
         # for creating PDF file with all plots and tables:
         self.short_report_plots = []
 
@@ -32,6 +36,15 @@ class DistributionReport():
         logger.info('  Done.')
 
 
+    def draw_plots(self, threads, cache_dir, logger):
+        logger.print_timestamp('  ')
+        logger.info('  Drawing DISTRIBUTION plots...')
+
+        parallel_plots_run.parallel_plots_run(self.plots, threads, cache_dir, logger)
+
+        logger.info('  Done.')
+
+
     def get_basic_plots(self, transcripts_metrics, db_genes_metrics, precision):
         # BASIC AND SIMPLE 1
         # Transcripts len distribution from aligned and assembled transcripts(avg, min, max, total)
@@ -90,7 +103,7 @@ class DistributionReport():
                 nx_plot = \
                     UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, self.output_dir)
 
-                nx_plot.Nx_plot(list_of_labels, lists_of_lengths, self.short_report_plots)
+                nx_plot.get_Nx_data(list_of_labels, lists_of_lengths, self.plots, self.short_report_plots)
 
         # BASIC AND SIMPLE 12
         # NAx:
@@ -114,7 +127,7 @@ class DistributionReport():
                     UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, self.output_dir,
                                        caption=caption)
 
-                nax_plot.Nx_plot(list_of_labels, lists_of_lengths, self.short_report_plots)
+                nax_plot.get_Nx_data(list_of_labels, lists_of_lengths, self.plots, self.short_report_plots)
 
 
     # BASIC AND SIMPLE 1
@@ -158,7 +171,7 @@ class DistributionReport():
                                transcripts_labels, transcripts_distributions, isoforms_label, isoforms_distribution,
                                y_log_scale=True, caption=caption)
 
-        transcript_len_plot.plot_compare_distribution(self.short_report_plots)
+        transcript_len_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     # BASIC AND SIMPLE 4
@@ -196,7 +209,7 @@ class DistributionReport():
                                transcripts_labels, transcripts_distributions, isoforms_label, isoforms_distribution,
                                y_log_scale=True)
 
-        block_len_plot.plot_compare_distribution(self.short_report_plots)
+        block_len_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     # # BASIC AND SIMPLE 0
@@ -222,7 +235,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distributions, y_log_scale=True, def_step=0.1)
 
-        x_aligned_plot.plot_compare_distribution(self.short_report_plots)
+        x_aligned_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     # BASIC AND SIMPLE 3
@@ -263,7 +276,7 @@ class DistributionReport():
                                transcripts_labels, transcripts_distributions, isoforms_label, isoforms_distribution,
                                y_log_scale=True, def_step=1)
 
-        blocks_per_alignment_plot.plot_compare_distribution(self.short_report_plots)
+        blocks_per_alignment_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     # BASIC AND SIMPLE 5
@@ -293,7 +306,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distributions, y_log_scale=True, def_step=1)
 
-        alignment_multiplicity_plot.plot_compare_distribution(self.short_report_plots)
+        alignment_multiplicity_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     # BASIC AND SIMPLE 6
@@ -325,7 +338,7 @@ class DistributionReport():
                                transcripts_labels, transcripts_distributions, y_log_scale=True, caption=caption,
                                def_step=1)
 
-        mismatch_rate_plot.plot_compare_distribution(self.short_report_plots)
+        mismatch_rate_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     '''# BASIC AND SIMPLE 7
@@ -371,7 +384,7 @@ class DistributionReport():
                                transcripts_labels, transcripts_distributions, isoforms_label, isoforms_distribution,
                                y_log_scale=True, def_step=1)
 
-        plot_7.plot_compare_distribution(self.short_report_plots)'''
+        plot_7.get_distribution_data(self.plots, self.short_report_plots)'''
 
 
     '''# BASIC AND SIMPLE 9
@@ -397,7 +410,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distribution, y_log_scale=True, def_step=1)
 
-        gaps_per_alignment_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)'''
+        gaps_per_alignment_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)'''
 
 
     '''# BASIC AND SIMPLE 10
@@ -421,7 +434,7 @@ class DistributionReport():
         name_fig = 'gap_length'
 
         gap_len_plot = UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir, transcripts_labels, transcripts_distribution, y_log_scale=True)
-        gap_len_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)'''
+        gap_len_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)'''
 
 
     def get_x_matched_plot(self, transcripts_metrics, out_dir, precision, short_report_visible):
@@ -447,7 +460,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distributions, caption=caption, def_step=0.1)
 
-        x_matched_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)
+        x_matched_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)
 
 
     def get_x_matched_blocks_plot(self, transcripts_metrics, out_dir, precision, short_report_visible=False):
@@ -470,7 +483,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distribution, def_step=0.1)
 
-        x_matched_blocks_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)
+        x_matched_blocks_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)
 
 
     def get_specificity_plots(self, transcripts_metrics, out_dir, precision):
@@ -508,7 +521,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distribution, caption=caption, def_step=0.1)
 
-        x_assembled_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)
+        x_assembled_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)
 
 
     def get_x_assembled_exons_plot(self, transcripts_metrics, out_dir, precision, short_report_visible):
@@ -532,7 +545,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distribution, def_step=0.1)
 
-        x_assembled_exons_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)
+        x_assembled_exons_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)
 
 
     # CONSIDER COVERED BASES (BY ALL MAPPED TRANSCRIPTS) WITHOUT OVERLAPS:
@@ -562,7 +575,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_str, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distribution, caption=caption, def_step=0.1)
 
-        x_covered_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)
+        x_covered_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)
 
 
     # distributions for exons:
@@ -587,7 +600,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distribution, def_step=0.1)
 
-        x_covered_exons_plot.plot_compare_histogram(transcripts_metrics, self.short_report_plots)
+        x_covered_exons_plot.get_histogram_data(len(transcripts_metrics), self.plots, self.short_report_plots)
 
 
     # def get_avg_exon_covered_fraction_over_isoforms_distribution(self, transcripts_metrics, out_dir, precision, short_report_visible):
@@ -674,7 +687,7 @@ class DistributionReport():
             UtilsPictures.Plot(title_str, label_x, label_y, name_fig, short_report_visible, out_dir,
                                transcripts_labels, transcripts_distributions, y_log_scale=True, def_step=1)
 
-        alignments_per_isoform_plot.plot_compare_distribution(self.short_report_plots)
+        alignments_per_isoform_plot.get_distribution_data(self.plots, self.short_report_plots)
 
 
     def get_sensitivity_plots(self, transcripts_metrics, out_dir, precision):
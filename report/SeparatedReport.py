@@ -55,6 +55,7 @@ class SeparatedReport():
         if not args.no_plots:
             self.distribution_report = \
                 DistributionReport.DistributionReport([transcripts_metrics], db_genes_metrics, self.output_dir, logger, PRECISION)
+            self.distribution_report.draw_plots(args.threads, args.cache_dir, logger)
 
         logger.print_timestamp('  ')
         logger.info('  Getting OTHER reports...')
@@ -9,6 +9,8 @@ font = {'family': 'sans-serif', 'style': 'normal', 'weight': 'medium', 'size': 1
 
 from general import rqconfig
 
+from report import UtilsPictures
+
 
 class ShortReport():
     """Class which generate short report"""
@@ -432,16 +434,18 @@ class ShortReport():
 
     # full report in PDF format: all tables and plots
     def print_pdf(self, args, table_to_draw, separated_reports, comparison_report, logger):
+        # PDF isn't written without plots, so table figure isn't drawn and matplotlib isn't imported:
+        if args.no_plots:
+            return
+
         pdf_tables_figures = [self.get_pdf_table_figure('Short report', 'generated by rnaQUAST', table_to_draw, self.column_widths, logger)]
 
-        all_pdf_file = None
-        if not args.no_plots:
-            from quast_libs import plotter  # Do not remove this line! It would lead to a warning in matplotlib.
-            try:
-                from matplotlib.backends.backend_pdf import PdfPages
-                all_pdf_file = PdfPages(self.path_pdf)
-            except:
-                all_pdf_file = None
+        from quast_libs import plotter  # Do not remove this line! It would lead to a warning in matplotlib.
+        try:
+            from matplotlib.backends.backend_pdf import PdfPages
+            all_pdf_file = PdfPages(self.path_pdf)
+        except:
+            all_pdf_file = None
         if all_pdf_file:
             # for several files with transcripts select only comparison report pictures:
             if comparison_report is not None:
@@ -454,19 +458,8 @@ class ShortReport():
 
     # draw_report_table from quast_libs.plotter:
     def get_pdf_table_figure(self, report_name, extra_info, table_to_draw, column_widths, logger):
-        # checking if matplotlib and pylab is installed:
-        matplotlib_error = False
-        try:
-            import matplotlib
-            matplotlib.use('Agg')  # non-GUI backend
-            if matplotlib.__version__.startswith('0'):
-                logger.warning('matplotlib version is rather old! Please use matplotlib version 1.0 or higher for better results.')
-            #from pylab import *
-        except Exception:
-            logger.warning('Can\'t draw plots: please install python-matplotlib and pylab.')
-            matplotlib_error = True
-
-        if matplotlib_error:
+        pyplot = UtilsPictures.get_pyplot()
+        if pyplot is None:
             return
 
         # some magic constants ..
@@ -482,13 +475,12 @@ class ShortReport():
         total_height = nrows * row_height + 2 * external_text_height
         total_width = letter_width_coeff * font_scale * sum(column_widths)
 
-        import matplotlib.pyplot
-        figure = matplotlib.pyplot.figure(figsize=(total_width, total_height))
-        matplotlib.pyplot.rc('font', **font)
-        matplotlib.pyplot.axis('off')
-        matplotlib.pyplot.text(0.5 - float(column_widths[0]) / (2 * sum(column_widths)),
-                               1. - float(2 * row_height) / total_height, report_name.replace('_', ' ').capitalize())
-        matplotlib.pyplot.text(0 - float(column_widths[0]) / (2 * sum(column_widths)), 0, extra_info)
+        figure = pyplot.figure(figsize=(total_width, total_height))
+        pyplot.rc('font', **font)
+        pyplot.axis('off')
+        pyplot.text(0.5 - float(column_widths[0]) / (2 * sum(column_widths)),
+                    1. - float(2 * row_height) / total_height, report_name.replace('_', ' ').capitalize())
+        pyplot.text(0 - float(column_widths[0]) / (2 * sum(column_widths)), 0, extra_info)
 
         colLabels = table_to_draw[0][1:]
         if len(colLabels) == 0:
@@ -496,32 +488,24 @@ class ShortReport():
         rowLabels = [item[0] for item in table_to_draw[1:]]
         restValues = [item[1:] for item in table_to_draw[1:]]
 
-        matplotlib.pyplot.table(cellText=restValues, rowLabels=rowLabels, colLabels=colLabels,
+        pyplot.table(cellText=restValues, rowLabels=rowLabels, colLabels=colLabels,
             colWidths = [float(column_width) / sum(column_widths) for column_width in column_widths[1:]],
             rowLoc = 'left', colLoc='center', cellLoc='right', loc='center')
         return figure
 
 
     def fill_all_pdf_file(self, all_pdf, pdf_tables_figures, short_report_plots, logger):
-        # checking if matplotlib and pylab is installed:
-        matplotlib_error = False
-        try:
-            import matplotlib
-            matplotlib.use('Agg')  # non-GUI backend
-            if matplotlib.__version__.startswith('0'):
-                logger.warning('matplotlib version is rather old! Please use matplotlib version 1.0 or higher for better results.')
-            #from pylab import *
-        except Exception:
-            logger.warning('Can\'t draw plots: please install python-matplotlib and pylab.')
-            matplotlib_error = True
-
-        if matplotlib_error or not all_pdf:
+        pyplot = UtilsPictures.get_pyplot()
+        if pyplot is None or not all_pdf:
             return
 
         for figure in pdf_tables_figures:
             all_pdf.savefig(figure, bbox_inches='tight')
+        # figures of plots are drawn again from their data:
         for plot in short_report_plots:
-            all_pdf.savefig(plot.fig, bbox_inches='tight')
+            figure = plot.get_figure(pyplot)
+            all_pdf.savefig(figure, bbox_inches='tight')
+            pyplot.close(figure)
 
         try:  # for matplotlib < v.1.0
             d = all_pdf.infodict()
@@ -1,14 +1,17 @@
 __author__ = 'letovesnoi'
 
 import os
+import math
+import shutil
 import collections
 try:
     from itertools import izip
 except ImportError:
     izip = zip
 
-from general.log import get_logger
+from general.log import get_logger, get_package_version
 from general import rqconfig
+from general import UtilsCache
 
 logger = get_logger(rqconfig.LOGGER_DEFAULT_NAME)
 
@@ -20,20 +23,33 @@ font = {'family': 'sans-serif', 'style': 'normal', 'weight': 'medium', 'size': 1
 list_colors=['blue', 'red', 'green', 'yellow', 'magenta', 'orange', 'cyan', 'black']
 
 
-# checking if matplotlib and pylab is installed:
+# matplotlib is imported only for drawing, so parsing and metrics don't pay for its import:
+_pyplot = None
 matplotlib_error = False
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # non-GUI backend
-    if matplotlib.__version__.startswith('0'):
-        logger.warning('matplotlib version is rather old! Please use matplotlib version 1.0 or higher for better results.')
-    from pylab import *
-except Exception:
-    logger.warning('Can\'t draw plots: please install python-matplotlib and pylab.')
-    matplotlib_error = True
+
+
+# get pyplot with non-GUI backend or None if matplotlib isn't installed:
+def get_pyplot():
+    global _pyplot
+    global matplotlib_error
+
+    if _pyplot is None and not matplotlib_error:
+        try:
+            import matplotlib
+            matplotlib.use('Agg')  # non-GUI backend
+            if matplotlib.__version__.startswith('0'):
+                logger.warning('matplotlib version is rather old! Please use matplotlib version 1.0 or higher for better results.')
+            import matplotlib.pyplot
+            _pyplot = matplotlib.pyplot
+        except Exception:
+            logger.warning('Can\'t draw plots: please install python-matplotlib and pylab.')
+            matplotlib_error = True
+
+    return _pyplot
 
 
 class Plot():
+    """Class of plot: points of lines and bars are computed first, then plot is drawn from them by matplotlib"""
 
     def __init__(self, title_name, label_x, label_y, name_fig, short_report_visible, out_dir,
                  transcripts_labels=None, transcripts_distribution=None, isoforms_label=None, isoforms_distribution=None,
@@ -66,17 +82,30 @@ class Plot():
 
         self.title_str = None
 
-        self.fig = None
+        # DATA FOR DRAWING:
+        self.draw_name = None
+        # lines: (xs, ys, line style, label, color); bars: (xs, heights, width, color):
+        self.lines = []
+        self.bars = []
+        self.legend_labels = None
+        self.xlim = None
+        self.ylim = None
+        # symlog scales with their keyword arguments:
+        self.xscale_kwargs = None
+        self.yscale_kwargs = None
+
+
+    # add plot with data to plots for drawing and to short report if it's visible there:
+    def add_to_plots(self, plots, short_report_plots):
+        plots.append(self)
+        if self.short_report_visible:
+            short_report_plots.append(self)
 
 
     # common routine for Nx-plot and NGx-plot (and probably for others Nyx-plots in the future)
-    def Nx_plot(self, list_of_labels, lists_of_lengths, short_report_plots, reference_lengths=None):
-        if matplotlib_error:
-            return
-
-        logger.info('    Drawing ' + self.title_name.replace('\n', ' ') + ' plot...')
-
-        self.fig = figure()
+    def get_Nx_data(self, list_of_labels, lists_of_lengths, plots, short_report_plots, reference_lengths=None):
+        self.draw_name = self.title_name.replace('\n', ' ') + ' plot'
+        self.title_str = self.title_name
 
         for id, (contigs_fpath, lengths) in enumerate(izip(list_of_labels, lists_of_lengths)):
             if len(lengths) == 0:
@@ -101,25 +130,11 @@ class Plot():
             vals_Nx.append(vals_Nx[-1] + 1e-10) # eps
             vals_l.append(0.0)
 
-            plot(vals_Nx, vals_l, '-', label=list_of_labels[id], color=list_colors[id % len(list_colors)])
-
-        title(self.title_name)
+            self.lines.append((vals_Nx, vals_l, '-', list_of_labels[id], list_colors[id % len(list_colors)]))
 
-        legend(fontsize='x-small', loc='center left', bbox_to_anchor=(1.01, 0.5))
+        self.xlim = (0, 100)
 
-        xlim(0, 100)
-        xlabel(self.label_x)
-        ylabel(self.label_y)
-
-        savefig(self.path, bbox_inches='tight')
-        logger.info('      saved to ' + self.path)
-
-        if self.short_report_visible:
-           short_report_plots.append(self)
-
-        close()
-
-        return self.fig
+        self.add_to_plots(plots, short_report_plots)
 
 
     # write plot points separated by tab to txt file:
@@ -132,23 +147,16 @@ class Plot():
                 fin.write('\n\n')
 
 
-    def plot_compare_distribution(self, short_report_plots, num_points=100):
+    def get_distribution_data(self, plots, short_report_plots, num_points=100):
         self.write_plot_points_to_file()
 
         self.num_points = num_points
 
-        if matplotlib_error:
-            return
-
         if self.transcripts_distributions == [] and (self.isoforms_distribution is None or self.isoforms_distribution == {}):
             return
 
-        logger.info('    Drawing cumulative ' + self.title_name.replace('\n', ' ') + ' plot...')
-
-        self.fig = figure()
-
+        self.draw_name = 'cumulative ' + self.title_name.replace('\n', ' ') + ' plot'
         self.title_str = 'Cumulative ' + self.title_name + ' plot'
-        title(self.title_str)
 
         if self.isoforms_distribution is not None and len(self.isoforms_distribution.keys()) > 1:
             step = Plot.get_step(self.def_step, [self.isoforms_distribution], self.num_points)
@@ -169,8 +177,9 @@ class Plot():
 
             cumulate_ordered_isoforms_distribution = Plot.cumulate(collections.OrderedDict(sorted(show_isoforms_distribution.items())))
 
-            plot(list(cumulate_ordered_isoforms_distribution.keys()), list(cumulate_ordered_isoforms_distribution.values()), '--',
-                 label=self.isoforms_label, color=list_colors[-1])
+            self.lines.append((list(cumulate_ordered_isoforms_distribution.keys()),
+                               list(cumulate_ordered_isoforms_distribution.values()), '--',
+                               self.isoforms_label, list_colors[-1]))
 
             y_begin, y_end = Plot.get_y_begins_ends_plot([cumulate_ordered_isoforms_distribution], self.y_log_scale)
         else:
@@ -187,65 +196,44 @@ class Plot():
             cumulate_ordered_transcripts_distribution.append(
                 Plot.cumulate(collections.OrderedDict(sorted(show_transcripts_distributions[i_transcripts].items()))))
 
-            plot(list(cumulate_ordered_transcripts_distribution[i_transcripts].keys()),
-                 list(cumulate_ordered_transcripts_distribution[i_transcripts].values()), '-',
-                 label=self.transcripts_labels[i_transcripts], color=list_colors[i_transcripts % len(list_colors)])
+            self.lines.append((list(cumulate_ordered_transcripts_distribution[-1].keys()),
+                               list(cumulate_ordered_transcripts_distribution[-1].values()), '-',
+                               self.transcripts_labels[i_transcripts], list_colors[i_transcripts % len(list_colors)]))
 
         if show_isoforms_distribution is None:
             y_begin, y_end = Plot.get_y_begins_ends_plot(cumulate_ordered_transcripts_distribution, self.y_log_scale)
 
         if self.x_log_scale:
             # the interval near 0 will be on a linear scale, so 0 can be displayed
-            xscale('symlog', linthreshx=0.1)
+            self.xscale_kwargs = {'linthreshx': 0.1}
         if self.y_log_scale:
             # the interval near 0 will be on a linear scale, so 0 can be displayed
-            yscale('symlog')
+            self.yscale_kwargs = {}
 
         if math.isinf(x_begin) or math.isinf(x_end) or math.isinf(y_begin) or math.isinf(y_end):
             logger.warning("Cannot identify axis limits, skipping " + self.title_name.replace('\n', ' ') +  " plot")
             return
 
-        xlim(x_begin, x_end)
-        ylim(y_begin, y_end)
+        self.xlim = (x_begin, x_end)
+        self.ylim = (y_begin, y_end)
 
-        legend(fontsize='x-small', loc='center left', bbox_to_anchor=(1.01, 0.5))
+        self.add_to_plots(plots, short_report_plots)
 
-        xlabel(self.label_x)
-        ylabel(self.label_y)
-
-        savefig(self.path, bbox_inches='tight')
-
-        logger.info('      saved to ' + self.path)
-
-        if self.short_report_visible:
-            short_report_plots.append(self)
 
-        close()
-
-        return self.fig
-
-
-    def plot_compare_histogram(self, transcripts_metrics, short_report_plots, num_points=10):
+    def get_histogram_data(self, transcripts_num, plots, short_report_plots, num_points=10):
         self.write_plot_points_to_file()
 
         self.num_points = num_points
 
-        if matplotlib_error:
-            return
-
         if self.transcripts_distributions == []:
             return
 
-        logger.info('    Drawing cumulative ' + self.title_name.replace('\n', ' ') + ' histogram...')
-
-        self.fig = figure()
-
+        self.draw_name = 'cumulative ' + self.title_name.replace('\n', ' ') + ' histogram'
         self.title_str = 'Cumulative ' + self.title_name + ' histogram'
-        title(self.title_str)
 
         step = Plot.get_step(self.def_step, self.transcripts_distributions, self.num_points)
         space = step * 2.0 / 3
-        shift = space / len(transcripts_metrics)
+        shift = space / transcripts_num
 
         show_transcripts_distributions = {}
         for i_transcripts in range(len(self.transcripts_distributions)):
@@ -256,7 +244,7 @@ class Plot():
 
         x_begin, x_end = Plot.get_x_begins_ends_plot(show_transcripts_distributions, False)
 
-        legend_text = []
+        self.legend_labels = []
         cumulate_ordered_transcripts_distributions = {}
         shift_cumulate_transcripts_distributions = {}
         for i_transcripts in range(len(self.transcripts_distributions)):
@@ -271,42 +259,96 @@ class Plot():
             for key in show_transcripts_distributions[i_transcripts]:
                 shift_cumulate_transcripts_distributions[i_transcripts][key + i_transcripts * shift - space / 2] = cumulate_ordered_transcripts_distributions[i_transcripts][key]
 
-            bar(shift_cumulate_transcripts_distributions[i_transcripts].keys(),
-                shift_cumulate_transcripts_distributions[i_transcripts].values(),
-                width=shift, color=list_colors[i_transcripts % len(list_colors)])
+            self.bars.append((list(shift_cumulate_transcripts_distributions[i_transcripts].keys()),
+                              list(shift_cumulate_transcripts_distributions[i_transcripts].values()),
+                              shift, list_colors[i_transcripts % len(list_colors)]))
 
-            legend_text.append(self.transcripts_labels[i_transcripts])
-
-        y_begin, y_end = Plot.get_y_begins_ends_plot(shift_cumulate_transcripts_distributions, self.y_log_scale)
+            self.legend_labels.append(self.transcripts_labels[i_transcripts])
 
         if self.y_log_scale:
             # the interval near 0 will be on a linear scale, so 0 can be displayed
-            yscale('symlog', linthreshx=0.1)
+            self.yscale_kwargs = {'linthreshx': 0.1}
 
-        xlim(x_begin - space / 2, x_end + space / 2)
-        #ylim(y_begin, y_end)
+        self.xlim = (x_begin - space / 2, x_end + space / 2)
 
-        legend(legend_text, fontsize='x-small', loc='center left', bbox_to_anchor=(1.01, 0.5))
+        self.add_to_plots(plots, short_report_plots)
 
-        xlabel(self.label_x)
-        ylabel(self.label_y)
 
-        savefig(self.path, bbox_inches='tight')
+    # DRAWING:
+    # draw figure from computed data, figure must be closed by caller:
+    def get_figure(self, pyplot):
+        fig = pyplot.figure()
 
-        logger.info('      saved to ' + self.path)
+        pyplot.title(self.title_str)
 
-        if self.short_report_visible:
-            short_report_plots.append(self)
+        for xs, ys, line_style, label, color in self.lines:
+            pyplot.plot(xs, ys, line_style, label=label, color=color)
+        for xs, heights, width, color in self.bars:
+            pyplot.bar(xs, heights, width=width, color=color)
+
+        if self.xscale_kwargs is not None:
+            pyplot.xscale('symlog', **self.xscale_kwargs)
+        if self.yscale_kwargs is not None:
+            pyplot.yscale('symlog', **self.yscale_kwargs)
+
+        if self.xlim is not None:
+            pyplot.xlim(*self.xlim)
+        if self.ylim is not None:
+            pyplot.ylim(*self.ylim)
 
-        close()
+        if self.legend_labels is not None:
+            pyplot.legend(self.legend_labels, fontsize='x-small', loc='center left', bbox_to_anchor=(1.01, 0.5))
+        else:
+            pyplot.legend(fontsize='x-small', loc='center left', bbox_to_anchor=(1.01, 0.5))
+
+        pyplot.xlabel(self.label_x)
+        pyplot.ylabel(self.label_y)
+
+        return fig
+
+
+    # key of drawn plot in cache: hash of all data it is drawn from and of matplotlib version:
+    def get_data_key(self, matplotlib_version):
+        return UtilsCache.get_cache_key(rqconfig.CACHE_VERSION, 'plot', matplotlib_version,
+                                        os.path.splitext(self.path)[1], self.title_str, self.label_x, self.label_y,
+                                        self.lines, self.bars, self.legend_labels, self.xlim, self.ylim,
+                                        self.xscale_kwargs, self.yscale_kwargs)
+
+
+    # plot is copied from cache directory if the same data were drawn before, otherwise it's drawn and saved there:
+    def draw(self, plots_cache_dir=None, matplotlib_version=None):
+        cache_path = None
+        if plots_cache_dir is not None:
+            cache_path = UtilsCache.get_cache_path(plots_cache_dir, self.get_data_key(matplotlib_version),
+                                                   os.path.basename(self.path))
+            if os.path.exists(cache_path):
+                shutil.copyfile(cache_path, self.path)
+                logger.info('    ' + self.draw_name.capitalize() + ' found in cache, saved to ' + self.path)
+                return
+
+        pyplot = get_pyplot()
+        if pyplot is None:
+            return
+
+        logger.info('    Drawing ' + self.draw_name + '...')
+
+        fig = self.get_figure(pyplot)
+        pyplot.savefig(self.path, bbox_inches='tight')
+        pyplot.close(fig)
+
+        logger.info('      saved to ' + self.path)
 
-        return self.fig
+        if cache_path is not None:
+            # write to temporary file and rename it, so other runs never see partially copied plots:
+            tmp_cache_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+            shutil.copyfile(self.path, tmp_cache_path)
+            os.rename(tmp_cache_path, cache_path)
 
 
     @classmethod
     def get_x_begins_ends_plot(cls, distributions, x_log_scale):
-        x_begin = +inf
-        x_end = -inf
+        x_begin = float('inf')
+        x_end = -float('inf')
         for i_distribution in range(len(distributions)):
             if distributions[i_distribution] == {}:
                 continue
@@ -324,8 +366,8 @@ class Plot():
 
     @classmethod
     def get_y_begins_ends_plot(cls, distributions, y_log_scale):
-        y_begin = +inf
-        y_end = -inf
+        y_begin = float('inf')
+        y_end = -float('inf')
 
         for i_distribution in range(len(distributions)):
             if distributions[i_distribution] == {}:
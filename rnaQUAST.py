@@ -5,6 +5,7 @@ __author__ = 'lenk'
 import os
 import sys
 import shutil
+import glob
 
 rquast_dirpath = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
 
@@ -20,12 +21,20 @@ from general import UtilsPipeline
 from general import UtilsTools
 from general import UtilsAlignment
 from general import UtilsAnnotations
+from general import UtilsCache
+from general import UtilsCheckpoint
+from general import UtilsProfile
+from general import parallel_assemblies_run
+from general import parallel_stages_run
 
 from objects import SortedExonsAttributes
+from objects import GeneDatabaseModel
+from objects import IndexedReference
 
 from metrics import TranscriptsMetrics
 from metrics import GeneDatabaseMetrics
 from metrics import ReadsCoverage
+from metrics import AssemblyCompletenessMetrics
 
 from report import ShortReport
 from report import SeparatedReport
@@ -36,6 +45,115 @@ logger = log.get_logger(rqconfig.LOGGER_DEFAULT_NAME)
 from general.rqconfig import PRECISION
 
 
+def process_one_transcripts_file(i_transcripts, threads, args, transcripts_dicts, reference_dict, genes_model,
+                                 sorted_exons_attr, db_genes_metrics, reads_coverage, isoforms_blast_db, type_organism,
+                                 tmp_dir, log_dir, WELL_FULLY_COVERAGE_THRESHOLDS, ALIGNMENT_THRESHOLDS, checkpoints_dir,
+                                 transcripts_metrics_keys):
+    logger.info()
+    logger.info('Processing transcripts from {}:'.format(args.transcripts[i_transcripts]))
+
+    # METRICS OF ASSEMBLY COMPLETED IN PREVIOUS RUN:
+    transcripts_metrics_stage = 'transcripts_metrics.{}'.format(args.labels[i_transcripts])
+    transcripts_metrics = \
+        UtilsCheckpoint.load_stage(checkpoints_dir, transcripts_metrics_stage, transcripts_metrics_keys[i_transcripts],
+                                   args.resume, logger)
+    if transcripts_metrics is None:
+        with UtilsProfile.profile_stage(transcripts_metrics_stage, transcripts=len(transcripts_dicts[i_transcripts])):
+            transcripts_metrics = \
+                get_one_transcripts_file_metrics(i_transcripts, threads, args, transcripts_dicts, reference_dict,
+                                                 genes_model, sorted_exons_attr, db_genes_metrics, reads_coverage,
+                                                 isoforms_blast_db, type_organism, tmp_dir, log_dir,
+                                                 WELL_FULLY_COVERAGE_THRESHOLDS, ALIGNMENT_THRESHOLDS)
+        UtilsCheckpoint.save_stage(checkpoints_dir, transcripts_metrics_stage, transcripts_metrics_keys[i_transcripts],
+                                   transcripts_metrics, [], logger)
+
+    # GET SEPARATED REPORT:
+    with UtilsProfile.profile_stage('separated_report.{}'.format(args.labels[i_transcripts])):
+        separated_report = SeparatedReport.SeparatedReport(args.labels[i_transcripts], args.output_dir,
+                                                           transcripts_metrics, WELL_FULLY_COVERAGE_THRESHOLDS)
+        separated_report.get_separated_report\
+            (args, args.labels[i_transcripts], transcripts_dicts[i_transcripts], transcripts_metrics,
+             db_genes_metrics, reads_coverage, logger, WELL_FULLY_COVERAGE_THRESHOLDS, PRECISION,
+             rqconfig.TRANSCRIPT_LENS)
+
+    return transcripts_metrics, separated_report
+
+
+def get_one_transcripts_file_metrics(i_transcripts, threads, args, transcripts_dicts, reference_dict, genes_model,
+                                     sorted_exons_attr, db_genes_metrics, reads_coverage, isoforms_blast_db,
+                                     type_organism, tmp_dir, log_dir, WELL_FULLY_COVERAGE_THRESHOLDS,
+                                     ALIGNMENT_THRESHOLDS):
+    # INITIALIZE TRANSCRIPTS METRICS:
+    transcripts_metrics = TranscriptsMetrics.TranscriptsMetrics(args, args.labels[i_transcripts])
+    assembly_completeness_metrics = transcripts_metrics.assembly_completeness_metrics
+
+    # STAGES OF ASSEMBLY PROCESSING, BUSCO AND GeneMarkS-T DEPEND ONLY ON TRANSCRIPTS AND RUN CONCURRENTLY WITH
+    # ALIGNMENTS PROCESSING:
+    stages = []
+
+    blastn_stage = None
+    if args.blast:
+        blastn_stage = parallel_stages_run.Stage(
+            'blastn', lambda stage_threads:
+            UtilsTools.align_transcripts_to_isoforms_by_blastn(args.transcripts[i_transcripts], isoforms_blast_db,
+                                                               tmp_dir, args.labels[i_transcripts], logger, log_dir,
+                                                               stage_threads))
+        stages.append(blastn_stage)
+
+    if transcripts_metrics.simple_metrics is not None:
+        stages.append(parallel_stages_run.Stage(
+            'alignments processing', lambda stage_threads:
+            process_transcripts_alignments(i_transcripts, args, transcripts_metrics,
+                                           blastn_stage.result if blastn_stage is not None else None,
+                                           transcripts_dicts, genes_model, sorted_exons_attr, tmp_dir,
+                                           WELL_FULLY_COVERAGE_THRESHOLDS, ALIGNMENT_THRESHOLDS),
+            ['blastn'] if blastn_stage is not None else [], max_threads=1))
+
+    if AssemblyCompletenessMetrics.AssemblyCompletenessMetrics.is_busco_run(args):
+        stages.append(parallel_stages_run.Stage(
+            'BUSCO', lambda stage_threads:
+            assembly_completeness_metrics.get_busco_metrics(args, args.transcripts[i_transcripts], tmp_dir,
+                                                            args.labels[i_transcripts], stage_threads, logger, log_dir)))
+
+    if AssemblyCompletenessMetrics.AssemblyCompletenessMetrics.is_GeneMarkS_T_run(args):
+        stages.append(parallel_stages_run.Stage(
+            'GeneMarkS-T', lambda stage_threads:
+            assembly_completeness_metrics.get_GeneMarkS_T_metrics(args, args.transcripts[i_transcripts], type_organism,
+                                                                  tmp_dir, args.labels[i_transcripts], stage_threads,
+                                                                  logger, log_dir)))
+
+    parallel_stages_run.parallel_stages_run(stages, threads, logger)
+
+    # GET METRICS:
+    transcripts_metrics.get_transcripts_metrics\
+        (args, type_organism, reference_dict, args.transcripts[i_transcripts], transcripts_dicts[i_transcripts],
+         args.labels[i_transcripts], threads, genes_model, db_genes_metrics, reads_coverage, logger,
+         tmp_dir, log_dir, WELL_FULLY_COVERAGE_THRESHOLDS, rqconfig.TRANSCRIPT_LENS)
+
+    return transcripts_metrics
+
+
+def process_transcripts_alignments(i_transcripts, args, transcripts_metrics, blast_alignment, transcripts_dicts,
+                                   genes_model, sorted_exons_attr, tmp_dir, WELL_FULLY_COVERAGE_THRESHOLDS,
+                                   ALIGNMENT_THRESHOLDS):
+    # GET FILES WITH ALIGNMENTS REPORTS:
+    alignments_report = \
+        UtilsAlignment.AlignmentsReport.get_alignments_report\
+            (args.labels[i_transcripts], args.alignment[i_transcripts], blast_alignment,
+             transcripts_dicts[i_transcripts], tmp_dir, args.min_alignment, logger, ALIGNMENT_THRESHOLDS)
+
+    # UPDATE METRICS BY ASSEMBLED AND MISASSEMBLED BY BLAT TRANSCRIPTS IN SINGLE PASS OVER ALIGNMENTS:
+    transcripts_metrics.processing_psl_alignments\
+        (alignments_report.blat_report.psl_alignments, sorted_exons_attr, args.strand_specific, logger,
+         genes_model, WELL_FULLY_COVERAGE_THRESHOLDS)
+
+    # UPDATE METRICS BY MISASSEMBLED TRANSCRIPTS:
+    # by blast:
+    if args.blast:
+        transcripts_metrics.processing_misassembled_psl_file\
+            (alignments_report.blast6_report.misassembled_blast6_union_file, logger, False)
+
+
 def main_utils():
     program_name = sys.argv[0][:sys.argv[0].rfind('.')]
 
@@ -56,10 +174,18 @@ def main_utils():
 
     # create output directory:
     args.output_dir = UtilsPipeline.create_output_folder(args.output_dir, program_name)
-    # create temporary directory:
-    tmp_dir = UtilsPipeline.create_empty_folder(os.path.join(args.output_dir, 'tmp'))
-    # create directory for log files:
-    log_dir = UtilsPipeline.create_empty_folder(os.path.join(args.output_dir, 'logs'))
+    # create temporary directory and directory for log files, resumed run keeps them:
+    if args.resume:
+        tmp_dir = UtilsPipeline.create_folder(os.path.join(args.output_dir, 'tmp'))
+        log_dir = UtilsPipeline.create_folder(os.path.join(args.output_dir, 'logs'))
+    else:
+        tmp_dir = UtilsPipeline.create_empty_folder(os.path.join(args.output_dir, 'tmp'))
+        log_dir = UtilsPipeline.create_empty_folder(os.path.join(args.output_dir, 'logs'))
+    # create directory for checkpoints of completed stages, it is removed with temporary directory:
+    checkpoints_dir = UtilsPipeline.create_folder(os.path.join(tmp_dir, 'checkpoints'))
+    # create directory for cached gene databases and indexes shared between runs:
+    if args.cache_dir is not None:
+        UtilsPipeline.create_folder(args.cache_dir)
 
     # SET LOGGER:
     if args.debug:
@@ -79,6 +205,12 @@ def main_utils():
     if args.meta:
         logger.info('\nYOU RUN QUALITY ASSESSMENT FOR METATRANSCRIPTOME ASSEMBLIES')
 
+    # fingerprints of input data and options for checkpoints of stages:
+    reference_stamps = UtilsCheckpoint.get_files_stamps(args.reference)
+    annotation_inputs = (reference_stamps, UtilsCheckpoint.get_files_stamps(args.gtf),
+                         UtilsCheckpoint.get_files_stamps(args.gene_db), args.meta, args.prokaryote,
+                         args.disable_infer_genes, args.disable_infer_transcripts, args.strand_specific)
+
     # GET segregate FILES:
     if args.reference and args.gtf and len(args.reference) != len(args.gtf):
         logger.error('Numbers of references and gene databases are different', exit_with_code=1)
@@ -95,7 +227,11 @@ def main_utils():
     if args.reference is not None:
         logger.print_timestamp()
         logger.info('Getting reference...')
-        reference_dict = UtilsGeneral.list_to_dict(fastaparser.read_fasta(args.reference))
+        # sequences are read on demand from memory-mapped reference, only its index is kept in memory:
+        with UtilsProfile.profile_stage('reference'):
+            reference_dict = IndexedReference.IndexedReference.get_indexed_reference(args.reference, tmp_dir, logger)
+            if reference_dict is None:
+                reference_dict = UtilsGeneral.list_to_dict(fastaparser.read_fasta(args.reference))
         logger.info('Done.')
 
         genome_len = UtilsGeneral.get_genome_len(reference_dict)
@@ -117,6 +253,7 @@ def main_utils():
 
     # USE ANNOTATION:
     sqlite3_db_genes = None
+    genes_model = None
     sorted_exons_attr = None
     db_genes_metrics = None
     type_genes, type_isoforms, type_exons = \
@@ -135,50 +272,104 @@ def main_utils():
             if ids_chrs is not None:
                 args.gtf = UtilsAnnotations.clear_gtf_by_reference_chr(args.gtf, ids_chrs, tmp_dir, label_db, logger)
 
-        sqlite3_db_genes = \
-            UtilsAnnotations.create_sqlite3_db(args.gene_db, args.gtf, label_db,
-                                               args.disable_infer_genes, args.disable_infer_transcripts,
-                                               args.output_dir, tmp_dir, logger)
-
-        type_genes, type_isoforms, type_exons = \
-            UtilsAnnotations.get_type_features(sqlite3_db_genes, UtilsAnnotations.default_type_genes,
-                                               UtilsAnnotations.default_type_isoforms,
-                                               UtilsAnnotations.default_type_exons, args.prokaryote, logger)
+        # content hash of annotation to reuse database and derived structures from cache directory:
+        annotation_key = None
+        if args.cache_dir is not None:
+            annotation_key = UtilsCache.get_annotation_key(args.gene_db, args.gtf, args.disable_infer_genes,
+                                                           args.disable_infer_transcripts, logger)
+
+        with UtilsProfile.profile_stage('gene_database_file'):
+            sqlite3_db_genes = \
+                UtilsAnnotations.create_sqlite3_db(args.gene_db, args.gtf, label_db,
+                                                   args.disable_infer_genes, args.disable_infer_transcripts,
+                                                   args.output_dir, tmp_dir, logger, args.cache_dir, annotation_key)
+
+        # STRUCTURES DERIVED FROM GENE DATABASE COMPLETED IN PREVIOUS RUN:
+        gene_database_key = UtilsCheckpoint.get_stage_key('gene_database', annotation_inputs)
+        gene_database = \
+            UtilsCheckpoint.load_stage(checkpoints_dir, 'gene_database', gene_database_key, args.resume, logger)
+        if gene_database is not None:
+            type_features, db_genes_metrics, genes_model, sorted_exons_attr = gene_database
+            type_genes, type_isoforms, type_exons = type_features
+        else:
+            type_features_cache_path = \
+                UtilsCache.get_cache_path(args.cache_dir, annotation_key, 'type_features.{}.pkl'.format(args.prokaryote))
+            type_features = UtilsCache.load_object(type_features_cache_path, logger)
+            if type_features is None:
+                type_features = \
+                    UtilsAnnotations.get_type_features(sqlite3_db_genes, UtilsAnnotations.default_type_genes,
+                                                       UtilsAnnotations.default_type_isoforms,
+                                                       UtilsAnnotations.default_type_exons, args.prokaryote, logger)
+                UtilsCache.save_object(type_features, type_features_cache_path, logger)
+            type_genes, type_isoforms, type_exons = type_features
+
+            db_genes_metrics_cache_path = \
+                UtilsCache.get_cache_path(args.cache_dir, annotation_key, 'GeneDatabaseMetrics.{}.pkl'.format(args.prokaryote))
+            db_genes_metrics = UtilsCache.load_object(db_genes_metrics_cache_path, logger)
+            if db_genes_metrics is None:
+                with UtilsProfile.profile_stage('gene_database_metrics'):
+                    db_genes_metrics = GeneDatabaseMetrics.GeneDatabaseMetrics(sqlite3_db_genes, type_genes, type_isoforms, logger, args.prokaryote)
+                UtilsCache.save_object(db_genes_metrics, db_genes_metrics_cache_path, logger)
+
+            # load genes, isoforms and exons to memory once instead of querying database for each alignment:
+            genes_model_cache_path = \
+                UtilsCache.get_cache_path(args.cache_dir, annotation_key, 'GeneDatabaseModel.{}.pkl'.format(args.prokaryote))
+            genes_model = UtilsCache.load_object(genes_model_cache_path, logger)
+            if genes_model is None:
+                with UtilsProfile.profile_stage('gene_database_model'):
+                    genes_model = GeneDatabaseModel.GeneDatabaseModel(sqlite3_db_genes, type_genes, type_isoforms, type_exons, logger)
+                UtilsCache.save_object(genes_model, genes_model_cache_path, logger)
+
+            # set exons starts / ends and ids for binning strategy:
+            if ids_chrs is not None:
+                # sorted exons depend on strands and on chromosomes / scaffolds of reference:
+                sorted_exons_key = \
+                    UtilsCache.get_cache_key(annotation_key, args.prokaryote, [str(strand) for strand in strands],
+                                             sorted((id_chr, len(reference_dict[id_chr])) for id_chr in ids_chrs))
+                sorted_exons_cache_path = \
+                    UtilsCache.get_cache_path(args.cache_dir, annotation_key, 'SortedExonsAttributes.{}.pkl'.format(sorted_exons_key))
+                sorted_exons_attr = UtilsCache.load_object(sorted_exons_cache_path, logger)
+                if sorted_exons_attr is None:
+                    with UtilsProfile.profile_stage('sorted_exons'):
+                        sorted_exons_attr = \
+                            SortedExonsAttributes.SortedExonsAttributes(genes_model, type_exons, strands, ids_chrs, reference_dict, logger)
+                    UtilsCache.save_object(sorted_exons_attr, sorted_exons_cache_path, logger)
+
+            UtilsCheckpoint.save_stage(checkpoints_dir, 'gene_database', gene_database_key,
+                                       (type_features, db_genes_metrics, genes_model, sorted_exons_attr), [], logger)
 
         # if UtilsAnnotations.default_type_exons == type_exons:
         #     type_organism = 'eukaryotes'
         # else:
         #     type_organism = 'prokaryotes'
 
-        db_genes_metrics = GeneDatabaseMetrics.GeneDatabaseMetrics(sqlite3_db_genes, type_genes, type_isoforms, logger, args.prokaryote)
-
         ALIGNMENT_THRESHOLDS.ERR_SPACE_TARGET_FAKE_BLAT = db_genes_metrics.max_intron_len + 100
         logger.info('\nSets maximum intron size equal {}. Default is 1500000 bp.\n'.format(ALIGNMENT_THRESHOLDS.ERR_SPACE_TARGET_FAKE_BLAT))
 
-        # set exons starts / ends and ids for binning strategy:
-        if ids_chrs is not None:
-            sorted_exons_attr = \
-                SortedExonsAttributes.SortedExonsAttributes(sqlite3_db_genes, type_exons, strands, ids_chrs, reference_dict, logger)
-
     reads_coverage = None
+    reads_coverage_key = None
     if args.reads_alignment is not None or \
             ((args.single_reads is not None or (args.left_reads is not None and args.right_reads is not None))
              and args.reference is not None and sqlite3_db_genes is not None):
+        reads_coverage_key = \
+            UtilsCheckpoint.get_stage_key('reads_coverage', annotation_inputs,
+                                          UtilsCheckpoint.get_files_stamps([args.reads_alignment, args.single_reads,
+                                                                            args.left_reads, args.right_reads]),
+                                          args.lower_threshold, args.upper_threshold)
         reads_coverage = \
-            ReadsCoverage.ReadsCoverage(args.reads_alignment, args.reference, args.single_reads,
-                                        args.left_reads, args.right_reads, reference_dict, sqlite3_db_genes, type_isoforms,
-                                        sorted_exons_attr, args.strand_specific, db_genes_metrics.tot_isoforms_len,
-                                        genome_len, tmp_dir, args.threads, WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir)
+            UtilsCheckpoint.load_stage(checkpoints_dir, 'reads_coverage', reads_coverage_key, args.resume, logger)
 
 
     if args.transcripts is not None:
         # GET TRANSCRIPTS:
         transcripts_dicts = []
-        for i_transcripts in range(len(args.transcripts)):
-            logger.print_timestamp('  ')
-            logger.info('  Getting transcripts from {}...'.format(args.transcripts[i_transcripts]))
-            transcripts_dicts.append(UtilsGeneral.list_to_dict(fastaparser.read_fasta(args.transcripts[i_transcripts])))
-            logger.info('  Done.')
+        with UtilsProfile.profile_stage('transcripts') as transcripts_profile:
+            for i_transcripts in range(len(args.transcripts)):
+                logger.print_timestamp('  ')
+                logger.info('  Getting transcripts from {}...'.format(args.transcripts[i_transcripts]))
+                transcripts_dicts.append(UtilsGeneral.list_to_dict(fastaparser.read_fasta(args.transcripts[i_transcripts])))
+                transcripts_profile.add_items('transcripts', len(transcripts_dicts[-1]))
+                logger.info('  Done.')
 
         # get labels for folders names and names of transcripts in reports:
         all_labels_from_dirs = False
@@ -188,14 +379,38 @@ def main_utils():
         logger.warning('No transcripts. Use --transcripts option.')
 
 
+    # INDEPENDENT STAGES WITH EXTERNAL TOOLS (STAR, GMAP / BLAT, makeblastdb) RUN CONCURRENTLY:
+    stages = []
+
+    # GET SAM FILE WITH READS ALIGNMENT:
+    if reads_coverage_key is not None and reads_coverage is None and args.reads_alignment is None:
+        stages.append(parallel_stages_run.Stage(
+            'STAR', lambda stage_threads:
+            UtilsTools.get_sam_by_STAR(stage_threads, args.reference, None, args.single_reads, args.left_reads,
+                                       args.right_reads, tmp_dir, None, None, genome_len, logger, log_dir, args.cache_dir)))
+
     # GET PSL ALIGNMENT FILE:
     if args.alignment is None and args.reference is not None and args.transcripts is not None:
-        if args.blat:
-            args.alignment = UtilsTools.run_blat(None, args.reference, transcripts_dicts, args.labels,
-                                                 args.threads, tmp_dir, logger, log_dir)
-        else:
-            args.alignment = UtilsTools.run_gmap(args.reference, genome_len, args.transcripts, args.labels,
-                                                 args.threads, args.gmap_index, tmp_dir, logger, log_dir)
+        transcripts_alignment_key = \
+            UtilsCheckpoint.get_stage_key('transcripts_alignment', reference_stamps, args.meta,
+                                          UtilsCheckpoint.get_files_stamps(args.transcripts), args.labels, args.blat)
+        args.alignment = \
+            UtilsCheckpoint.load_stage(checkpoints_dir, 'transcripts_alignment', transcripts_alignment_key, args.resume,
+                                       logger)
+        if args.alignment is None:
+            def get_transcripts_alignment(stage_threads):
+                if args.blat:
+                    alignment = UtilsTools.run_blat(None, args.reference, transcripts_dicts, args.labels,
+                                                    stage_threads, tmp_dir, logger, log_dir)
+                else:
+                    alignment = UtilsTools.run_gmap(args.reference, genome_len, args.transcripts, args.labels,
+                                                    stage_threads, args.gmap_index, tmp_dir, logger, log_dir,
+                                                    args.cache_dir)
+                UtilsCheckpoint.save_stage(checkpoints_dir, 'transcripts_alignment', transcripts_alignment_key,
+                                           alignment, alignment, logger)
+                return alignment
+
+            stages.append(parallel_stages_run.Stage('transcripts alignment', get_transcripts_alignment))
 
         #if args.fusion_misassemble_analyze:
         #    if not (args.left_reads is not None and args.right_reads is not None):
@@ -207,7 +422,9 @@ def main_utils():
     # FOR MISASSEMBLIES SEARCH:
     # GET DATABASE FOR FA ISOFORMS:
     args.blast = False
-    if args.reference is not None and sqlite3_db_genes is not None and args.alignment is not None:
+    isoforms_blast_db = None
+    if args.reference is not None and sqlite3_db_genes is not None and \
+            (args.alignment is not None or any(stage.name == 'transcripts alignment' for stage in stages)):
         blastn_run = os.path.join(rqconfig.rnaQUAST_LOCATION, '.', 'blastn')
         if not os.path.isfile(blastn_run):
             blastn_run = "blastn"
@@ -217,114 +434,92 @@ def main_utils():
         else:
             args.blast = True
 
-            isoforms_fa_path = os.path.join(tmp_dir, '{}.isoforms.fa'.format(label_db))
-            isoforms_list = UtilsGeneral.dict_to_list(UtilsAnnotations.get_fa_isoforms(sqlite3_db_genes, type_isoforms, type_exons, reference_dict, logger))
-            fastaparser.write_fasta(isoforms_fa_path, sorted(isoforms_list))
-
-            isoforms_blast_db = UtilsTools.get_blast_db(isoforms_fa_path, label_db, tmp_dir, logger, log_dir)
+            isoforms_blast_db_key = UtilsCheckpoint.get_stage_key('isoforms_blast_db', annotation_inputs)
+            isoforms_blast_db = \
+                UtilsCheckpoint.load_stage(checkpoints_dir, 'isoforms_blast_db', isoforms_blast_db_key, args.resume,
+                                           logger)
+            # database of previous run from cache is held as built one:
+            if isoforms_blast_db is not None and args.cache_dir is not None and \
+                    not UtilsCache.hold_cached_path_until_exit(args.cache_dir, isoforms_blast_db):
+                isoforms_blast_db = None
+            if isoforms_blast_db is None:
+                isoforms_fa_path = os.path.join(tmp_dir, '{}.isoforms.fa'.format(label_db))
+                isoforms_list = UtilsGeneral.dict_to_list(UtilsAnnotations.get_fa_isoforms(sqlite3_db_genes, type_isoforms, type_exons, reference_dict, logger))
+                fastaparser.write_fasta(isoforms_fa_path, sorted(isoforms_list))
+
+                def get_isoforms_blast_db(stage_threads):
+                    blast_db = UtilsTools.get_blast_db(isoforms_fa_path, label_db, tmp_dir, logger, log_dir, args.cache_dir)
+                    UtilsCheckpoint.save_stage(checkpoints_dir, 'isoforms_blast_db', isoforms_blast_db_key, blast_db,
+                                               sorted(glob.glob(blast_db + '.*')), logger)
+                    return blast_db
+
+                stages.append(parallel_stages_run.Stage('isoforms blast database', get_isoforms_blast_db, max_threads=1))
+
+    stages_results = parallel_stages_run.parallel_stages_run(stages, args.threads, logger)
+    if 'transcripts alignment' in stages_results:
+        args.alignment = stages_results['transcripts alignment']
+    if 'isoforms blast database' in stages_results:
+        isoforms_blast_db = stages_results['isoforms blast database']
+
+    # GET COVERAGE OF ANNOTATION BY READS:
+    if reads_coverage_key is not None and reads_coverage is None:
+        sam_path = stages_results['STAR'] if 'STAR' in stages_results else args.reads_alignment
+        # STAR failure is reported already:
+        if sam_path is not None:
+            with UtilsProfile.profile_stage('reads_coverage') as reads_coverage_profile:
+                reads_coverage = \
+                    ReadsCoverage.ReadsCoverage(sam_path, args.reference, args.single_reads,
+                                                args.left_reads, args.right_reads, reference_dict, genes_model,
+                                                sorted_exons_attr, args.strand_specific, db_genes_metrics.tot_isoforms_len,
+                                                genome_len, tmp_dir, args.threads, WELL_FULLY_COVERAGE_THRESHOLDS, logger, log_dir,
+                                                args.cache_dir)
+                reads_coverage_profile.add_items('reads_alignments', reads_coverage.reads_coverage.alignments_num)
+            UtilsCheckpoint.save_stage(checkpoints_dir, 'reads_coverage', reads_coverage_key, reads_coverage, [], logger)
 
 
     # LOGGING INPUT DATA:
     logger.print_input_files(args)
 
 
-    # INITIALIZATION TRANSCRIPTS METRICS AND REPORTS:
+    # PROCESS TRANSCRIPTS FILES, IN PARALLEL FOR SEVERAL ASSEMBLIES:
     transcripts_metrics = []
     separated_reports = []
     if args.transcripts is not None:
-        alignments_reports = []
-        blast_alignments = []
+        # metrics of assembly depend on its alignments and on all previous stages:
+        transcripts_metrics_keys = \
+            [UtilsCheckpoint.get_stage_key('transcripts_metrics', annotation_inputs, reads_coverage_key,
+                                           UtilsCheckpoint.get_files_stamps(args.transcripts[i_transcripts]),
+                                           UtilsCheckpoint.get_files_stamps(args.alignment[i_transcripts])
+                                           if args.alignment is not None else None,
+                                           args.labels[i_transcripts], args.min_alignment, args.lower_threshold,
+                                           args.upper_threshold, args.blast, args.busco, args.gene_mark)
+             for i_transcripts in range(len(args.transcripts))]
+
+        shared_args = (args, transcripts_dicts, reference_dict, genes_model, sorted_exons_attr, db_genes_metrics,
+                       reads_coverage, isoforms_blast_db, type_organism, tmp_dir, log_dir,
+                       WELL_FULLY_COVERAGE_THRESHOLDS, ALIGNMENT_THRESHOLDS, checkpoints_dir, transcripts_metrics_keys)
+        assemblies_results = \
+            parallel_assemblies_run.parallel_assemblies_run(process_one_transcripts_file, shared_args,
+                                                            len(args.transcripts), args.threads, logger)
         for i_transcripts in range(len(args.transcripts)):
-            # INITIALIZE TRANSCRIPTS METRICS:
-            #if args.sam_file is not None:
-            #    sam_file_tmp = args.sam_file[i_transcripts]
-            #else:
-            transcripts_metrics.append(
-                TranscriptsMetrics.TranscriptsMetrics(args, args.labels[i_transcripts]))
-
-            # INITIALIZE SEPARATED REPORTS:
-            separated_reports.append(SeparatedReport.SeparatedReport(args.labels[i_transcripts], args.output_dir, transcripts_metrics[i_transcripts], WELL_FULLY_COVERAGE_THRESHOLDS))
-
-            '''from joblib import Parallel, delayed
-
-            n = len(args.transcripts)
-            run_n = n / args.threads
-            for i_run in range(run_n):
-                tmp = Parallel(n_jobs=args.threads)(delayed(process_one_trascripts_file)(args, i_transcripts, reference_dict, annotation_dict,
-                                                                                              annotated_exons, annotated_isoforms, strands, transcripts_metrics,
-                                                                                              basic_isoforms_metrics, separated_reports)
-                                                         for i_transcripts in range(i_run * args.threads, args.threads * (i_run + 1), 1))
-                for i in range(args.threads):
-                    i_transcripts = i + i_run * args.threads
-                    transcripts_metrics[i_transcripts] = tmp[i][0]
-                    separated_reports[i_transcripts] = tmp[i][1]
-
-            if n - run_n * args.threads != 0:
-                tmp = Parallel(n_jobs=n - run_n * args.threads)(delayed(process_one_trascripts_file)(args, i_transcripts, reference_dict, annotation_dict,
-                                                                                                     annotated_exons, annotated_isoforms, strands, transcripts_metrics,
-                                                                                                     basic_isoforms_metrics, separated_reports)
-                                                                for i_transcripts in range(run_n * args.threads, n, 1))
-                for i in range(n - run_n * args.threads):
-                    i_transcripts = i + run_n * args.threads
-                    transcripts_metrics[i_transcripts] = tmp[i][0]
-                    separated_reports[i_transcripts] = tmp[i][1]'''
-
-            logger.info()
-            logger.info('Processing transcripts from {}:'.format(args.transcripts[i_transcripts]))
-
-            if args.blast:
-                blast_alignments.append\
-                    (UtilsTools.align_transcripts_to_isoforms_by_blastn
-                     (args.transcripts[i_transcripts], isoforms_blast_db, tmp_dir, args.labels[i_transcripts], logger, log_dir))
-            else:
-                blast_alignments.append(None)
-
-            # PROCESS TRANSCRIPTS ALIGNMENTS:
-            if transcripts_metrics[i_transcripts].simple_metrics is not None:
-                # GET FILES WITH ALIGNMENTS REPORTS:
-                alignments_reports.append\
-                    (UtilsAlignment.AlignmentsReport.get_alignments_report
-                     (args.labels[i_transcripts], args.alignment[i_transcripts], blast_alignments[i_transcripts],
-                      transcripts_dicts[i_transcripts], tmp_dir, args.min_alignment, logger, ALIGNMENT_THRESHOLDS))
-
-                # UPDATE METRICS BY ASSEMBLED TRANSCRIPTS:
-                transcripts_metrics[i_transcripts].processing_assembled_psl_file\
-                    (alignments_reports[i_transcripts].blat_report.assembled_psl_file, sorted_exons_attr,
-                     args.strand_specific, logger, sqlite3_db_genes, type_isoforms, WELL_FULLY_COVERAGE_THRESHOLDS)
-
-                # UPDATE METRICS BY MISASSEMBLED TRANSCRIPTS:
-                # by blat:
-                transcripts_metrics[i_transcripts].processing_misassembled_psl_file\
-                    (alignments_reports[i_transcripts].blat_report.misassembled_psl_union_file, logger, True)
-                # by blast:
-                if args.blast:
-                    transcripts_metrics[i_transcripts].processing_misassembled_psl_file\
-                        (alignments_reports[i_transcripts].blast6_report.misassembled_blast6_union_file, logger, False)
-
-            # GET METRICS:
-            transcripts_metrics[i_transcripts].get_transcripts_metrics\
-                (args, type_organism, reference_dict, args.transcripts[i_transcripts], transcripts_dicts[i_transcripts],
-                 args.labels[i_transcripts], args.threads, sqlite3_db_genes, db_genes_metrics, reads_coverage, logger,
-                 tmp_dir, log_dir, WELL_FULLY_COVERAGE_THRESHOLDS, rqconfig.TRANSCRIPT_LENS)
-
-            # GET SEPARATED REPORT:
-            separated_reports[i_transcripts].get_separated_report\
-                (args, args.labels[i_transcripts], transcripts_dicts[i_transcripts], transcripts_metrics[i_transcripts],
-                 db_genes_metrics, reads_coverage, logger, WELL_FULLY_COVERAGE_THRESHOLDS, PRECISION, rqconfig.TRANSCRIPT_LENS)
+            transcripts_metrics.append(assemblies_results[i_transcripts][0])
+            separated_reports.append(assemblies_results[i_transcripts][1])
 
     # GET COMPARISON REPORT:
     comparison_report = None
     if len(separated_reports) != 1:
-        comparison_report = ComparisonReport.ComparisonReport()
-        comparison_report.get_comparison_report(args, args.output_dir, args.labels, transcripts_metrics,
-                                                db_genes_metrics, reads_coverage, logger,
-                                                WELL_FULLY_COVERAGE_THRESHOLDS, PRECISION, rqconfig.TRANSCRIPT_LENS)
+        with UtilsProfile.profile_stage('comparison_report'):
+            comparison_report = ComparisonReport.ComparisonReport()
+            comparison_report.get_comparison_report(args, args.output_dir, args.labels, transcripts_metrics,
+                                                    db_genes_metrics, reads_coverage, logger,
+                                                    WELL_FULLY_COVERAGE_THRESHOLDS, PRECISION, rqconfig.TRANSCRIPT_LENS)
 
     # GET SHORT REPORT:
-    short_report = \
-        ShortReport.ShortReport(args, db_genes_metrics, transcripts_metrics, args.output_dir, separated_reports,
-                                comparison_report, logger, WELL_FULLY_COVERAGE_THRESHOLDS, PRECISION,
-                                rqconfig.TRANSCRIPT_LENS)
+    with UtilsProfile.profile_stage('short_report'):
+        short_report = \
+            ShortReport.ShortReport(args, db_genes_metrics, transcripts_metrics, args.output_dir, separated_reports,
+                                    comparison_report, logger, WELL_FULLY_COVERAGE_THRESHOLDS, PRECISION,
+                                    rqconfig.TRANSCRIPT_LENS)
 
     # REMOVE TEMPORARY DIRECTORY FROM OUTPUT DIRECTORY:
     if os.path.exists(tmp_dir) and not args.debug:
@@ -339,6 +534,9 @@ def main_utils():
         UtilsGeneral.profile_memory(args, reference_dict, db_genes_metrics, transcripts_metrics,
                                     separated_reports, comparison_report, logger)
 
+    # SAVE PROFILE OF STAGES AND EXTERNAL TOOLS NEXT TO SHORT REPORT:
+    UtilsProfile.save_profile(args.output_dir, logger)
+
     # FINISH LOGGING:
     logger.finish_up()
 
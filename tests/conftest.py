@@ -0,0 +1,36 @@
+__author__ = 'letovesnoi'
+
+import pytest
+
+
+class Logger():
+    """Class of logger keeping messages and notifications of tests, error exits as logger of rnaQUAST does"""
+
+    def __init__(self):
+        self.messages = []
+        self.notifications = []
+
+    def print_timestamp(self):
+        pass
+
+    def info(self, message=''):
+        self.messages.append(message)
+
+    def warning(self, message=''):
+        self.messages.append(message)
+
+    def debug(self, message=''):
+        pass
+
+    def add_notifications(self, *notifications):
+        self.notifications.append(notifications)
+
+    def error(self, message='', exit_with_code=0, to_stderr=False):
+        self.messages.append(message)
+        if exit_with_code:
+            raise SystemExit(exit_with_code)
+
+
+@pytest.fixture
+def logger():
+    return Logger()
@@ -0,0 +1,69 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from general import UtilsAlignment
+
+from objects import Alignment
+
+
+# update of single transcript lines / alignments by list.remove and list membership before indexing, kept as reference:
+def update_baseline_single_transcript_lines_alignments(union_lines, union_alignments, new_union_lines,
+                                                       new_union_alignments, single_transcript_lines,
+                                                       single_transcript_alignments):
+    for i_alignment in range(len(union_lines)):
+        if union_lines[i_alignment] not in new_union_lines:
+            single_transcript_lines.remove(union_lines[i_alignment])
+            single_transcript_alignments.remove(union_alignments[i_alignment])
+    for i_alignment in range(len(new_union_lines)):
+        if new_union_lines[i_alignment] not in single_transcript_lines:
+            single_transcript_lines.append(new_union_lines[i_alignment])
+            single_transcript_alignments.append(new_union_alignments[i_alignment])
+
+
+def get_alignments(lines):
+    return [Alignment.PSLFileAlignment() for _ in lines]
+
+
+# union is part of single transcript alignments, new union keeps some of them and adds united ones (possibly
+# with lines equal to lines of other single transcript alignments):
+def get_random_union_update(rand):
+    single_transcript_lines = ['line{}'.format(i_line) for i_line in range(rand.randint(1, 30))]
+    single_transcript_alignments = get_alignments(single_transcript_lines)
+
+    union_indexes = rand.sample(range(len(single_transcript_lines)), rand.randint(1, len(single_transcript_lines)))
+    union_lines = [single_transcript_lines[i_line] for i_line in union_indexes]
+    union_alignments = [single_transcript_alignments[i_line] for i_line in union_indexes]
+
+    new_union_lines = []
+    new_union_alignments = []
+    for i_alignment in range(len(union_lines)):
+        if rand.random() < 0.5:
+            new_union_lines.append(union_lines[i_alignment])
+            new_union_alignments.append(union_alignments[i_alignment])
+    for i_line in range(rand.randint(0, 5)):
+        new_union_lines.append(rand.choice(['united{}'.format(i_line)] + single_transcript_lines))
+        new_union_alignments.append(Alignment.PSLFileAlignment())
+
+    return union_lines, union_alignments, new_union_lines, new_union_alignments, \
+        single_transcript_lines, single_transcript_alignments
+
+
+def test_update_as_baseline():
+    rand = random.Random(0)
+    for _ in range(1000):
+        union_lines, union_alignments, new_union_lines, new_union_alignments, single_transcript_lines, \
+            single_transcript_alignments = get_random_union_update(rand)
+
+        lines = single_transcript_lines[:]
+        alignments = single_transcript_alignments[:]
+        UtilsAlignment.update_single_transcript_lines_alignments(union_lines, union_alignments, new_union_lines,
+                                                                 new_union_alignments, lines, alignments)
+
+        update_baseline_single_transcript_lines_alignments(union_lines, union_alignments, new_union_lines,
+                                                           new_union_alignments, single_transcript_lines,
+                                                           single_transcript_alignments)
+
+        assert lines == single_transcript_lines
+        assert len(alignments) == len(single_transcript_alignments) and \
+            all(a is b for a, b in zip(alignments, single_transcript_alignments))
@@ -0,0 +1,113 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from general import rqconfig
+from general import UtilsGeneral
+from general import best_alignment_set
+
+from objects import Alignment
+
+
+ALIGNMENT_THRESHOLDS = rqconfig.alignment_thresholds()
+
+
+# dynamic programming over all previous best sets before back pointers, kept as reference:
+def get_baseline_best_alignment_set(transcript_alignments, ALIGNMENT_THRESHOLDS):
+    best_score = - float('Inf')
+    best_b = None
+
+    q_ends = []
+    for i in range(len(transcript_alignments)):
+        q_ends.append(transcript_alignments[i].query_fragment.end)
+    q_ends_sort_index, q_ends_sort_array = UtilsGeneral.get_order_indexes_elements(q_ends)
+
+    best_list = [[]]
+    scores = {str([]): 0}
+
+    for i in q_ends_sort_index:
+        a_i = transcript_alignments[i]
+        best_i, curr_best_score = get_baseline_best_i(best_list, a_i, scores, ALIGNMENT_THRESHOLDS)
+
+        best_list.append(best_i)
+
+        scores[str(best_i)] = curr_best_score
+
+        if curr_best_score >= best_score:
+            best_b = best_i
+            best_score = curr_best_score
+
+    return best_b
+
+
+def get_baseline_score_b_a_i(b, a_i, scores, ALIGNMENT_THRESHOLDS):
+    if not b:
+        return a_i.score
+
+    b_i = b[-1]
+
+    cross = max(0, b_i.query_fragment.end - a_i.query_fragment.start + 1)
+
+    if cross > ALIGNMENT_THRESHOLDS.ERR_CROSS_QUERY_UNION:
+        return - float('Inf')
+
+    current_union_penalty = ALIGNMENT_THRESHOLDS.UNION_PENALTY
+    if best_alignment_set.is_union_fake_blat(b_i, a_i, ALIGNMENT_THRESHOLDS) and a_i.format == 'psl':
+        current_union_penalty = 0
+
+    return scores[str(b)] + a_i.score - current_union_penalty - cross
+
+
+def get_baseline_best_i(best_list, a_i, scores, ALIGNMENT_THRESHOLDS):
+    best_score = - float('Inf')
+
+    for b in best_list:
+        score_b_a_i = get_baseline_score_b_a_i(b, a_i, scores, ALIGNMENT_THRESHOLDS)
+        if score_b_a_i >= best_score:
+            best_score = score_b_a_i
+            best_i = b + [a_i]
+
+    return best_i, best_score
+
+
+def set_fragment(fragment, name, size, start, end):
+    fragment.name = name
+    fragment.size = size
+    fragment.start = start
+    fragment.end = end
+
+
+# alignments of one transcript with many equal query ends and scores, so ties are broken as in baseline:
+def get_random_alignments(rand, alignments_num):
+    alignments = []
+    for i in range(alignments_num):
+        alignment = Alignment.PSLFileAlignment() if rand.random() < 0.8 else Alignment.BLAST6FileAlignment()
+        alignment.strand = rand.choice('+-')
+
+        q_start = rand.randrange(0, 2000, 10)
+        q_end = q_start + rand.randrange(50, 600, 10)
+        set_fragment(alignment.query_fragment, 'transcript', 3000, q_start, q_end)
+
+        t_start = rand.randrange(0, 3000000, 1000)
+        t_end = t_start + q_end - q_start
+        set_fragment(alignment.target_fragment, rand.choice(['chr1', 'chr2']), 5000000, t_start, t_end)
+
+        alignment.score = rand.choice([q_end - q_start, q_end - q_start - 10, 100])
+
+        alignments.append(alignment)
+    return alignments
+
+
+def is_same_set(alignments_set, baseline_alignments_set):
+    return len(alignments_set) == len(baseline_alignments_set) and \
+        all(a is b for a, b in zip(alignments_set, baseline_alignments_set))
+
+
+def test_best_alignment_set_as_baseline():
+    rand = random.Random(0)
+    for _ in range(1000):
+        alignments = get_random_alignments(rand, rand.randint(1, 30))
+
+        assert is_same_set(best_alignment_set.get_best_alignment_set(alignments, ALIGNMENT_THRESHOLDS),
+                           get_baseline_best_alignment_set(alignments, ALIGNMENT_THRESHOLDS))
+
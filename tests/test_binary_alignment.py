@@ -0,0 +1,82 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from general import rqconfig
+from general import UtilsBinaryAlignment
+
+
+def get_psl_line(rand, q_name):
+    blocks_num = rand.randint(1, 4)
+    blocks_sizes = [rand.randint(1, 300) for _ in range(blocks_num)]
+    q_starts = [rand.randint(0, 100000) for _ in range(blocks_num)]
+    # target positions of large chromosome don't fit int32:
+    t_starts = [rand.randint(0, 1 << 33) for _ in range(blocks_num)]
+    fields = [str(rand.randint(0, 1000)) for _ in range(8)]
+    fields += [rand.choice('+-'), q_name, str(rand.randint(1, 100000)), str(q_starts[0]),
+               str(q_starts[-1] + blocks_sizes[-1]), rand.choice(['chr1', 'chr2', 'chrX']), str(1 << 34),
+               str(t_starts[0]), str(t_starts[-1] + blocks_sizes[-1]), str(blocks_num)]
+    fields += [''.join('{},'.format(value) for value in values) for values in [blocks_sizes, q_starts, t_starts]]
+    return '\t'.join(fields) + '\n'
+
+
+def get_lines(rand, q_names):
+    return [get_psl_line(rand, q_name) for q_name in q_names]
+
+
+def write_lines(path, lines):
+    with open(path, 'w') as out_handle:
+        out_handle.writelines(lines)
+    return str(path)
+
+
+def read_lines(path):
+    with open(path, 'r') as in_handle:
+        return in_handle.readlines()
+
+
+# containers of one and many chunks, the last chunk is partial:
+def test_binary_psl_round_trip(tmp_path, monkeypatch):
+    rand = random.Random(0)
+    lines = get_lines(rand, ['transcript{}'.format(i_q_name // 3) for i_q_name in range(100)])
+    psl_path = write_lines(tmp_path / 'in.psl', lines)
+
+    for chunk_size in [1000, 7]:
+        monkeypatch.setattr(rqconfig, 'BINARY_PSL_CHUNK_SIZE', chunk_size)
+        binary_path = UtilsBinaryAlignment.convert_psl_to_binary(psl_path, str(tmp_path / 'in.bin'))
+        assert UtilsBinaryAlignment.is_binary_psl_file(binary_path)
+        assert not UtilsBinaryAlignment.is_binary_psl_file(psl_path)
+
+        back_psl_path = UtilsBinaryAlignment.convert_binary_to_psl(binary_path, str(tmp_path / 'back.psl'))
+        assert read_lines(back_psl_path) == lines
+
+        psl_alignments = list(UtilsBinaryAlignment.iterate_binary_psl_alignments(binary_path))
+        assert [psl_alignment.get_psl_line_from_alignment() + '\n' for psl_alignment in psl_alignments] == lines
+
+
+def test_empty_binary_psl(tmp_path):
+    psl_path = write_lines(tmp_path / 'in.psl', [])
+    binary_path = UtilsBinaryAlignment.convert_psl_to_binary(psl_path, str(tmp_path / 'in.bin'))
+
+    assert list(UtilsBinaryAlignment.iterate_binary_psl_alignments(binary_path)) == []
+    assert UtilsBinaryAlignment.is_binary_psl_grouped_by_query(binary_path)
+
+
+# runs of query names continue across chunks, so only a name repeated after other names breaks grouping.
+# Names which don't fit in set are not checked, so container is taken for ungrouped:
+def test_binary_psl_grouped_by_query(tmp_path, monkeypatch):
+    monkeypatch.setattr(rqconfig, 'BINARY_PSL_CHUNK_SIZE', 4)
+    set_size = rqconfig.PSL_QUERY_NAMES_SET_SIZE
+    rand = random.Random(1)
+
+    grouped_q_names = ['transcript{}'.format(i_q_name // 5) for i_q_name in range(50)]
+    ungrouped_q_names = grouped_q_names + ['transcript3']
+    for q_names, is_grouped in [(grouped_q_names, True), (ungrouped_q_names, False)]:
+        psl_path = write_lines(tmp_path / 'in.psl', get_lines(rand, q_names))
+        binary_path = UtilsBinaryAlignment.convert_psl_to_binary(psl_path, str(tmp_path / 'in.bin'))
+
+        monkeypatch.setattr(rqconfig, 'PSL_QUERY_NAMES_SET_SIZE', set_size)
+        assert UtilsBinaryAlignment.is_binary_psl_grouped_by_query(binary_path) == is_grouped
+
+        monkeypatch.setattr(rqconfig, 'PSL_QUERY_NAMES_SET_SIZE', 0)
+        assert not UtilsBinaryAlignment.is_binary_psl_grouped_by_query(binary_path)
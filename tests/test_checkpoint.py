@@ -0,0 +1,59 @@
+__author__ = 'letovesnoi'
+
+import os
+
+from general import UtilsCheckpoint
+
+
+def write_file(path, text):
+    with open(path, 'w') as out_handle:
+        out_handle.write(text)
+    return str(path)
+
+
+def test_checkpoint_round_trip(tmp_path, logger):
+    checkpoints_dir = str(tmp_path / 'checkpoints')
+    os.makedirs(checkpoints_dir)
+    input_path = write_file(tmp_path / 'input.fasta', '>chr1\nACGT\n')
+    output_path = write_file(tmp_path / 'output.psl', 'alignments\n')
+
+    stage_key = UtilsCheckpoint.get_stage_key('stage', UtilsCheckpoint.get_files_stamps(input_path), 'option')
+    output = {'metric': [1, 2, 3]}
+    UtilsCheckpoint.save_stage(checkpoints_dir, 'stage', stage_key, output, [output_path], logger)
+
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', stage_key, True, logger) == output
+
+    # without --resume or checkpoints directory stage is recomputed:
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', stage_key, False, logger) is None
+    assert UtilsCheckpoint.load_stage(None, 'stage', stage_key, True, logger) is None
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'other_stage', stage_key, True, logger) is None
+
+
+def test_checkpoint_invalidation(tmp_path, logger):
+    checkpoints_dir = str(tmp_path / 'checkpoints')
+    os.makedirs(checkpoints_dir)
+    input_path = write_file(tmp_path / 'input.fasta', '>chr1\nACGT\n')
+    output_path = write_file(tmp_path / 'output.psl', 'alignments\n')
+
+    stage_key = UtilsCheckpoint.get_stage_key('stage', UtilsCheckpoint.get_files_stamps(input_path), 'option')
+    UtilsCheckpoint.save_stage(checkpoints_dir, 'stage', stage_key, 'output', [output_path], logger)
+
+    # changed option or input file changes key of stage:
+    assert UtilsCheckpoint.get_stage_key('stage', UtilsCheckpoint.get_files_stamps(input_path), 'option') == stage_key
+    changed_option_key = \
+        UtilsCheckpoint.get_stage_key('stage', UtilsCheckpoint.get_files_stamps(input_path), 'other_option')
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', changed_option_key, True, logger) is None
+
+    write_file(input_path, '>chr1\nACGTACGT\n')
+    changed_input_key = UtilsCheckpoint.get_stage_key('stage', UtilsCheckpoint.get_files_stamps(input_path), 'option')
+    assert changed_input_key != stage_key
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', changed_input_key, True, logger) is None
+
+    # changed or removed output files of stage (sizes differ, so stamps change within the same second):
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', stage_key, True, logger) == 'output'
+    write_file(output_path, 'other alignments\n')
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', stage_key, True, logger) is None
+
+    UtilsCheckpoint.save_stage(checkpoints_dir, 'stage', stage_key, 'output', [output_path], logger)
+    os.remove(output_path)
+    assert UtilsCheckpoint.load_stage(checkpoints_dir, 'stage', stage_key, True, logger) is None
@@ -0,0 +1,148 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from general import UtilsCoverage
+
+
+# event sweep over starts and ends of exons and blocks before merge pass, kept as reference:
+def get_baseline_coverage_positions(target_ids, target_starts, target_ends, query_ids, query_starts, query_ends):
+    target_cov_pos = {}
+    query_cov_pos = {}
+
+    tmp_stack_i_exons = []
+    tmp_stack_i_blocks = []
+
+    # needs sorted coordinates:
+    dict_coordinates = {}
+    dict_coordinates['blocks_starts'] = query_starts
+    dict_coordinates['blocks_ends'] = query_ends
+
+    dict_coordinates['exons_starts'] = target_starts
+    dict_coordinates['exons_ends'] = target_ends
+
+    i_current = {'blocks_starts': 0, 'blocks_ends': 0, 'exons_starts': 0, 'exons_ends': 0}
+
+    # get count of covered bases:
+    while dict_coordinates != {}:
+        (current, key) = min((dict_coordinates[key0][i_current[key0]], key0) for key0 in dict_coordinates.keys())
+
+        # if start and end are equal, we choose start:
+        if key == 'blocks_ends' and 'blocks_starts' in dict_coordinates and \
+                        dict_coordinates['blocks_ends'][i_current['blocks_ends']] == dict_coordinates['blocks_starts'][i_current['blocks_starts']]:
+                key = 'blocks_starts'
+        elif key == 'blocks_ends' and 'exons_starts' in dict_coordinates and \
+                        dict_coordinates['exons_starts'][i_current['exons_starts']] == dict_coordinates['blocks_ends'][i_current['blocks_ends']]:
+                key = 'exons_starts'
+        elif key == 'exons_ends' and 'exons_starts' in dict_coordinates and \
+                        dict_coordinates['exons_ends'][i_current['exons_ends']] == dict_coordinates['exons_starts'][i_current['exons_starts']]:
+                key = 'exons_starts'
+        elif key == 'exons_ends' and 'blocks_starts' in dict_coordinates and \
+                        dict_coordinates['exons_ends'][i_current['exons_ends']] == dict_coordinates['blocks_starts'][i_current['blocks_starts']]:
+                key = 'blocks_starts'
+
+        if key == 'exons_starts':
+            tmp_stack_i_exons.append(i_current[key])
+
+        elif key == 'blocks_starts':
+            tmp_stack_i_blocks.append(i_current[key])
+
+        elif key == 'exons_ends':
+            for i_block in tmp_stack_i_blocks:
+                start_coverage = max(query_starts[i_block], target_starts[i_current[key]])
+                end_coverage = min(query_ends[i_block], target_ends[i_current[key]])
+
+                if target_ids[i_current[key]] not in target_cov_pos:
+                    target_cov_pos[target_ids[i_current[key]]] = []
+                target_cov_pos[target_ids[i_current[key]]].append((start_coverage - target_starts[i_current[key]],
+                                                                   end_coverage - target_starts[i_current[key]]))
+
+                if query_ids[i_block] not in query_cov_pos:
+                    query_cov_pos[query_ids[i_block]] = []
+                query_cov_pos[query_ids[i_block]].append((start_coverage - query_starts[query_ids[i_block]],
+                                                          end_coverage - query_starts[query_ids[i_block]]))
+            if i_current[key] in tmp_stack_i_exons:
+                tmp_stack_i_exons.remove(i_current[key])
+
+        elif key == 'blocks_ends':
+            for i_exon in tmp_stack_i_exons:
+                start_coverage = max(query_starts[i_current[key]], target_starts[i_exon])
+                end_coverage = min(query_ends[i_current[key]], target_ends[i_exon])
+
+                if target_ids[i_exon] not in target_cov_pos:
+                    target_cov_pos[target_ids[i_exon]] = []
+                target_cov_pos[target_ids[i_exon]].append((start_coverage - target_starts[i_exon],
+                                                           end_coverage - target_starts[i_exon]))
+
+                if query_ids[i_current[key]] not in query_cov_pos:
+                    query_cov_pos[query_ids[i_current[key]]] = []
+                query_cov_pos[query_ids[i_current[key]]].append((start_coverage - query_starts[query_ids[i_current[key]]],
+                                                                 end_coverage - query_starts[query_ids[i_current[key]]]))
+            if i_current[key] in tmp_stack_i_blocks:
+                tmp_stack_i_blocks.remove(i_current[key])
+        if i_current[key] == len(dict_coordinates[key]) - 1:
+            del dict_coordinates[key]
+        else:
+            i_current[key] += 1
+
+    return target_cov_pos, query_cov_pos
+
+
+# sorted intervals of 0-based inclusive coordinates, which overlap each other or not, touching intervals are frequent:
+def get_random_intervals(rand, intervals_num, is_overlapping):
+    starts = []
+    ends = []
+    position = rand.randint(0, 20)
+    for _ in range(intervals_num):
+        start = position + rand.randint(0, 10)
+        end = start + rand.randint(0, 15)
+        starts.append(start)
+        ends.append(end)
+        position = start if is_overlapping else end + 1
+    return starts, ends
+
+
+def test_coverage_positions_as_baseline():
+    rand = random.Random(0)
+    for _ in range(3000):
+        exons_starts, exons_ends = get_random_intervals(rand, rand.randint(1, 12), False)
+        blocks_starts, blocks_ends = get_random_intervals(rand, rand.randint(1, 12), False)
+        exons_ids = ['exon{}'.format(i_exon) for i_exon in range(len(exons_starts))]
+
+        assert UtilsCoverage.get_coverage_positions(exons_ids, exons_starts, exons_ends, range(len(blocks_starts)),
+                                                    blocks_starts, blocks_ends) == \
+            get_baseline_coverage_positions(exons_ids, exons_starts, exons_ends, range(len(blocks_starts)),
+                                            blocks_starts, blocks_ends)
+
+
+def get_brute_force_coverage_positions(exons_ids, exons_starts, exons_ends, blocks_starts, blocks_ends):
+    target_cov_pos = {}
+    query_cov_pos = {}
+    for i_exon in range(len(exons_starts)):
+        for i_block in range(len(blocks_starts)):
+            start_coverage = max(exons_starts[i_exon], blocks_starts[i_block])
+            end_coverage = min(exons_ends[i_exon], blocks_ends[i_block])
+            if start_coverage <= end_coverage:
+                target_cov_pos.setdefault(exons_ids[i_exon], []).append((start_coverage - exons_starts[i_exon],
+                                                                         end_coverage - exons_starts[i_exon]))
+                query_cov_pos.setdefault(i_block, []).append((start_coverage - blocks_starts[i_block],
+                                                              end_coverage - blocks_starts[i_block]))
+    return target_cov_pos, query_cov_pos
+
+
+# exons of different isoforms overlap, so ends of exons aren't sorted and event sweep can't be used as reference:
+def test_coverage_positions_of_overlapping_exons_as_brute_force():
+    rand = random.Random(1)
+    for _ in range(3000):
+        exons_starts, exons_ends = get_random_intervals(rand, rand.randint(1, 12), True)
+        blocks_starts, blocks_ends = get_random_intervals(rand, rand.randint(1, 12), False)
+        exons_ids = ['exon{}'.format(i_exon) for i_exon in range(len(exons_starts))]
+
+        target_cov_pos, query_cov_pos = \
+            UtilsCoverage.get_coverage_positions(exons_ids, exons_starts, exons_ends, range(len(blocks_starts)),
+                                                 blocks_starts, blocks_ends)
+        brute_force_target_cov_pos, brute_force_query_cov_pos = \
+            get_brute_force_coverage_positions(exons_ids, exons_starts, exons_ends, blocks_starts, blocks_ends)
+        assert target_cov_pos == brute_force_target_cov_pos
+        assert dict((i_block, sorted(positions)) for i_block, positions in query_cov_pos.items()) == \
+            dict((i_block, sorted(positions)) for i_block, positions in brute_force_query_cov_pos.items())
@@ -0,0 +1,82 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from general import rqconfig
+
+from objects import DifferenceCoverage
+
+
+# exons of isoforms with their lengths and covered intervals of alignments in order of alignments:
+def get_random_intervals(rand, isoforms_num, intervals_num):
+    lens_exons = {}
+    for i_isoform in range(isoforms_num):
+        for i_exon in range(rand.randint(1, 4)):
+            lens_exons[('isoform{}'.format(i_isoform), 'exon{}'.format(i_exon))] = rand.randint(1, 50)
+
+    exons = sorted(lens_exons)
+    intervals = []
+    for _ in range(intervals_num):
+        id_isoform, id_exon = rand.choice(exons)
+        len_exon = lens_exons[(id_isoform, id_exon)]
+        start = rand.randrange(len_exon)
+        end = rand.randrange(start, len_exon)
+        intervals.append((id_isoform, id_exon, len_exon, start, end))
+    return intervals
+
+
+def get_difference_coverage(intervals):
+    coverage = DifferenceCoverage.DifferenceCoverage()
+    for id_isoform, id_exon, len_exon, start, end in intervals:
+        coverage.add_exon_intervals(id_isoform, id_exon, len_exon, [(start, end)])
+        coverage.alignments_num += 1
+    return coverage
+
+
+def get_per_base_coverage(intervals):
+    per_base_coverage = {}
+    for id_isoform, id_exon, len_exon, start, end in intervals:
+        bases = per_base_coverage.setdefault((id_isoform, id_exon), [0] * len_exon)
+        for i_base in range(start, end + 1):
+            bases[i_base] += 1
+    return per_base_coverage
+
+
+def is_as_per_base(coverage, per_base_coverage):
+    coverage.get_coverage()
+    for (id_isoform, id_exon), bases in per_base_coverage.items():
+        if coverage.get_len_exon(id_isoform, id_exon) != len(bases) or \
+                coverage.get_covered_bases_exon(id_isoform, id_exon) != sum(1 for base in bases if base > 0) or \
+                coverage.get_sum_coverage_exon(id_isoform, id_exon) != sum(bases):
+            return False
+    return sum(len(coverage.slots[id_isoform]) for id_isoform in coverage.slots) == len(per_base_coverage)
+
+
+# small buffer of events, so difference array is resized and flushed many times:
+def test_coverage_as_per_base(monkeypatch):
+    monkeypatch.setattr(rqconfig, 'COVERAGE_EVENTS_BUFFER_LEN', 7)
+    rand = random.Random(0)
+    for _ in range(50):
+        intervals = get_random_intervals(rand, rand.randint(1, 10), rand.randint(0, 200))
+
+        assert is_as_per_base(get_difference_coverage(intervals), get_per_base_coverage(intervals))
+
+
+# shards of alignments merged in order give the same slots and coverage as all alignments at once:
+def test_merged_shards_as_per_base(monkeypatch):
+    monkeypatch.setattr(rqconfig, 'COVERAGE_EVENTS_BUFFER_LEN', 7)
+    rand = random.Random(1)
+    for _ in range(50):
+        intervals = get_random_intervals(rand, rand.randint(1, 10), rand.randint(0, 200))
+        bounds = sorted(rand.randint(0, len(intervals)) for _ in range(rand.randint(0, 4)))
+        bounds = [0] + bounds + [len(intervals)]
+
+        coverage = DifferenceCoverage.DifferenceCoverage()
+        for i_shard in range(len(bounds) - 1):
+            coverage.add_coverage(get_difference_coverage(intervals[bounds[i_shard]:bounds[i_shard + 1]]))
+
+        whole_coverage = get_difference_coverage(intervals)
+        assert coverage.slots == whole_coverage.slots
+        assert list(coverage.slots_offsets) == list(whole_coverage.slots_offsets)
+        assert coverage.alignments_num == len(intervals)
+        assert is_as_per_base(coverage, get_per_base_coverage(intervals))
@@ -0,0 +1,43 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from objects import ExonsIntervalIndex
+
+
+def get_random_exons(rand, exons_num, max_start, max_len):
+    exons = []
+    for i_exon in range(exons_num):
+        start = rand.randint(0, max_start)
+        exons.append((start, start + rand.randint(0, max_len), 'exon{}'.format(i_exon)))
+    exons.sort(key=lambda exon: exon[0])
+    return exons
+
+
+def get_brute_force_overlapping_ids(exons, start, end):
+    return [id_exon for exon_start, exon_end, id_exon in exons if exon_start <= end and exon_end >= start]
+
+
+# sizes around powers of two, so last subtrees of implicit tree are incomplete:
+def test_overlapping_ids_as_brute_force():
+    rand = random.Random(0)
+    for exons_num in list(range(0, 40)) + [63, 64, 65, 127, 128, 129, 500]:
+        for max_len in [0, 10, 1000]:
+            exons = get_random_exons(rand, exons_num, 2000, max_len)
+            exons_index = ExonsIntervalIndex.ExonsIntervalIndex([exon[0] for exon in exons], [exon[1] for exon in exons],
+                                                                [exon[2] for exon in exons])
+
+            for _ in range(50):
+                start = rand.randint(-10, 3100)
+                end = start + rand.randint(0, 300)
+                assert exons_index.get_overlapping_ids(start, end) == \
+                    get_brute_force_overlapping_ids(exons, start, end)
+
+
+# bounds are inclusive, exons touching query by one base are reported:
+def test_overlapping_bounds():
+    exons_index = ExonsIntervalIndex.ExonsIntervalIndex([0, 10, 20], [9, 19, 29], ['exon0', 'exon1', 'exon2'])
+
+    assert exons_index.get_overlapping_ids(9, 10) == ['exon0', 'exon1']
+    assert exons_index.get_overlapping_ids(19, 19) == ['exon1']
+    assert exons_index.get_overlapping_ids(30, 40) == []
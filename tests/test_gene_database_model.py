@@ -0,0 +1,113 @@
+__author__ = 'letovesnoi'
+
+from general import UtilsAnnotations
+
+from objects import GeneDatabaseModel
+
+
+# gene A has two isoforms sharing two exons, exons of A2 and B1 are not sorted by start (ids of exons of A2 are not
+# sorted by start as strings too), C1 has no gene and D1 has no exons (as isoforms of prokaryotes):
+GTF_LINES = [
+    ['chr1', 'gene', 100, 1200, '+', 'gene_id "A";'],
+    ['chr1', 'transcript', 100, 1000, '+', 'gene_id "A"; transcript_id "A1";'],
+    ['chr1', 'exon', 100, 200, '+', 'gene_id "A"; transcript_id "A1";'],
+    ['chr1', 'exon', 500, 600, '+', 'gene_id "A"; transcript_id "A1";'],
+    ['chr1', 'exon', 900, 1000, '+', 'gene_id "A"; transcript_id "A1";'],
+    ['chr1', 'transcript', 100, 1200, '+', 'gene_id "A"; transcript_id "A2";'],
+    ['chr1', 'exon', 900, 1000, '+', 'gene_id "A"; transcript_id "A2";'],
+    ['chr1', 'exon', 100, 200, '+', 'gene_id "A"; transcript_id "A2";'],
+    ['chr1', 'exon', 1100, 1200, '+', 'gene_id "A"; transcript_id "A2";'],
+    ['chr2', 'gene', 50, 900, '-', 'gene_id "B";'],
+    ['chr2', 'transcript', 50, 900, '-', 'gene_id "B"; transcript_id "B1";'],
+    ['chr2', 'exon', 800, 900, '-', 'gene_id "B"; transcript_id "B1";'],
+    ['chr2', 'exon', 50, 150, '-', 'gene_id "B"; transcript_id "B1";'],
+    ['chr2', 'transcript', 300, 400, '+', 'gene_id "C"; transcript_id "C1";'],
+    ['chr2', 'exon', 300, 400, '+', 'gene_id "C"; transcript_id "C1";'],
+    ['chr2', 'transcript', 2000, 2500, '+', 'gene_id "D"; transcript_id "D1";']]
+
+
+def get_sqlite3_db_genes(tmp_path, logger):
+    gtf_path = str(tmp_path / 'genes.gtf')
+    with open(gtf_path, 'w') as out_handle:
+        for seqid, featuretype, start, end, strand, attributes in GTF_LINES:
+            out_handle.write('\t'.join([seqid, 'test', featuretype, str(start), str(end), '.', strand, '.', attributes]) + '\n')
+
+    # genes and transcripts are not inferred, so C1 stays without gene and D1 without exons:
+    sqlite3_db_path = UtilsAnnotations.create_sqlite2_db_in_file(gtf_path, True, True, str(tmp_path / 'genes.db'),
+                                                                 str(tmp_path / 'genes.tmp.db'), logger)
+
+    return UtilsAnnotations.load_sqlite3_db(sqlite3_db_path, logger)
+
+
+def get_genes_model(tmp_path, logger):
+    sqlite3_db_genes = get_sqlite3_db_genes(tmp_path, logger)
+    type_genes, type_isoforms, type_exons = \
+        UtilsAnnotations.get_type_features(sqlite3_db_genes, UtilsAnnotations.default_type_genes,
+                                           UtilsAnnotations.default_type_isoforms,
+                                           UtilsAnnotations.default_type_exons, False, logger)
+    genes_model = GeneDatabaseModel.GeneDatabaseModel(sqlite3_db_genes, type_genes, type_isoforms, type_exons, logger)
+
+    return sqlite3_db_genes, type_isoforms, genes_model
+
+
+def get_coordinates(feature):
+    return feature.id, feature.seqid, feature.featuretype, feature.start, feature.end, feature.strand
+
+
+# the same queries as gffutils FeatureDB was asked before the model:
+def get_db_children_exons(sqlite3_db_genes, id_isoform):
+    children_exons = list(sqlite3_db_genes.children(id_isoform, featuretype=UtilsAnnotations.default_type_exons, order_by='start'))
+    # for prokaryotes:
+    if len(children_exons) == 0:
+        children_exons = [sqlite3_db_genes[id_isoform]]
+    return children_exons
+
+
+def get_db_parent_gene_id(sqlite3_db_genes, id_isoform):
+    parent_genes = list(sqlite3_db_genes.parents(id_isoform, featuretype=UtilsAnnotations.default_type_genes))
+    if parent_genes == []:
+        return id_isoform
+    return parent_genes[0].id
+
+
+def test_features_as_gene_database(tmp_path, logger):
+    sqlite3_db_genes, type_isoforms, genes_model = get_genes_model(tmp_path, logger)
+
+    db_features = list(sqlite3_db_genes.all_features())
+    assert len(genes_model.features) == len(db_features)
+    for db_feature in db_features:
+        assert db_feature.id in genes_model
+        assert get_coordinates(genes_model[db_feature.id]) == get_coordinates(db_feature)
+        assert len(genes_model[db_feature.id]) == len(db_feature)
+
+    assert 'A3_transcript' not in genes_model
+
+
+def test_children_exons_as_gene_database(tmp_path, logger):
+    sqlite3_db_genes, type_isoforms, genes_model = get_genes_model(tmp_path, logger)
+
+    for isoform in sqlite3_db_genes.features_of_type(type_isoforms):
+        assert [get_coordinates(exon) for exon in genes_model.get_children_exons(isoform.id)] == \
+            [get_coordinates(exon) for exon in get_db_children_exons(sqlite3_db_genes, isoform.id)]
+
+    # exons are sorted by start and isoform without exons is its own exon:
+    assert [exon.start for exon in genes_model.get_children_exons('A2_transcript')] == [100, 900, 1100]
+    assert [exon.start for exon in genes_model.get_children_exons('B1_transcript')] == [50, 800]
+    assert [exon.id for exon in genes_model.get_children_exons('D1_transcript')] == ['D1_transcript']
+
+
+def test_parent_isoforms_and_gene_as_gene_database(tmp_path, logger):
+    sqlite3_db_genes, type_isoforms, genes_model = get_genes_model(tmp_path, logger)
+
+    for exon in sqlite3_db_genes.features_of_type(UtilsAnnotations.default_type_exons):
+        assert sorted(isoform.id for isoform in genes_model.get_parent_isoforms(genes_model[exon.id])) == \
+            sorted(isoform.id for isoform in sqlite3_db_genes.parents(exon.id, featuretype=type_isoforms))
+
+    for isoform in sqlite3_db_genes.features_of_type(type_isoforms):
+        assert genes_model.get_parent_gene_id(isoform.id) == get_db_parent_gene_id(sqlite3_db_genes, isoform.id)
+
+    # shared exon belongs to both isoforms, isoform without gene is its own gene:
+    assert sorted(isoform.id for isoform in genes_model.get_parent_isoforms(genes_model['exon:chr1:100-200:+'])) == \
+        ['A1_transcript', 'A2_transcript']
+    assert genes_model.get_parent_gene_id('A2_transcript') == 'A_gene'
+    assert genes_model.get_parent_gene_id('C1_transcript') == 'C1_transcript'
@@ -0,0 +1,64 @@
+__author__ = 'letovesnoi'
+
+import random
+
+from general import rqconfig
+from general import UtilsAlignment
+
+
+def get_psl_line(q_name, i_alignment):
+    return '\t'.join(['100', '0', '0', '0', '0', '0', '0', '0', '+', q_name, '200', str(i_alignment), '100', 'chr1',
+                      '1000', '0', '100', '1', '100,', '0,', '0,']) + '\n'
+
+
+def get_grouped_lines(q_names_num, alignments_num):
+    return [get_psl_line('transcript{}'.format(i_q_name), i_alignment)
+            for i_q_name in range(q_names_num) for i_alignment in range(alignments_num)]
+
+
+def write_lines(path, lines):
+    with open(path, 'w') as out_handle:
+        out_handle.writelines(lines)
+    return str(path)
+
+
+def test_grouped_psl_is_not_sorted(tmp_path, monkeypatch, logger):
+    # reverse order of names, so sorting changes order:
+    lines = list(reversed(get_grouped_lines(200, 3)))
+    psl_path = write_lines(tmp_path / 'in.psl', lines)
+
+    for buffer_size in [1 << 20, 1000]:
+        monkeypatch.setattr(rqconfig, 'PSL_SORT_BUFFER_SIZE', buffer_size)
+        assert list(UtilsAlignment.iterate_grouped_psl_lines(psl_path, str(tmp_path / 'grouped.psl'), logger)) == lines
+        assert logger.messages == []
+
+
+# names which don't fit in set are not checked, file is sorted:
+def test_grouped_psl_with_many_names_is_sorted(tmp_path, monkeypatch, logger):
+    lines = list(reversed(get_grouped_lines(100, 2)))
+    psl_path = write_lines(tmp_path / 'in.psl', lines)
+
+    monkeypatch.setattr(rqconfig, 'PSL_QUERY_NAMES_SET_SIZE', 100 * (len('transcript00') + rqconfig.PSL_QUERY_NAME_OVERHEAD))
+    assert list(UtilsAlignment.iterate_grouped_psl_lines(psl_path, str(tmp_path / 'grouped.psl'), logger)) == lines
+
+    monkeypatch.setattr(rqconfig, 'PSL_QUERY_NAMES_SET_SIZE', 10 * (len('transcript00') + rqconfig.PSL_QUERY_NAME_OVERHEAD))
+    assert list(UtilsAlignment.iterate_grouped_psl_lines(psl_path, str(tmp_path / 'grouped.psl'), logger)) == \
+        sorted(lines, key=UtilsAlignment.get_psl_query_name)
+
+
+def test_ungrouped_psl_is_sorted_stably(tmp_path, monkeypatch, logger):
+    rand = random.Random(0)
+    lines = get_grouped_lines(300, 4)
+    shuffled_lines = lines[:]
+    rand.shuffle(shuffled_lines)
+    psl_path = write_lines(tmp_path / 'in.psl', shuffled_lines)
+
+    # alignments of each query keep their order in file:
+    expected_lines = sorted(shuffled_lines, key=UtilsAlignment.get_psl_query_name)
+
+    # in memory and with spill files:
+    for buffer_size in [1 << 20, 5000]:
+        monkeypatch.setattr(rqconfig, 'PSL_SORT_BUFFER_SIZE', buffer_size)
+        grouped_lines = list(UtilsAlignment.iterate_grouped_psl_lines(psl_path, str(tmp_path / 'grouped.psl'), logger))
+        assert grouped_lines == expected_lines
+        assert [path.name for path in tmp_path.iterdir() if path.name.endswith('.spill')] == []
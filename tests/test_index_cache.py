@@ -0,0 +1,108 @@
+__author__ = 'letovesnoi'
+
+import os
+import multiprocessing
+
+from general import rqconfig
+from general import UtilsCache
+
+
+class IndexBuilder():
+    """Class of stand-in index builder counting its runs"""
+
+    def __init__(self, index_size, is_built=True):
+        self.index_size = index_size
+        self.is_built = is_built
+        self.runs_num = 0
+
+    def __call__(self, out_dir):
+        self.runs_num += 1
+        with open(os.path.join(out_dir, 'index'), 'wb') as out_handle:
+            out_handle.write(b'0' * self.index_size)
+        return self.is_built
+
+
+# index directory of cached index, which isn't used after that:
+def get_index_dir(cache_dir, tool, index_key, build_index, logger):
+    cached_index = UtilsCache.get_cached_index(cache_dir, tool, index_key, build_index, logger)
+    if cached_index is None:
+        return None
+    cached_index.release()
+    return cached_index.index_dir
+
+
+# other run holds index until it is asked to release it:
+def hold_index(cache_dir, tool, index_key, is_held, is_released, logger):
+    with UtilsCache.get_cached_index(cache_dir, tool, index_key, IndexBuilder(10), logger):
+        is_held.set()
+        is_released.wait(10)
+
+
+def test_index_is_built_once(tmp_path, logger):
+    cache_dir = str(tmp_path)
+    build_index = IndexBuilder(10)
+
+    index_dir = get_index_dir(cache_dir, 'gmap', 'key', build_index, logger)
+    assert get_index_dir(cache_dir, 'gmap', 'key', build_index, logger) == index_dir
+    assert build_index.runs_num == 1
+    assert os.path.getsize(os.path.join(index_dir, 'index')) == 10
+
+    # index of other tool or key is built separately:
+    assert get_index_dir(cache_dir, 'STAR', 'key', build_index, logger) != index_dir
+    assert get_index_dir(cache_dir, 'gmap', 'other_key', build_index, logger) != index_dir
+    assert build_index.runs_num == 3
+
+
+def test_failed_index_is_not_cached(tmp_path, logger):
+    cache_dir = str(tmp_path)
+
+    assert get_index_dir(cache_dir, 'gmap', 'key', IndexBuilder(10, False), logger) is None
+    assert sorted(os.listdir(os.path.join(cache_dir, 'indexes'))) == ['gmap.key.build.lock', 'gmap.key.lock']
+
+    build_index = IndexBuilder(10)
+    assert get_index_dir(cache_dir, 'gmap', 'key', build_index, logger) is not None
+    assert build_index.runs_num == 1
+
+
+# least recently used indexes are removed, index in use is kept even if it doesn't fit in budget alone:
+def test_least_recently_used_indexes_are_evicted(tmp_path, monkeypatch, logger):
+    monkeypatch.setattr(rqconfig, 'INDEX_CACHE_MAX_SIZE', 25)
+    cache_dir = str(tmp_path)
+    build_index = IndexBuilder(10)
+
+    index_dir0 = get_index_dir(cache_dir, 'gmap', 'key0', build_index, logger)
+    index_dir1 = get_index_dir(cache_dir, 'gmap', 'key1', build_index, logger)
+    # key0 is used again, so key1 is least recently used:
+    get_index_dir(cache_dir, 'gmap', 'key0', build_index, logger)
+    index_dir2 = get_index_dir(cache_dir, 'gmap', 'key2', build_index, logger)
+
+    assert os.path.exists(index_dir0) and not os.path.exists(index_dir1) and os.path.exists(index_dir2)
+    assert sorted(UtilsCache.load_indexes_manifest(os.path.join(cache_dir, 'indexes', 'manifest.json'))) == \
+        ['gmap.key0', 'gmap.key2']
+
+    index_dir3 = get_index_dir(cache_dir, 'gmap', 'key3', IndexBuilder(100), logger)
+    assert os.path.exists(index_dir3) and not os.path.exists(index_dir0) and not os.path.exists(index_dir2)
+
+
+# index held by other run (e.g. GMAP is still reading it) is kept by eviction of this run and removed after release:
+def test_held_index_is_not_evicted(tmp_path, monkeypatch, logger):
+    monkeypatch.setattr(rqconfig, 'INDEX_CACHE_MAX_SIZE', 15)
+    cache_dir = str(tmp_path)
+
+    context = multiprocessing.get_context('fork')
+    is_held = context.Event()
+    is_released = context.Event()
+    other_run = context.Process(target=hold_index, args=(cache_dir, 'gmap', 'key0', is_held, is_released, logger))
+    other_run.start()
+    try:
+        assert is_held.wait(10)
+
+        index_dir1 = get_index_dir(cache_dir, 'gmap', 'key1', IndexBuilder(10), logger)
+        index_dir0 = os.path.join(os.path.dirname(index_dir1), 'gmap.key0')
+        assert os.path.exists(index_dir0) and os.path.exists(index_dir1)
+    finally:
+        is_released.set()
+        other_run.join()
+
+    index_dir2 = get_index_dir(cache_dir, 'gmap', 'key2', IndexBuilder(10), logger)
+    assert not os.path.exists(index_dir0) and not os.path.exists(index_dir1) and os.path.exists(index_dir2)
@@ -0,0 +1,109 @@
+__author__ = 'letovesnoi'
+
+import os
+import random
+
+from general import UtilsGeneral
+
+from objects import IndexedReference
+
+from quast_libs import fastaparser
+
+
+def write_fasta_text(path, sequences, width, newline, blank_lines_num, final_newline):
+    lines = []
+    for name, seq in sequences:
+        lines.append('>' + name)
+        lines += [seq[i:i + width] for i in range(0, len(seq), width)]
+    text = newline.join(lines) + newline * blank_lines_num
+    if final_newline:
+        text += newline
+
+    with open(path, 'wb') as out_handle:
+        out_handle.write(text.encode('ascii'))
+    return str(path)
+
+
+def get_random_sequences(rand, width):
+    # lengths fill the last line partly and fully:
+    lens = [1, width - 1, width, width + 1, 2 * width, 5 * width + 3, rand.randint(1, 500)]
+    return [('chr{} description {}'.format(i_seq, i_seq), ''.join(rand.choice('ACGTN') for _ in range(len_seq)))
+            for i_seq, len_seq in enumerate(lens) if len_seq > 0]
+
+
+def check_as_read_fasta(rand, reference_dict, reference_path):
+    expected_dict = UtilsGeneral.list_to_dict(fastaparser.read_fasta(reference_path))
+
+    assert sorted(reference_dict.keys()) == sorted(expected_dict.keys())
+    assert len(reference_dict) == len(expected_dict)
+    for name in expected_dict:
+        assert name in reference_dict
+        seq = reference_dict[name]
+        expected_seq = expected_dict[name]
+        assert len(seq) == len(expected_seq)
+        assert seq[:] == expected_seq
+        assert seq[len(expected_seq) - 1] == expected_seq[-1]
+        assert seq[-1] == expected_seq[-1]
+        for _ in range(30):
+            start = rand.randint(-5, len(expected_seq) + 5)
+            end = rand.randint(-5, len(expected_seq) + 5)
+            assert seq[start:end] == expected_seq[start:end]
+
+
+def test_indexed_reference_as_read_fasta(tmp_path, logger):
+    rand = random.Random(0)
+    for width in [1, 7, 60]:
+        for newline in ['\n', '\r\n']:
+            for blank_lines_num in [0, 2]:
+                for final_newline in [True, False]:
+                    sequences = get_random_sequences(rand, width)
+                    reference_path = \
+                        write_fasta_text(tmp_path / 'reference.fasta', sequences, width, newline, blank_lines_num, final_newline)
+
+                    tmp_dir = tmp_path / 'tmp_{}_{}_{}_{}'.format(width, len(newline), blank_lines_num, final_newline)
+                    os.makedirs(str(tmp_dir))
+                    reference_dict = \
+                        IndexedReference.IndexedReference.get_indexed_reference(reference_path, str(tmp_dir), logger)
+                    assert reference_dict is not None
+                    check_as_read_fasta(rand, reference_dict, reference_path)
+
+
+# line shorter or longer than previous ones inside sequence or blank line inside sequence can't be indexed:
+def test_irregular_lines_are_not_indexed(tmp_path, logger):
+    for text in ['>chr1\nACGT\nAC\nACGT\n', '>chr1\nACGT\nACGTA\nAC\n', '>chr1\nACGT\n\nACGT\n',
+                 '>chr1\nACGT\nACGT\r\nAC\n', '>\nACGT\n', 'ACGT\n>chr1\nACGT\n']:
+        reference_path = str(tmp_path / 'reference.fasta')
+        with open(reference_path, 'w') as out_handle:
+            out_handle.write(text)
+
+        assert IndexedReference.get_fai(reference_path) is None
+        assert IndexedReference.IndexedReference.get_indexed_reference(reference_path, str(tmp_path), logger) is None
+        os.remove(reference_path)
+
+
+def test_index_older_than_reference_is_not_reused(tmp_path, logger):
+    rand = random.Random(1)
+    tmp_dir = str(tmp_path / 'tmp')
+    os.makedirs(tmp_dir)
+    reference_path = write_fasta_text(tmp_path / 'reference.fasta', [('chr1', 'ACGT' * 20)], 10, '\n', 0, True)
+
+    IndexedReference.IndexedReference.get_indexed_reference(reference_path, tmp_dir, logger)
+    assert '  indexing reference...' in logger.messages
+
+    # the same reference reuses its index:
+    del logger.messages[:]
+    reference_dict = IndexedReference.IndexedReference.get_indexed_reference(reference_path, tmp_dir, logger)
+    assert '  indexing reference...' not in logger.messages
+    check_as_read_fasta(rand, reference_dict, reference_path)
+
+    # changed reference is indexed again, index next to reference made by samtools faidx too:
+    reference_path = write_fasta_text(tmp_path / 'reference.fasta', [('chr2', 'ACGTT' * 30), ('chr3', 'GA')], 7, '\n', 0, True)
+    IndexedReference.write_fai([('chr1', 80, 6, 10, 11)], reference_path + '.fai')
+    reference_mtime = os.path.getmtime(reference_path)
+    for index_path in [reference_path + '.fai', os.path.join(tmp_dir, 'reference.fasta.fai')]:
+        os.utime(index_path, (reference_mtime - 10, reference_mtime - 10))
+
+    del logger.messages[:]
+    reference_dict = IndexedReference.IndexedReference.get_indexed_reference(reference_path, tmp_dir, logger)
+    assert '  indexing reference...' in logger.messages
+    check_as_read_fasta(rand, reference_dict, reference_path)
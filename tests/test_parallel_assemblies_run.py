@@ -0,0 +1,38 @@
+__author__ = 'letovesnoi'
+
+import os
+
+import pytest
+
+from general import parallel_assemblies_run
+
+
+# result of assembly with process id, so it is seen whether assemblies are processed in workers:
+def process_assembly(i_assembly, threads, names):
+    return names[i_assembly], threads, os.getpid()
+
+
+def process_assembly_with_error(i_assembly, threads, failed_i_assembly):
+    if i_assembly == failed_i_assembly:
+        raise SystemExit(3)
+    return i_assembly
+
+
+def test_results_are_in_order_of_assemblies(logger):
+    names = ['assembly{}'.format(i_assembly) for i_assembly in range(5)]
+
+    results = parallel_assemblies_run.parallel_assemblies_run(process_assembly, (names,), len(names), 4, logger)
+    assert [name for name, threads, pid in results] == names
+    # threads for external tools are split between 4 processes:
+    assert all(threads == 1 for name, threads, pid in results)
+    assert all(pid != os.getpid() for name, threads, pid in results)
+
+    # single thread runs assemblies in calling process with all threads:
+    results = parallel_assemblies_run.parallel_assemblies_run(process_assembly, (names,), len(names), 1, logger)
+    assert results == [(name, 1, os.getpid()) for name in names]
+
+
+def test_failed_assembly_exits(logger):
+    with pytest.raises(SystemExit) as exit_info:
+        parallel_assemblies_run.parallel_assemblies_run(process_assembly_with_error, (2,), 4, 2, logger)
+    assert exit_info.value.code == 3
@@ -0,0 +1,142 @@
+__author__ = 'letovesnoi'
+
+import os
+import random
+
+from general import rqconfig
+from general import UtilsAlignment
+from general import parallel_blat_run
+
+
+STAND_IN_ALIGNERS_DIR = os.path.join(rqconfig.rnaQUAST_LOCATION, 'benchmark', 'stand_in_aligners')
+
+
+def get_psl_line(q_name, q_size, q_start, t_name, t_start):
+    return '\t'.join(['100', '0', '0', '0', '0', '0', '0', '0', '+', q_name, str(q_size), str(q_start),
+                      str(q_start + 100), t_name, '100000', str(t_start), str(t_start + 100), '1', '100,',
+                      '{},'.format(q_start), '{},'.format(t_start)]) + '\n'
+
+
+# names are random, so neither shards nor merging can keep input order by names. Lengths are skewed as of long reads:
+def get_transcripts_dict(rand, transcripts_num):
+    transcripts_dict = {}
+    for i_transcript in range(transcripts_num):
+        len_transcript = int(rand.lognormvariate(6, 1.2)) + 1
+        transcripts_dict['t{}_{}'.format(rand.randint(0, 10 ** 6), i_transcript)] = \
+            ''.join(rand.choice('ACGT') for _ in range(len_transcript))
+    return transcripts_dict
+
+
+def write_fasta(path, sequences):
+    with open(path, 'w') as out_handle:
+        for name, seq in sequences:
+            out_handle.write('>{}\n{}\n'.format(name, seq))
+    return str(path)
+
+
+# truth of stand-in blat: alignments of each transcript to both chromosomes in input order of transcripts, as BLAT
+# aligns queries one by one:
+def write_truth(rand, truth_dir, transcripts_dict):
+    lines = []
+    for id_transcript in transcripts_dict:
+        for _ in range(rand.randint(0, 3)):
+            lines.append(get_psl_line(id_transcript, len(transcripts_dict[id_transcript]),
+                                      rand.randint(0, 10000), rand.choice(['chr1', 'chr2']), rand.randint(0, 90000)))
+    os.makedirs(truth_dir)
+    with open(os.path.join(truth_dir, 'transcripts.psl'), 'w') as out_handle:
+        out_handle.writelines(lines)
+
+
+def run_blat(tmp_path, label, transcripts_dict, reference_pathes, threads, logger):
+    tmp_dir = tmp_path / label
+    os.makedirs(str(tmp_dir))
+    out_psl_path = parallel_blat_run.parallel_blat_run(transcripts_dict, reference_pathes, threads, str(tmp_dir), label,
+                                                       logger, str(tmp_path))
+    with open(out_psl_path, 'r') as in_handle:
+        return in_handle.readlines()
+
+
+def test_shards_are_balanced_by_length(tmp_path):
+    rand = random.Random(0)
+    transcripts_dict = get_transcripts_dict(rand, 300)
+    transcripts_order = dict((id_transcript, i_transcript) for i_transcript, id_transcript in enumerate(transcripts_dict))
+    max_len = max(len(seq) for seq in transcripts_dict.values())
+
+    for shards_num in [1, 3, 16]:
+        output_dirs = []
+        for i_shard in range(shards_num):
+            output_dirs.append(str(tmp_path / '{}_{}'.format(shards_num, i_shard)))
+            os.makedirs(output_dirs[-1])
+
+        shards = []
+        for fasta_path in parallel_blat_run.split_transcripts_by_length(transcripts_dict, transcripts_order, shards_num,
+                                                                        output_dirs):
+            with open(fasta_path, 'r') as in_handle:
+                shards.append([line[1:].strip() for line in in_handle if line.startswith('>')])
+
+        # each transcript is in one shard, transcripts of shards keep input order:
+        assert sorted(id_transcript for shard in shards for id_transcript in shard) == sorted(transcripts_dict)
+        for shard in shards:
+            assert shard == sorted(shard, key=transcripts_order.get)
+
+        # longest shards go first, shards differ at most by length of the longest transcript:
+        lens_shards = [sum(len(transcripts_dict[id_transcript]) for id_transcript in shard) for shard in shards]
+        assert lens_shards == sorted(lens_shards, reverse=True)
+        assert lens_shards[0] - lens_shards[-1] <= max_len
+
+
+def test_merge_psl_by_query_restores_queries_order(tmp_path):
+    rand = random.Random(1)
+    transcripts_dict = get_transcripts_dict(rand, 200)
+    queries_order = dict((id_transcript, i_transcript) for i_transcript, id_transcript in enumerate(transcripts_dict))
+    lines = [get_psl_line(id_transcript, 1000, i_alignment, 'chr1', 0)
+             for id_transcript in transcripts_dict for i_alignment in range(rand.randint(1, 3))]
+
+    # transcripts are put to shards at random, each shard keeps input order:
+    shards_lines = [[] for _ in range(5)]
+    shards_by_transcript = dict((id_transcript, rand.randint(0, 4)) for id_transcript in transcripts_dict)
+    for line in lines:
+        shards_lines[shards_by_transcript[UtilsAlignment.get_psl_query_name(line)]].append(line)
+    psl_pathes = []
+    for i_shard, shard_lines in enumerate(shards_lines):
+        psl_pathes.append(str(tmp_path / '{}.psl'.format(i_shard)))
+        with open(psl_pathes[-1], 'w') as out_handle:
+            out_handle.writelines(shard_lines)
+
+    out_psl_path = str(tmp_path / 'merged.psl')
+    UtilsAlignment.merge_psl_by_query(psl_pathes, out_psl_path, queries_order)
+    with open(out_psl_path, 'r') as in_handle:
+        assert in_handle.readlines() == lines
+
+
+def test_parallel_blat_run_as_single_shard(tmp_path, monkeypatch, logger):
+    rand = random.Random(2)
+    transcripts_dict = get_transcripts_dict(rand, 150)
+    truth_dir = str(tmp_path / 'truth')
+    write_truth(rand, truth_dir, transcripts_dict)
+    with open(os.path.join(truth_dir, 'transcripts.psl'), 'r') as in_handle:
+        truth_lines = in_handle.readlines()
+
+    monkeypatch.setenv('RNAQUAST_BENCHMARK_TRUTH', truth_dir)
+    monkeypatch.setenv('PATH', STAND_IN_ALIGNERS_DIR + os.pathsep + os.environ['PATH'])
+
+    reference_path = write_fasta(tmp_path / 'reference.fasta', [('chr1', 'ACGT'), ('chr2', 'ACGT')])
+    chrs_pathes = [write_fasta(tmp_path / 'chr1.fasta', [('chr1', 'ACGT')]),
+                   write_fasta(tmp_path / 'chr2.fasta', [('chr2', 'ACGT')])]
+
+    monkeypatch.setattr(rqconfig, 'BLAT_SHARDS_PER_THREAD', 1)
+    single_shard_lines = run_blat(tmp_path, 'single', transcripts_dict, [reference_path], 1, logger)
+    single_shard_chrs_lines = run_blat(tmp_path, 'single_chrs', transcripts_dict, chrs_pathes, 1, logger)
+    assert single_shard_lines == truth_lines
+
+    # reference split to parts gives alignments of transcript sorted by query starts:
+    assert sorted(single_shard_chrs_lines) == sorted(truth_lines)
+    assert [UtilsAlignment.get_psl_query_name(line) for line in single_shard_chrs_lines] == \
+        [UtilsAlignment.get_psl_query_name(line) for line in truth_lines]
+
+    monkeypatch.setattr(rqconfig, 'BLAT_SHARDS_PER_THREAD', 4)
+    for threads in [2, 5]:
+        assert run_blat(tmp_path, 'shards_{}'.format(threads), transcripts_dict, [reference_path], threads, logger) == \
+            single_shard_lines
+        assert run_blat(tmp_path, 'shards_chrs_{}'.format(threads), transcripts_dict, chrs_pathes, threads, logger) == \
+            single_shard_chrs_lines
@@ -0,0 +1,92 @@
+__author__ = 'letovesnoi'
+
+import time
+
+import pytest
+
+from general import parallel_stages_run
+
+
+class StageFunction():
+    """Class of stage function recording order of starts and ends of stages and threads given to them"""
+
+    def __init__(self, name, events, result=None, sleep_time=0.01, exception=None):
+        self.name = name
+        self.events = events
+        self.result = result
+        self.sleep_time = sleep_time
+        self.exception = exception
+        self.threads = None
+
+    def __call__(self, threads):
+        self.threads = threads
+        self.events.append(('start', self.name))
+        time.sleep(self.sleep_time)
+        self.events.append(('end', self.name))
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+def get_stages(functions, dependencies, max_threads=None):
+    max_threads = max_threads if max_threads is not None else {}
+    return [parallel_stages_run.Stage(name, functions[name], dependencies.get(name), max_threads.get(name))
+            for name in functions]
+
+
+# stage starts only after all its dependencies end, independent stages run concurrently:
+def test_stages_run_after_dependencies(logger):
+    events = []
+    functions = dict((name, StageFunction(name, events, result=name.upper(), sleep_time=0.05))
+                     for name in ['a', 'b', 'c', 'd'])
+    dependencies = {'c': ['a', 'b'], 'd': ['c']}
+
+    results = parallel_stages_run.parallel_stages_run(get_stages(functions, dependencies), 4, logger)
+
+    assert results == {'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'}
+    for name in dependencies:
+        for dependency in dependencies[name]:
+            assert events.index(('end', dependency)) < events.index(('start', name))
+    # a and b are independent, so both start before any of them ends:
+    assert set(events[:2]) == {('start', 'a'), ('start', 'b')}
+
+
+# threads are split between ready stages, stages with limited threads get their share first:
+def test_threads_budget_is_shared(logger):
+    events = []
+    functions = dict((name, StageFunction(name, events)) for name in ['single', 'a', 'b'])
+    parallel_stages_run.parallel_stages_run(get_stages(functions, {}, {'single': 1}), 9, logger)
+
+    assert functions['single'].threads == 1
+    assert functions['a'].threads + functions['b'].threads == 8
+    assert min(functions['a'].threads, functions['b'].threads) == 4
+
+    # stage runs with one thread even if budget is smaller than number of ready stages:
+    functions = dict((name, StageFunction(name, events)) for name in ['a', 'b', 'c'])
+    parallel_stages_run.parallel_stages_run(get_stages(functions, {}), 1, logger)
+    assert all(functions[name].threads == 1 for name in functions)
+
+
+def test_stage_error_is_raised_and_dependent_stages_are_not_run(logger):
+    events = []
+    functions = {'a': StageFunction('a', events, exception=ValueError('a failed')),
+                 'b': StageFunction('b', events, sleep_time=0.05),
+                 'c': StageFunction('c', events)}
+
+    with pytest.raises(ValueError):
+        parallel_stages_run.parallel_stages_run(get_stages(functions, {'c': ['a']}), 2, logger)
+
+    # running independent stage is waited, dependent one isn't started:
+    assert ('end', 'b') in events
+    assert ('start', 'c') not in events
+
+
+def test_unknown_and_cyclic_dependencies_exit(logger):
+    events = []
+    functions = dict((name, StageFunction(name, events)) for name in ['a', 'b'])
+
+    with pytest.raises(SystemExit):
+        parallel_stages_run.parallel_stages_run(get_stages(functions, {'a': ['x']}), 2, logger)
+    with pytest.raises(SystemExit):
+        parallel_stages_run.parallel_stages_run(get_stages(functions, {'a': ['b'], 'b': ['a']}), 2, logger)
+    assert events == []
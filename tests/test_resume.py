@@ -0,0 +1,125 @@
+__author__ = 'letovesnoi'
+
+import os
+import sys
+import shutil
+import subprocess
+
+from general import rqconfig
+
+
+BENCHMARK_DIR = os.path.join(rqconfig.rnaQUAST_LOCATION, 'benchmark')
+STAND_IN_ALIGNERS_DIR = os.path.join(BENCHMARK_DIR, 'stand_in_aligners')
+RNAQUAST_PATH = os.path.join(rqconfig.rnaQUAST_LOCATION, 'rnaQUAST.py')
+
+# rnaQUAST run recording completed stages and killed right after checkpoint of given stage is saved, 0 doesn't kill:
+KILLED_RUN = '''import os
+import sys
+import runpy
+
+rnaquast_path, stages_path, kill_after = sys.argv[1], sys.argv[2], int(sys.argv[3])
+sys.path[0] = os.path.dirname(rnaquast_path)
+
+from general import UtilsCheckpoint
+
+save_stage = UtilsCheckpoint.save_stage
+
+
+def save_stage_and_kill(checkpoints_dir, stage, *args):
+    save_stage(checkpoints_dir, stage, *args)
+    with open(stages_path, 'a') as out_handle:
+        out_handle.write(stage + '\\n')
+    with open(stages_path, 'r') as in_handle:
+        if len(in_handle.readlines()) == kill_after:
+            os._exit(9)
+
+
+UtilsCheckpoint.save_stage = save_stage_and_kill
+sys.argv = [rnaquast_path] + sys.argv[4:]
+runpy.run_path(rnaquast_path, run_name='__main__')
+'''
+
+# files differing between runs anyway:
+SKIPPED_FILES = ['profile.json', 'annotation.db']
+
+
+def get_data(tmp_path):
+    data_dir = str(tmp_path / 'data')
+    subprocess.check_call([sys.executable, os.path.join(BENCHMARK_DIR, 'generate_synthetic_data.py'),
+                           '-g', '20', '-r', '5', '-o', data_dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for label in ['a1', 'a2']:
+        shutil.copy(os.path.join(data_dir, 'transcripts.fasta'), os.path.join(data_dir, label + '.fasta'))
+    return data_dir
+
+
+def get_rnaquast_args(data_dir, output_dir):
+    return ['-r', os.path.join(data_dir, 'reference.fasta'), '--gtf', os.path.join(data_dir, 'annotation.gtf'),
+            '-c', os.path.join(data_dir, 'a1.fasta'), os.path.join(data_dir, 'a2.fasta'),
+            '-s', os.path.join(data_dir, 'reads.fastq'), '--disable_infer_genes', '--disable_infer_transcripts',
+            '--no_plots', '-t', '1', '-o', output_dir]
+
+
+def run_killed(tmp_path, data_dir, output_dir, kill_after, *rnaquast_args):
+    killed_run_path = str(tmp_path / 'killed_run.py')
+    if not os.path.exists(killed_run_path):
+        with open(killed_run_path, 'w') as out_handle:
+            out_handle.write(KILLED_RUN)
+    # resumed run after the last stage saves no stages:
+    stages_path = output_dir + '.stages'
+    open(stages_path, 'w').close()
+
+    returncode = subprocess.call([sys.executable, killed_run_path, RNAQUAST_PATH, stages_path, str(kill_after)] +
+                                 get_rnaquast_args(data_dir, output_dir) + list(rnaquast_args),
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(stages_path, 'r') as in_handle:
+        return returncode, [line.strip() for line in in_handle]
+
+
+def get_reports(output_dir):
+    reports = {}
+    for dirpath, dirnames, filenames in os.walk(output_dir):
+        dirnames[:] = [dirname for dirname in dirnames if dirname not in ['logs', 'tmp']]
+        for filename in filenames:
+            if filename not in SKIPPED_FILES:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as in_handle:
+                    # output directory is written to some reports:
+                    reports[os.path.relpath(path, output_dir)] = in_handle.read().replace(output_dir.encode(), b'OUTPUT_DIR')
+    return reports
+
+
+def get_log(output_dir):
+    with open(os.path.join(output_dir, 'logs', 'rnaQUAST.log'), 'r') as in_handle:
+        return in_handle.read()
+
+
+# run killed right after each stage and resumed gives the same reports as uninterrupted run, reusing completed stages:
+def test_resume_after_kill_at_each_stage(tmp_path, monkeypatch):
+    data_dir = get_data(tmp_path)
+    monkeypatch.setenv('RNAQUAST_BENCHMARK_TRUTH', os.path.join(data_dir, 'truth'))
+    monkeypatch.setenv('PATH', STAND_IN_ALIGNERS_DIR + os.pathsep + os.environ['PATH'])
+
+    output_dir = str(tmp_path / 'uninterrupted')
+    returncode, stages = run_killed(tmp_path, data_dir, output_dir, 0)
+    assert returncode == 0
+    assert len(stages) > 1
+    expected_reports = get_reports(output_dir)
+    assert expected_reports
+
+    for kill_after in range(1, len(stages) + 1):
+        output_dir = str(tmp_path / 'killed_after_{}'.format(kill_after))
+        returncode, killed_stages = run_killed(tmp_path, data_dir, output_dir, kill_after)
+        assert returncode == 9
+        assert killed_stages == stages[:kill_after]
+
+        returncode, resumed_stages = run_killed(tmp_path, data_dir, output_dir, 0, '--resume')
+        assert returncode == 0
+        assert resumed_stages == stages[kill_after:]
+
+        log = get_log(output_dir)
+        for stage in stages[:kill_after]:
+            assert 'stage {} is completed in previous run, skipped.'.format(stage) in log
+        for stage in stages[kill_after:]:
+            assert 'stage {} is completed in previous run, skipped.'.format(stage) not in log
+
+        assert get_reports(output_dir) == expected_reports